@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Category, MenuItem, CustomerProfile, Order, OrderItem, Payment, Review, SupportRequest, SupportMessage
+from .order_numbers import parse_order_number
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -10,9 +11,16 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ('status', 'order_date')
     search_fields = ('order_number', 'customer__username', 'customer__email')
     inlines = [OrderItemInline]
+    
+    def get_search_results(self, request, queryset, search_term):
+        # A pasted order number is an exact probe of the unique index instead of a substring scan
+        order_number = parse_order_number(search_term)
+        if order_number is not None:
+            return queryset.filter(order_number=order_number), False
+        return super().get_search_results(request, queryset, search_term)
 
 class MenuItemAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'is_available')
+    list_display = ('name', 'category', 'price', 'is_available', 'stock_quantity')
     list_filter = ('category', 'is_available')
     search_fields = ('name', 'description')
 
@@ -28,6 +36,12 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ('order', 'payment_method', 'amount', 'payment_date')
     list_filter = ('payment_method', 'payment_date')
     search_fields = ('order__order_number', 'transaction_id')
+    
+    def get_search_results(self, request, queryset, search_term):
+        order_number = parse_order_number(search_term)
+        if order_number is not None:
+            return queryset.filter(order__order_number=order_number), False
+        return super().get_search_results(request, queryset, search_term)
 
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ('customer', 'menu_item', 'rating', 'created_at')
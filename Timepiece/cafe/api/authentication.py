@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from cafe.cache import LRUCache
+import atexit
+import copy
+import logging
+import threading
+import time
+
+logger = logging.getLogger('cafe')
+
+DEFAULT_TOKEN_AUTH_CACHE_SETTINGS = {
+    'MAX_ENTRIES': 10000,  # Tokens remembered per process
+    'TIMEOUT': 60,  # Seconds a cached token is trusted - bounds staleness for changes made in other processes
+    'LAST_USED_FLUSH_INTERVAL': 60,  # Seconds between batched writes of TokenUsage.last_used
+}
+
+
+class TokenCache:
+    # Bounded LRU of token key -> (expires_at, user) with per-entry TTL
+    # Signals drop entries on token delete and user changes in this process; the TTL covers other workers
+
+    def __init__(self, max_entries=10000, timeout=60):
+        self.timeout = timeout
+        self._entries = LRUCache(max_entries=max_entries)
+
+    def get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if now >= expires_at:
+            self._entries.delete(key)
+            return None
+        return user
+
+    def set(self, key, user, now):
+        self._entries.set(key, (now + self.timeout, user))
+
+    def invalidate_token(self, key):
+        self._entries.delete(key)
+
+    def invalidate_user(self, user_pk):
+        self._entries.delete_matching(lambda entry: entry[1].pk == user_pk)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return self._entries.stats()
+
+
+class UsageRecorder:
+    # Collects token -> last seen time in memory; a background thread writes them in one upsert per
+    # interval, so no request - least of all a read - pays for the write
+
+    def __init__(self, interval=60):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+
+    def record(self, key):
+        with self._lock:
+            self._pending[key] = timezone.now()
+            if self._thread is None:
+                self._start()
+
+    def _start(self):
+        # Called with the lock held - started on first use so importing the module (management
+        # commands, a pre-forking server's master) does not spawn a thread
+        self._thread = threading.Thread(target=self._run, name='token-usage-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Token usage flush failed")
+            finally:
+                # Only this thread's connections - a fresh one is opened for the next batch
+                connections.close_all()
+
+    def _take_pending(self):
+        # Swapped under the same lock record() holds, so no entry lands in a dict being written out
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def flush(self):
+        from cafe.models import TokenUsage
+        from rest_framework.authtoken.models import Token
+
+        pending = self._take_pending()
+        if not pending:
+            return 0
+        try:
+            with transaction.atomic():
+                # Tokens deleted since they were recorded are skipped rather than violating the foreign key
+                live_keys = set(Token.objects.filter(key__in=list(pending)).values_list('key', flat=True))
+                TokenUsage.objects.bulk_create(
+                    [TokenUsage(token_id=key, last_used=last_used) for key, last_used in pending.items() if key in live_keys],
+                    update_conflicts=True, unique_fields=['token'], update_fields=['last_used'],
+                )
+        except DatabaseError as error:
+            # Bookkeeping must never fail a request - the entries are simply dropped
+            logger.warning("Could not record API token usage for %d tokens: %s", len(pending), error)
+            return 0
+        return len(live_keys)
+
+
+def _build_token_cache():
+    options = dict(DEFAULT_TOKEN_AUTH_CACHE_SETTINGS)
+    options.update(getattr(settings, 'TOKEN_AUTH_CACHE', {}))
+    return (
+        TokenCache(max_entries=options['MAX_ENTRIES'], timeout=options['TIMEOUT']),
+        UsageRecorder(interval=options['LAST_USED_FLUSH_INTERVAL']),
+    )
+
+
+token_cache, token_usage = _build_token_cache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # TokenAuthentication without the token/user join on every request - a warm token costs a
+    # dictionary lookup plus a copy of the cached user, so views can't leak changes between requests
+
+    def authenticate_credentials(self, key):
+        now = time.monotonic()
+        user = token_cache.get(key, now)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, now)
+        else:
+            # Unsaved stand-in for request.auth - carries the key and user like the real row
+            token = self.get_model()(key=key, user=user)
+
+        token_usage.record(key)
+        user = copy.copy(user)
+        token.user = user
+        return (user, token)
+
+
+def invalidate_token(key):
+    token_cache.invalidate_token(key)
+
+
+def invalidate_user_tokens(user_pk, is_active=True):
+    token_cache.invalidate_user(user_pk)
+    if not is_active:
+        # Make sure a concurrent request cannot re-cache the user before the deactivation commits
+        transaction.on_commit(lambda: token_cache.invalidate_user(user_pk))
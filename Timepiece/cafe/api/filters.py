@@ -0,0 +1,16 @@
+from rest_framework import filters
+from cafe.search import search_menu_items
+
+
+class MenuSearchFilter(filters.SearchFilter):
+    # Drop-in replacement for SearchFilter on menu items - keeps the ?search= parameter
+    # but answers from the full-text index instead of LIKE scans over every row
+    
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        
+        # Explicit ?ordering= wins over relevance ranking
+        ranked = not request.query_params.get(filters.OrderingFilter.ordering_param)
+        return search_menu_items(queryset, ' '.join(search_terms), ranked=ranked)
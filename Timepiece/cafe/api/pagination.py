@@ -0,0 +1,190 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from datetime import date, datetime
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import filters
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+import json
+
+Cursor = namedtuple('Cursor', ['ordering', 'values', 'reverse'])
+
+
+class KeysetPagination(BasePagination):
+    # Keyset (seek) pagination over a unique composite ordering such as (-order_date, -id)
+    # Each page is an indexed range scan from the previous page's last row, so there is no
+    # COUNT(*) and no OFFSET and deep pages cost the same as the first one.
+    # Requests that use ?page= keep the old page-number behaviour for existing clients.
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Default ordering - the last field must be unique so every row has a distinct position
+    ordering = ('-id',)
+
+    legacy_pagination_class = PageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.legacy = None
+
+        if self._use_legacy(request):
+            self.legacy = self.legacy_pagination_class()
+            return self.legacy.paginate_queryset(queryset, request, view)
+
+        self.base_url = remove_query_param(
+            request.build_absolute_uri(), self.legacy_pagination_class.page_query_param
+        )
+        ordering = self.get_ordering(request, queryset, view)
+        cursor = self.decode_cursor(request, ordering, queryset)
+
+        scan_ordering = ordering
+        if cursor is not None and cursor.reverse:
+            scan_ordering = tuple(self._invert(field) for field in ordering)
+
+        queryset = queryset.order_by(*scan_ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self._seek_filter(scan_ordering, cursor.values))
+
+        # Fetch one extra row to learn whether another page exists in the scan direction
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if cursor is not None and cursor.reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.ordering_in_use = ordering
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def get_ordering(self, request, queryset, view):
+        # Honour ?ordering= from the view's OrderingFilter on the leading field, keeping the unique tiebreaker
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, filters.OrderingFilter):
+                requested = backend().get_ordering(request, queryset, view)
+                if requested:
+                    leading = requested[0]
+                    tiebreaker = self.ordering[-1].lstrip('-')
+                    if leading.lstrip('-') == tiebreaker:
+                        return (leading,)
+                    return (leading, f"-{tiebreaker}" if leading.startswith('-') else tiebreaker)
+        return tuple(self.ordering)
+
+    def _use_legacy(self, request):
+        params = request.query_params
+        return self.legacy_pagination_class.page_query_param in params and self.cursor_query_param not in params
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f"-{field}"
+
+    @staticmethod
+    def _seek_filter(ordering, values):
+        # (a, b) after (x, y) == a > x OR (a = x AND b > y), with < for descending fields
+        condition = Q()
+        equal_so_far = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal_so_far & Q(**{f"{name}__{lookup}": value})
+            equal_so_far &= Q(**{name: value})
+        return condition
+
+    def _link(self, obj, reverse):
+        values = []
+        for field in self.ordering_in_use:
+            value = getattr(obj, field.lstrip('-'))
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            values.append(value)
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(Cursor(self.ordering_in_use, values, reverse))
+        )
+
+    def encode_cursor(self, cursor):
+        payload = json.dumps({'o': list(cursor.ordering), 'v': cursor.values, 'r': int(cursor.reverse)}, separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request, ordering, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            cursor = Cursor(tuple(payload['o']), list(payload['v']), bool(payload['r']))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # A cursor is only meaningful for the ordering it was issued under
+        if cursor.ordering != tuple(ordering) or len(cursor.values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # The values come from the client - convert each through its field so a tampered cursor is a
+        # 404 here rather than an error while the seek filter is built or run
+        try:
+            values = [self._cursor_value(queryset, field.lstrip('-'), value) for field, value in zip(ordering, cursor.values)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(values=values)
+
+    @staticmethod
+    def _cursor_value(queryset, name, value):
+        annotation = queryset.query.annotations.get(name)
+        field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+        value = field.to_python(value)
+        if value is None:
+            # Positions are never NULL - the ordering fields are required
+            raise ValueError(name)
+        return value
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ('-order_date', '-id')
+
+
+class PaymentPagination(KeysetPagination):
+    ordering = ('-payment_date', '-id')
+
+
+class SupportRequestPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
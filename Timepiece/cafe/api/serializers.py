@@ -1,36 +1,116 @@
 from rest_framework import serializers
 from cafe.models import Category, MenuItem, CustomerProfile, Order, OrderItem, Payment, Review, SupportRequest, SupportMessage
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Prefetch
+from decimal import Decimal
+from cafe.cart import MAX_LINE_QUANTITY
+from cafe.inventory import InsufficientStock, reserve_stock
 
-class UserSerializer(serializers.ModelSerializer):
+
+def parse_field_selection(request):
+    # Read ?fields= and ?expand= into lists of top-level field names - only GET-style requests are shaped
+    if request is None or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        return [], []
+    
+    def split(param):
+        return [name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()]
+    
+    return split('fields'), split('expand')
+
+
+def _prefixed(lookups, prefix):
+    # Re-root select/prefetch lookups under a relation, e.g. 'category' -> 'menu_item__category'
+    for lookup in lookups:
+        if isinstance(lookup, Prefetch):
+            yield Prefetch(f"{prefix}{lookup.prefetch_through}", queryset=lookup.queryset)
+        else:
+            yield f"{prefix}{lookup}"
+
+
+class DynamicFieldsMixin:
+    # Serializer mixin for sparse fieldsets (?fields=a,b) and expandable relations (?expand=rel)
+    # Each nested field declares the joins it needs, so unrequested fields also skip their queries
+    
+    select_related_fields = {}  # field name -> select_related lookups needed to render it
+    prefetch_related_fields = {}  # field name -> prefetch_related lookups needed to render it
+    expandable_fields = {}  # field name -> serializer class used when the field is expanded
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only the serializer built by the view receives the request at construction time,
+        # declared nested serializers are left untouched
+        fields, expand = parse_field_selection(self._context.get('request'))
+        if fields or expand:
+            self.apply_field_selection(fields, expand)
+    
+    def apply_field_selection(self, fields, expand):
+        for name in expand:
+            if name in self.expandable_fields:
+                self.fields[name] = self.expandable_fields[name](read_only=True)
+        if fields:
+            for name in [name for name in self.fields if name not in fields]:
+                self.fields.pop(name)
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=(), expand=(), prefix=''):
+        # Apply only the joins and prefetches needed for the fields that will be rendered
+        def wanted(name):
+            return not fields or name in fields
+        
+        for name, lookups in cls.select_related_fields.items():
+            if wanted(name):
+                queryset = queryset.select_related(*_prefixed(lookups, prefix))
+        for name, lookups in cls.prefetch_related_fields.items():
+            if wanted(name):
+                queryset = queryset.prefetch_related(*_prefixed(lookups, prefix))
+        for name in expand:
+            if name in cls.expandable_fields and wanted(name):
+                queryset = cls.expandable_fields[name].setup_eager_loading(queryset, prefix=f"{prefix}{name}__")
+        return queryset
+
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
         read_only_fields = ['id']
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'description']
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Lightweight menu item for nesting inside orders and reviews - no category join needed
+    class Meta:
+        model = MenuItem
+        fields = ['id', 'name', 'price']
+
+class MenuItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    select_related_fields = {'category': ['category']}
+    
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
         write_only=True,
         source='category'
     )
+    # Read from the stored totals on the row - no per-item aggregate query
+    average_rating = serializers.FloatField(source='get_average_rating', read_only=True)
 
     class Meta:
         model = MenuItem
         fields = [
             'id', 'name', 'description', 'price', 'image', 
-            'category', 'category_id', 'is_available',
-            'created_at', 'updated_at'
+            'category', 'category_id', 'is_available', 'stock_quantity',
+            'average_rating', 'rating_count', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'rating_count', 'created_at', 'updated_at']
 
-class CustomerProfileSerializer(serializers.ModelSerializer):
+class CustomerProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    select_related_fields = {'user': ['user']}
+    
     user = UserSerializer(read_only=True)
     
     class Meta:
@@ -38,9 +118,12 @@ class CustomerProfileSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'phone_number', 'address']
         read_only_fields = ['id']
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    select_related_fields = {'customer': ['customer'], 'menu_item': ['menu_item']}
+    expandable_fields = {'menu_item': MenuItemSerializer}
+    
     customer = UserSerializer(read_only=True)
-    menu_item = MenuItemSerializer(read_only=True)
+    menu_item = MenuItemSummarySerializer(read_only=True)
     menu_item_id = serializers.PrimaryKeyRelatedField(
         queryset=MenuItem.objects.all(),
         write_only=True,
@@ -56,8 +139,11 @@ class ReviewSerializer(serializers.ModelSerializer):
         validated_data['customer'] = self.context['request'].user
         return super().create(validated_data)
 
-class OrderItemSerializer(serializers.ModelSerializer):
-    menu_item = MenuItemSerializer(read_only=True)
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    select_related_fields = {'menu_item': ['menu_item']}
+    expandable_fields = {'menu_item': MenuItemSerializer}
+    
+    menu_item = MenuItemSummarySerializer(read_only=True)
     menu_item_id = serializers.PrimaryKeyRelatedField(
         queryset=MenuItem.objects.all(),
         write_only=True,
@@ -74,7 +160,12 @@ class OrderItemSerializer(serializers.ModelSerializer):
         validated_data['price'] = menu_item.price
         return super().create(validated_data)
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    select_related_fields = {'customer': ['customer']}
+    prefetch_related_fields = {
+        'items': [Prefetch('items', queryset=OrderItem.objects.select_related('menu_item'))],
+    }
+    
     customer = UserSerializer(read_only=True)
     items = OrderItemSerializer(many=True, read_only=True)
     order_items = serializers.ListField(
@@ -91,38 +182,93 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'customer', 'order_date', 'order_number', 'total_amount']
     
+    def validate_order_items(self, value):
+        # Resolve every line against the menu in one query and report problems per line
+        line_errors = []
+        lines = []
+        for item_data in value:
+            errors = {}
+            menu_item_id = quantity = None
+            try:
+                menu_item_id = int(item_data.get('menu_item_id'))
+            except (TypeError, ValueError):
+                errors['menu_item_id'] = ["A valid menu item id is required."]
+            try:
+                quantity = int(item_data.get('quantity', 1))
+                if quantity < 1:
+                    raise ValueError
+            except (TypeError, ValueError):
+                errors['quantity'] = ["Quantity must be a positive integer."]
+            line_errors.append(errors)
+            lines.append((menu_item_id, quantity))
+        
+        menu_items = MenuItem.objects.in_bulk(
+            {menu_item_id for menu_item_id, _ in lines if menu_item_id is not None}
+        )
+        for errors, (menu_item_id, _) in zip(line_errors, lines):
+            if menu_item_id is None:
+                continue
+            menu_item = menu_items.get(menu_item_id)
+            if menu_item is None:
+                errors['menu_item_id'] = [f"Menu item {menu_item_id} does not exist."]
+            elif not menu_item.is_available:
+                errors['menu_item_id'] = [f"{menu_item.name} is currently unavailable."]
+        
+        if any(line_errors):
+            raise serializers.ValidationError(line_errors)
+        
+        return [
+            {'menu_item': menu_items[menu_item_id], 'quantity': quantity}
+            for menu_item_id, quantity in lines
+        ]
+    
     def create(self, validated_data):
-        order_items_data = validated_data.pop('order_items', [])
+        order_lines = validated_data.pop('order_items', [])
         validated_data['customer'] = self.context['request'].user
         
-        validated_data['total_amount'] = 0
-        
-        order = super().create(validated_data)
+        # Total is known before the insert, so the order is written once
+        validated_data['total_amount'] = sum(
+            (line['menu_item'].price * line['quantity'] for line in order_lines),
+            Decimal('0.00')
+        )
         
-        total_amount = 0
-        for item_data in order_items_data:
-            menu_item_id = item_data.get('menu_item_id')
-            quantity = item_data.get('quantity', 1)
+        with transaction.atomic():
+            quantities = {}
+            for line in order_lines:
+                quantities[line['menu_item'].pk] = quantities.get(line['menu_item'].pk, 0) + line['quantity']
+            try:
+                reserve_stock(quantities, {line['menu_item'].pk: line['menu_item'] for line in order_lines})
+            except InsufficientStock as error:
+                raise serializers.ValidationError({'order_items': [
+                    f"Only {available} of menu item {menu_item_id} left." for menu_item_id, available in error.shortages
+                ]})
             
-            menu_item = MenuItem.objects.get(id=menu_item_id)
-            price = menu_item.price
-            
-            OrderItem.objects.create(
-                order=order,
-                menu_item=menu_item,
-                quantity=quantity,
-                price=price
-            )
-            
-            total_amount += price * quantity
-        
-        order.total_amount = total_amount
-        order.save()
+            order = super().create(validated_data)
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    menu_item=line['menu_item'],
+                    quantity=line['quantity'],
+                    price=line['menu_item'].price
+                )
+                for line in order_lines
+            ])
         
-        return order
+        # Reload with the related rows the response needs, in a fixed number of queries
+        return self.setup_eager_loading(Order.objects.all()).get(pk=order.pk)
 
-class PaymentSerializer(serializers.ModelSerializer):
-    order = OrderSerializer(read_only=True)
+class OrderSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Order header without customer or line items - used where the order is only referenced
+    class Meta:
+        model = Order
+        fields = ['id', 'order_number', 'order_date', 'status', 'total_amount']
+        read_only_fields = fields
+
+class PaymentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    select_related_fields = {'order': ['order']}
+    expandable_fields = {'order': OrderSerializer}
+    
+    order = OrderSummarySerializer(read_only=True)
     order_id = serializers.PrimaryKeyRelatedField(
         queryset=Order.objects.all(),
         write_only=True,
@@ -131,15 +277,17 @@ class PaymentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Payment
-        fields = ['id', 'order', 'order_id', 'amount', 'payment_method', 'transaction_id', 'payment_date', 'status']
-        read_only_fields = ['id', 'transaction_id', 'payment_date', 'status']
+        fields = ['id', 'order', 'order_id', 'amount', 'payment_method', 'transaction_id', 'payment_date']
+        read_only_fields = ['id', 'transaction_id', 'payment_date']
     
     def validate(self, data):
         if data['amount'] != data['order'].total_amount:
             raise serializers.ValidationError("Payment amount must match order total")
         return data
 
-class SupportMessageSerializer(serializers.ModelSerializer):
+class SupportMessageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    select_related_fields = {'sender': ['sender']}
+    
     sender = UserSerializer(read_only=True)
     
     class Meta:
@@ -151,7 +299,12 @@ class SupportMessageSerializer(serializers.ModelSerializer):
         validated_data['sender'] = self.context['request'].user
         return super().create(validated_data)
 
-class SupportRequestSerializer(serializers.ModelSerializer):
+class SupportRequestSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    select_related_fields = {'customer': ['customer'], 'assigned_to': ['assigned_to']}
+    prefetch_related_fields = {
+        'messages': [Prefetch('messages', queryset=SupportMessage.objects.select_related('sender'))],
+    }
+    
     customer = UserSerializer(read_only=True)
     assigned_to = UserSerializer(read_only=True)
     messages = SupportMessageSerializer(many=True, read_only=True)
@@ -164,4 +317,42 @@ class SupportRequestSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data['customer'] = self.context['request'].user
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class ExportFilterSerializer(serializers.Serializer):
+    # Query parameters of the staff exports (and options of manage.py export_orders)
+    # Bare dates mean midnight, naive times are in the current time zone; until is exclusive
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    status = serializers.ChoiceField(choices=Order.ORDER_STATUS_CHOICES, required=False)
+    
+    def validate(self, data):
+        if data.get('since') and data.get('until') and data['since'] >= data['until']:
+            raise serializers.ValidationError({'until': "Must be later than since."})
+        return data
+
+
+class CartLineUpdateSerializer(serializers.Serializer):
+    # One entry of a batched cart update - qty 0 removes the item
+    item = serializers.IntegerField(min_value=1)
+    qty = serializers.IntegerField(min_value=0, max_value=MAX_LINE_QUANTITY)
+
+
+class CartLineSerializer(serializers.Serializer):
+    item = serializers.IntegerField()
+    name = serializers.CharField()
+    qty = serializers.IntegerField()
+    unit_price = serializers.DecimalField(max_digits=6, decimal_places=2)
+    subtotal = serializers.DecimalField(max_digits=10, decimal_places=2)
+    is_available = serializers.BooleanField()
+    price_changed = serializers.BooleanField()
+
+
+class CartSerializer(serializers.Serializer):
+    # Read-only view of a cafe.cart.PricedCart - prices and totals always come from the current menu
+    lines = CartLineSerializer(many=True)
+    item_count = serializers.IntegerField()
+    total = serializers.DecimalField(max_digits=10, decimal_places=2)
+    unavailable = serializers.ListField(child=serializers.IntegerField())
+    repriced = serializers.ListField(child=serializers.CharField())
@@ -0,0 +1,41 @@
+from rest_framework import permissions
+from rest_framework.throttling import BaseThrottle
+from cafe.auth import get_client_ip
+from cafe.ratelimit import rate_limiter, request_keys
+import logging
+import math
+
+security_logger = logging.getLogger('security')
+
+
+class TokenBucketThrottle(BaseThrottle):
+    # DRF throttle backed by cafe.ratelimit - DRF turns a rejection into a 429 with Retry-After
+    scope = None
+    
+    def allow_request(self, request, view):
+        ip_address = get_client_ip(request)
+        self.decision = rate_limiter.check(self.scope, request_keys(request, ip_address))
+        if not self.decision.allowed:
+            security_logger.warning(
+                "Rate limit exceeded - Scope: %s, Key: %s, Path: %s", self.scope, self.decision.key, request.path,
+                extra={'event_type': 'RATE_LIMITED', 'ip': ip_address, 'path': request.path},
+            )
+        return self.decision.allowed
+    
+    def wait(self):
+        return max(1, math.ceil(self.decision.retry_after))
+
+
+class WriteThrottle(TokenBucketThrottle):
+    # Limits unsafe methods on the API viewsets - reads are left to conditional GET and caching
+    scope = 'api_write'
+    
+    def allow_request(self, request, view):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        return super().allow_request(request, view)
+
+
+class TokenAuthThrottle(TokenBucketThrottle):
+    # Password guessing through /api-token-auth/
+    scope = 'token_auth'
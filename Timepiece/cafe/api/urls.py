@@ -14,5 +14,7 @@ router.register(r'support-requests', views.SupportRequestViewSet, basename='supp
 router.register(r'support-messages', views.SupportMessageViewSet, basename='support-message')
 
 urlpatterns = [
+    path('cart/', views.CartView.as_view(), name='api-cart'),
+    path('export/<slug:table>.<slug:file_format>', views.ExportView.as_view(), name='api-export'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,18 +1,72 @@
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from cafe.models import Category, MenuItem, CustomerProfile, Order, OrderItem, Payment, Review, SupportRequest, SupportMessage
 from .serializers import (
     CategorySerializer, MenuItemSerializer, CustomerProfileSerializer,
     OrderSerializer, OrderItemSerializer, PaymentSerializer, ReviewSerializer,
-    SupportRequestSerializer, SupportMessageSerializer
+    SupportRequestSerializer, SupportMessageSerializer, parse_field_selection,
+    CartSerializer, CartLineUpdateSerializer, ExportFilterSerializer
 )
+from .filters import MenuSearchFilter
+from .pagination import OrderPagination, PaymentPagination, SupportRequestPagination
+from cafe.search import search_menu_items
+from cafe.autocomplete import autocomplete_index, TOP_K
+from cafe.conditional import fingerprint, menu_validators, not_modified, set_validators
+from cafe.cart import UserCartStore, apply_updates, load_menu_items, price_cart
+from cafe.ratings import AVERAGE_RATING
+from cafe.exports import EXPORT_FORMATS, EXPORT_TABLES, stream_export
+from django.http import Http404, StreamingHttpResponse
 import logging
 from django.utils import timezone
 
 security_logger = logging.getLogger('security')
 
+class EagerLoadingMixin:
+    # Applies the serializer's setup_eager_loading plan so nested fields don't fan out into per-row queries
+    # Only relations needed by the requested ?fields= / ?expand= are joined or prefetched
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        setup_eager_loading = getattr(self.get_serializer_class(), 'setup_eager_loading', None)
+        if setup_eager_loading is not None:
+            fields, expand = parse_field_selection(self.request)
+            queryset = setup_eager_loading(queryset, fields=fields, expand=expand)
+        return queryset
+
+class ConditionalGetMixin:
+    # Strong ETag validators for the polled menu endpoints
+    # A matching If-None-Match is answered with 304 after one aggregate query, before any serialization
+    fingerprint_timestamp_field = None
+    
+    def get_validators(self, queryset):
+        return menu_validators(
+            self.request, fingerprint(queryset, self.fingerprint_timestamp_field),
+            variant=(self.request.accepted_renderer.format,)
+        )
+    
+    def _conditional(self, queryset, render, *args, **kwargs):
+        etag = self.get_validators(queryset)
+        response = not_modified(self.request, etag)
+        if response is not None:
+            return response
+        return set_validators(render(self.request, *args, **kwargs), etag)
+    
+    def list(self, request, *args, **kwargs):
+        return self._conditional(self.filter_queryset(self.get_queryset()), super().list, *args, **kwargs)
+    
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError):
+            # Malformed lookup - let the normal retrieve answer with a 404
+            return super().retrieve(request, *args, **kwargs)
+        return self._conditional(queryset, super().retrieve, *args, **kwargs)
+
 class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
@@ -24,7 +78,7 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return obj.user == request.user
         return False
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -32,14 +86,47 @@ class CategoryViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['name']
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
+    fingerprint_timestamp_field = 'updated_at'
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, MenuSearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'is_available']
     search_fields = ['name', 'description']
-    ordering_fields = ['name', 'price', 'created_at']
+    ordering_fields = ['name', 'price', 'created_at', 'average_rating', 'rating_count']
+    
+    def get_queryset(self):
+        # average_rating is computed from the stored totals in the same SELECT, for ?ordering=-average_rating
+        return super().get_queryset().annotate(average_rating=AVERAGE_RATING)
+    
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def autocomplete(self, request):
+        # Typeahead suggestions answered from the in-memory prefix index - no database query
+        try:
+            limit = min(max(int(request.query_params.get('limit', TOP_K)), 1), TOP_K)
+        except ValueError:
+            limit = TOP_K
+        
+        suggestions = autocomplete_index.lookup(request.query_params.get('q', ''), limit)
+        return Response([
+            {'type': suggestion.kind, 'id': suggestion.id, 'label': suggestion.label}
+            for suggestion in suggestions
+        ])
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        # Ranked full-text search with prefix matching - /api/menu-items/search/?q=
+        query = request.query_params.get('q', '')
+        queryset = search_menu_items(self.filter_queryset(self.get_queryset()), query)
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def toggle_favorite(self, request, pk=None):
@@ -53,7 +140,7 @@ class MenuItemViewSet(viewsets.ModelViewSet):
         
         return Response({"success": True, "is_favorite": True})
 
-class CustomerProfileViewSet(viewsets.ModelViewSet):
+class CustomerProfileViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = CustomerProfile.objects.all()
     serializer_class = CustomerProfileSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
@@ -63,7 +150,7 @@ class CustomerProfileViewSet(viewsets.ModelViewSet):
             return CustomerProfile.objects.all()
         return CustomerProfile.objects.filter(user=self.request.user)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
@@ -75,8 +162,9 @@ class ReviewViewSet(viewsets.ModelViewSet):
         security_logger.info(f"User {self.request.user.username} is creating a review")
         serializer.save(customer=self.request.user)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
+    pagination_class = OrderPagination
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['status']
@@ -91,7 +179,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         security_logger.info(f"User {self.request.user.username} is creating an order")
         serializer.save(customer=self.request.user)
 
-class OrderItemViewSet(viewsets.ModelViewSet):
+class OrderItemViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = OrderItem.objects.all()
     serializer_class = OrderItemSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -101,12 +189,13 @@ class OrderItemViewSet(viewsets.ModelViewSet):
             return OrderItem.objects.all()
         return OrderItem.objects.filter(order__customer=self.request.user)
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    pagination_class = PaymentPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['order', 'status']
+    filterset_fields = ['order', 'payment_method']
     ordering_fields = ['payment_date']
     
     def get_queryset(self):
@@ -118,8 +207,9 @@ class PaymentViewSet(viewsets.ModelViewSet):
         security_logger.info(f"User {self.request.user.username} is making a payment")
         serializer.save()
 
-class SupportRequestViewSet(viewsets.ModelViewSet):
+class SupportRequestViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = SupportRequestSerializer
+    pagination_class = SupportRequestPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['status']
@@ -159,7 +249,7 @@ class SupportRequestViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(support_request)
         return Response(serializer.data)
 
-class SupportMessageViewSet(viewsets.ModelViewSet):
+class SupportMessageViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = SupportMessageSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -167,4 +257,67 @@ class SupportMessageViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_staff:
             return SupportMessage.objects.all()
-        return SupportMessage.objects.filter(support_request__customer=user)
\ No newline at end of file
+        return SupportMessage.objects.filter(support_request__customer=user)
+
+class CartView(APIView):
+    # /api/cart/ - the signed-in user's cart, priced against the current menu on every response
+    # PATCH takes a batch of line updates, e.g. [{"item": 3, "qty": 2}, {"item": 7, "qty": 0}], so a client
+    # sends one request per checkout screen instead of one per quantity change. Each request is one cart
+    # lookup, one menu query for every line involved and at most one write
+    permission_classes = [permissions.IsAuthenticated]
+    store = UserCartStore()
+    max_batch_size = 100
+    
+    def _respond(self, request, cart, menu_items, status_code=status.HTTP_200_OK):
+        priced = price_cart(cart, menu_items)
+        if cart.changed:
+            # Stale prices and items gone from the menu are written back so the cart stays revalidated
+            self.store.save(request, None, cart)
+        return Response(CartSerializer(priced).data, status=status_code)
+    
+    def get(self, request):
+        cart = self.store.load(request)
+        return self._respond(request, cart, load_menu_items(cart))
+    
+    def patch(self, request):
+        serializer = CartLineUpdateSerializer(data=request.data, many=True, max_length=self.max_batch_size)
+        serializer.is_valid(raise_exception=True)
+        updates = [(line['item'], line['qty']) for line in serializer.validated_data]
+        
+        cart = self.store.load(request)
+        menu_items = load_menu_items(set(cart) | {menu_item_id for menu_item_id, _ in updates})
+        errors = apply_updates(cart, updates, menu_items)
+        if errors:
+            # Same shape as DRF list validation errors - one entry per submitted line
+            return Response(
+                [{'item': [errors[position]]} if position in errors else {} for position in range(len(updates))],
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        
+        return self._respond(request, cart, menu_items)
+    
+    def delete(self, request):
+        cart = self.store.load(request)
+        cart.clear()
+        if cart.changed:
+            self.store.save(request, None, cart)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class ExportView(APIView):
+    # /api/export/<table>.<csv|jsonl>?since=&until=&status= - staff-only full dumps of orders,
+    # order-items or payments. Rows are streamed from a database cursor as they are formatted, so
+    # memory stays flat and the download starts at once instead of after 10-row API pages
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request, table, file_format):
+        if table not in EXPORT_TABLES or file_format not in EXPORT_FORMATS:
+            raise Http404
+        filters = ExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        
+        security_logger.info("User %s is exporting %s as %s", request.user.username, table, file_format)
+        response = StreamingHttpResponse(
+            stream_export(table, file_format, **filters.validated_data), content_type=EXPORT_FORMATS[file_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{table}.{file_format}"'
+        return response
@@ -7,3 +7,4 @@ class CafeConfig(AppConfig):
     
     def ready(self):
         import cafe.auth
+        import cafe.signals
@@ -2,18 +2,30 @@ from django.contrib.auth.signals import user_logged_in, user_logged_out, user_lo
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
+from rest_framework.settings import api_settings
 import logging
 
 # Security logger for audit trail - implements security monitoring requirement
+# Messages use lazy %-style arguments so nothing is formatted when the level is filtered,
+# and the extra= fields are written as structured keys (see cafe.logqueue.JSONFormatter)
 security_logger = logging.getLogger('security')
 
+LOG_LEVELS = {
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL,
+}
+
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
     # Track successful logins for security audit - part of security monitoring requirement
     ip_address = get_client_ip(request)
     security_logger.info(
-        f"Login successful - Username: {user.username}, IP: {ip_address}, "
-        f"User Agent: {request.META.get('HTTP_USER_AGENT', 'Unknown')}"
+        "Login successful - Username: %s, IP: %s, User Agent: %s",
+        user.username, ip_address, request.META.get('HTTP_USER_AGENT', 'Unknown'),
+        extra={'event_type': 'LOGIN', 'user': user.username, 'ip': ip_address,
+               'user_agent': request.META.get('HTTP_USER_AGENT', 'Unknown')},
     )
     
     # Update last login timestamp for user activity tracking
@@ -26,8 +38,10 @@ def log_user_logout(sender, request, user, **kwargs):
     if user:
         ip_address = get_client_ip(request)
         security_logger.info(
-            f"User logged out - Username: {user.username}, IP: {ip_address}, "
-            f"User Agent: {request.META.get('HTTP_USER_AGENT', 'Unknown')}"
+            "User logged out - Username: %s, IP: %s, User Agent: %s",
+            user.username, ip_address, request.META.get('HTTP_USER_AGENT', 'Unknown'),
+            extra={'event_type': 'LOGOUT', 'user': user.username, 'ip': ip_address,
+                   'user_agent': request.META.get('HTTP_USER_AGENT', 'Unknown')},
         )
 
 @receiver(user_login_failed)
@@ -37,39 +51,43 @@ def log_user_login_failed(sender, credentials, request, **kwargs):
     ip_address = get_client_ip(request)
     username = credentials.get('username', 'unknown')
     security_logger.warning(
-        f"Login failed - Username: {username}, IP: {ip_address}, "
-        f"User Agent: {request.META.get('HTTP_USER_AGENT', 'Unknown')}"
+        "Login failed - Username: %s, IP: %s, User Agent: %s",
+        username, ip_address, request.META.get('HTTP_USER_AGENT', 'Unknown'),
+        extra={'event_type': 'LOGIN_FAILED', 'user': username, 'ip': ip_address,
+               'user_agent': request.META.get('HTTP_USER_AGENT', 'Unknown')},
     )
 
 def get_client_ip(request):
     # Utility function to extract client IP, handling proxy scenarios
     # Important for accurate security logging and potential IP blocking
+    # X-Forwarded-For is written by the client, so it is only read when REST_FRAMEWORK['NUM_PROXIES']
+    # says how many trusted proxies append to it - the address the nearest of them saw is used, the
+    # same one DRF's throttles key on. Without proxies the connection's REMOTE_ADDR is the client
+    remote_addr = request.META.get('REMOTE_ADDR', 'unknown')
+    num_proxies = api_settings.NUM_PROXIES or 0
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR', 'unknown')
-    return ip
+    if num_proxies <= 0 or not x_forwarded_for:
+        return remote_addr
+    addresses = x_forwarded_for.split(',')
+    return addresses[-min(num_proxies, len(addresses))].strip()
 
 def log_security_event(request, event_type, message, level='info'):
     # Generic security event logger with severity levels
     # Provides comprehensive audit trail for security-related events
+    levelno = LOG_LEVELS.get(level, logging.INFO)
+    if not security_logger.isEnabledFor(levelno):
+        return
+    
     ip_address = get_client_ip(request)
     user = request.user.username if request.user.is_authenticated else 'anonymous'
     
-    log_message = (
-        f"[{event_type}] {message} - User: {user}, IP: {ip_address}, "
-        f"User Agent: {request.META.get('HTTP_USER_AGENT', 'Unknown')}"
+    security_logger.log(
+        levelno,
+        "[%s] %s - User: %s, IP: %s, User Agent: %s",
+        event_type, message, user, ip_address, request.META.get('HTTP_USER_AGENT', 'Unknown'),
+        extra={'event_type': event_type, 'user': user, 'ip': ip_address,
+               'user_agent': request.META.get('HTTP_USER_AGENT', 'Unknown')},
     )
-    
-    if level == 'warning':
-        security_logger.warning(log_message)
-    elif level == 'error':
-        security_logger.error(log_message)
-    elif level == 'critical':
-        security_logger.critical(log_message)
-    else:
-        security_logger.info(log_message)
 
 def log_otp_event(request, event, device=None):
     # Two-factor authentication logging - implements enhanced security requirement
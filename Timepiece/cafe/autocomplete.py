@@ -0,0 +1,266 @@
+from collections import namedtuple
+from django.core.cache import caches
+from django.db.models import Sum
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger('cafe')
+
+# Prefixes are indexed up to this many characters - longer queries are filtered from the deepest node
+MAX_PREFIX_LENGTH = 24
+
+# Number of suggestions precomputed per trie node - also the largest limit the endpoint accepts
+TOP_K = 10
+
+# Shared cache key counting committed autocomplete changes - lives next to the menu version
+AUTOCOMPLETE_GENERATION_KEY = 'cafe:autocomplete_generation'
+
+# Seconds an index is served before a full rebuild picks up new popularity (units sold)
+MAX_INDEX_AGE = 600
+
+Suggestion = namedtuple('Suggestion', ['kind', 'id', 'label', 'popularity'])
+
+
+def normalize(text):
+    # Case and accent insensitive form used for both indexing and lookups
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def index_terms(label):
+    # A label is findable from the start of any of its words, e.g. "latte" finds "Caramel Latte"
+    words = normalize(label).split(' ')
+    return {' '.join(words[position:]) for position in range(len(words)) if words[position]}
+
+
+class _Node:
+    __slots__ = ('children', 'keys', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()
+        self.top = None  # Cached best TOP_K keys, recomputed lazily after a change
+
+
+class PrefixIndex:
+    # In-memory prefix trie mapping typed prefixes to the most popular suggestions
+    # Every node caches its top-k keys, so a lookup is a walk of len(prefix) dict hops
+
+    def __init__(self, suggestions=()):
+        self._root = _Node()
+        self._entries = {}
+        self._terms = {}
+        for suggestion in suggestions:
+            self.add(suggestion)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _rank(self, key):
+        suggestion = self._entries.get(key)
+        if suggestion is None:
+            return (float('inf'), '')
+        return (-suggestion.popularity, suggestion.label)
+
+    def add(self, suggestion):
+        key = (suggestion.kind, suggestion.id)
+        if key in self._entries:
+            self.remove(suggestion.kind, suggestion.id)
+        terms = index_terms(suggestion.label)
+        self._entries[key] = suggestion
+        self._terms[key] = terms
+        for term in terms:
+            node = self._root
+            for char in term[:MAX_PREFIX_LENGTH]:
+                node = node.children.setdefault(char, _Node())
+                node.keys.add(key)
+                node.top = None
+
+    def remove(self, kind, id):
+        key = (kind, id)
+        if key not in self._entries:
+            return
+        for term in self._terms.pop(key):
+            path = []
+            node = self._root
+            for char in term[:MAX_PREFIX_LENGTH]:
+                child = node.children.get(char)
+                if child is None:
+                    break
+                path.append((node, char, child))
+                node = child
+            for parent, char, child in path:
+                child.keys.discard(key)
+                child.top = None
+            # Prune branches that no longer lead anywhere
+            for parent, char, child in reversed(path):
+                if child.keys:
+                    break
+                del parent.children[char]
+        del self._entries[key]
+
+    def lookup(self, prefix, limit=TOP_K):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        node = self._root
+        for char in prefix[:MAX_PREFIX_LENGTH]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        if len(prefix) > MAX_PREFIX_LENGTH:
+            # Rare long query - check the full prefix against the candidate terms
+            candidates = [
+                key for key in node.keys
+                if any(term.startswith(prefix) for term in self._terms[key])
+            ]
+            return [self._entries[key] for key in heapq.nsmallest(limit, candidates, key=self._rank)]
+
+        top = node.top
+        if top is None:
+            # Snapshot the keys so a concurrent signal-driven update cannot change the set mid-iteration
+            top = node.top = heapq.nsmallest(TOP_K, tuple(node.keys), key=self._rank)
+        entries = self._entries
+        return [entries[key] for key in top[:limit] if key in entries]
+
+
+class AutocompleteIndex:
+    # Per-process autocomplete index over available menu items and categories
+    # Loaded on first use and patched in place once a MenuItem/Category change commits. The index
+    # keeps its own generation in the shared version cache (not the menu version, which also moves
+    # for ratings and stock counts): every patch increments it, so other processes see they missed
+    # a change and rebuild, while the process that made the change stays current without a rebuild.
+    # A full rebuild every MAX_INDEX_AGE seconds refreshes popularity (units sold)
+
+    def __init__(self):
+        self._index = None
+        self._generation = None
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._index is not None
+
+    def _generation_store(self):
+        from .cache import menu_cache
+
+        return caches[menu_cache.version_cache]
+
+    def _shared_generation(self):
+        store = self._generation_store()
+        generation = store.get(AUTOCOMPLETE_GENERATION_KEY)
+        if generation is None:
+            store.add(AUTOCOMPLETE_GENERATION_KEY, 1, timeout=None)
+            generation = store.get(AUTOCOMPLETE_GENERATION_KEY, 1)
+        return generation
+
+    def _bump_generation(self):
+        # Called with the lock held after patching - if no other process changed the menu since this
+        # index was last in step, it is current at the new generation; otherwise it must rebuild
+        store = self._generation_store()
+        try:
+            generation = store.incr(AUTOCOMPLETE_GENERATION_KEY)
+        except ValueError:
+            store.set(AUTOCOMPLETE_GENERATION_KEY, 2, timeout=None)
+            generation = 2
+        self._generation = generation if generation == (self._generation or 0) + 1 else None
+
+    def _load_suggestions(self):
+        from .models import Category, MenuItem, OrderItem
+
+        # Popularity is the number of units sold, aggregated once per build
+        sold = dict(
+            OrderItem.objects.values_list('menu_item_id').annotate(total=Sum('quantity')).order_by()
+        )
+        category_popularity = {}
+        suggestions = []
+        for item_id, name, category_id in MenuItem.objects.filter(is_available=True).values_list(
+            'id', 'name', 'category_id'
+        ):
+            popularity = sold.get(item_id) or 0
+            category_popularity[category_id] = category_popularity.get(category_id, 0) + popularity
+            suggestions.append(Suggestion('item', item_id, name, popularity))
+        for category_id, name in Category.objects.values_list('id', 'name'):
+            suggestions.append(Suggestion('category', category_id, name, category_popularity.get(category_id, 0)))
+        return suggestions
+
+    def _build(self):
+        # Read the generation first so changes committed while loading trigger another rebuild
+        generation = self._shared_generation()
+        self._index = PrefixIndex(self._load_suggestions())
+        self._generation, self._built_at = generation, time.monotonic()
+        logger.debug("Autocomplete index rebuilt with %d entries", len(self._index))
+        return self._index
+
+    def rebuild(self):
+        with self._lock:
+            return self._build()
+
+    def _is_current(self):
+        return (
+            self._index is not None
+            and self._generation == self._shared_generation()
+            and time.monotonic() - self._built_at < MAX_INDEX_AGE
+        )
+
+    def _current_index(self):
+        # Hot path: no lock and no database query while the generation is unchanged
+        index = self._index
+        if index is not None and self._is_current():
+            return index
+        with self._lock:
+            if self._is_current():
+                return self._index
+            return self._build()
+
+    def lookup(self, prefix, limit=TOP_K):
+        return self._current_index().lookup(prefix, min(limit, TOP_K))
+
+    def _patch(self, apply):
+        with self._lock:
+            if self._index is None:
+                # Not used yet in this process - the first lookup builds from the committed data
+                self._bump_generation()
+                return
+            apply(self._index)
+            self._bump_generation()
+
+    def update_item(self, menu_item_id, name, is_available):
+        # Incremental refresh for a saved menu item - call once the change has committed (see cafe.signals)
+        def apply(index):
+            existing = index._entries.get(('item', menu_item_id))
+            if is_available:
+                popularity = existing.popularity if existing else 0
+                index.add(Suggestion('item', menu_item_id, name, popularity))
+            else:
+                index.remove('item', menu_item_id)
+        self._patch(apply)
+
+    def remove_item(self, menu_item_id):
+        self._patch(lambda index: index.remove('item', menu_item_id))
+
+    def update_category(self, category_id, name):
+        def apply(index):
+            existing = index._entries.get(('category', category_id))
+            popularity = existing.popularity if existing else 0
+            index.add(Suggestion('category', category_id, name, popularity))
+        self._patch(apply)
+
+    def remove_category(self, category_id):
+        self._patch(lambda index: index.remove('category', category_id))
+
+    def reset(self):
+        with self._lock:
+            self._index = None
+            self._generation = None
+            self._built_at = None
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,174 @@
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+import pickle
+import threading
+
+# Shared cache key holding the global menu version - bumped whenever a Category or MenuItem changes
+MENU_VERSION_KEY = 'cafe:menu_version'
+
+DEFAULT_MENU_CACHE_SETTINGS = {
+    'MAX_ENTRIES': 512,  # Upper bound on cached fragments and query results per process
+    'MAX_BYTES': 8 * 1024 * 1024,  # Approximate memory budget for cached values
+    'VERSION_CACHE': 'default',  # Cache alias storing the menu version, must be shared across workers in production
+}
+
+
+def _estimate_size(value):
+    # Rough size of a cached value - rendered fragments are measured directly, anything else by its pickle
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 1024
+
+
+class LRUCache:
+    # Thread-safe in-process LRU cache bounded by entry count and approximate size
+    # Keeps hit/miss/eviction counters so cache effectiveness can be monitored
+
+    def __init__(self, max_entries=512, max_bytes=8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, size = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            # Never let a single oversized value flush the whole cache
+            return
+        with self._lock:
+            if key in self._data:
+                self._size -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self._size += size
+            while len(self._data) > self.max_entries or self._size > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._size -= entry[1]
+
+    def delete_matching(self, predicate):
+        # Drop every entry whose value satisfies predicate - O(entries), meant for rare invalidations
+        with self._lock:
+            for key in [key for key, (value, size) in self._data.items() if predicate(value)]:
+                self._size -= self._data.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MenuCache(LRUCache):
+    # Cache for public menu pages - every entry is keyed by the global menu version
+    # so a Category/MenuItem change makes all previously cached entries unreachable
+
+    def __init__(self, max_entries=512, max_bytes=8 * 1024 * 1024, version_cache='default'):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+        self.version_cache = version_cache
+
+    def _version_store(self):
+        return caches[self.version_cache]
+
+    def get_version(self):
+        store = self._version_store()
+        version = store.get(MENU_VERSION_KEY)
+        if version is None:
+            store.add(MENU_VERSION_KEY, 1, timeout=None)
+            version = store.get(MENU_VERSION_KEY, 1)
+        return version
+
+    def bump_version(self):
+        store = self._version_store()
+        try:
+            version = store.incr(MENU_VERSION_KEY)
+        except ValueError:
+            # Key missing (first edit or evicted) - start a new version sequence
+            store.set(MENU_VERSION_KEY, 2, timeout=None)
+            version = 2
+        # Entries from older versions can never be hit again, free them straight away
+        self.clear()
+        return version
+
+    def get_or_set(self, key, builder):
+        # Return the cached value for key under the current menu version, building it on a miss
+        versioned_key = (self.get_version(), key)
+        missing = object()
+        value = self.get(versioned_key, missing)
+        if value is missing:
+            value = builder()
+            self.set(versioned_key, value)
+        return value
+
+
+def _build_menu_cache():
+    options = dict(DEFAULT_MENU_CACHE_SETTINGS)
+    options.update(getattr(settings, 'MENU_CACHE', {}))
+    return MenuCache(
+        max_entries=options['MAX_ENTRIES'],
+        max_bytes=options['MAX_BYTES'],
+        version_cache=options['VERSION_CACHE'],
+    )
+
+
+menu_cache = _build_menu_cache()
+
+
+def make_key(*parts):
+    # Build a stable cache key from view name and filter values
+    return ':'.join(str(part) for part in parts)
+
+
+def cached_query(key, builder):
+    # Cache a materialised query result (e.g. a list of model instances) for the current menu version
+    return menu_cache.get_or_set(make_key('query', key), builder)
+
+
+def invalidate_menu():
+    # Bump the menu version now and again once the surrounding transaction commits,
+    # so a reader that repopulated the cache between the two cannot keep stale data
+    menu_cache.bump_version()
+    transaction.on_commit(menu_cache.bump_version)
@@ -0,0 +1,291 @@
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import MenuItem, SavedCart
+import secrets
+
+# price is the menu price the customer saw when adding the item, used to warn about repricing at checkout
+CartLine = namedtuple('CartLine', ['quantity', 'price'])
+
+# A cart line checked against the current menu row - unavailable lines are kept but left out of the total
+PricedLine = namedtuple('PricedLine', ['item', 'name', 'qty', 'unit_price', 'subtotal', 'is_available', 'price_changed'])
+
+# repriced lists the names of items whose stored price was out of date and has been refreshed
+PricedCart = namedtuple('PricedCart', ['lines', 'item_count', 'total', 'unavailable', 'repriced'])
+
+# Upper bound for one line, so a client cannot build an order the kitchen could never make
+MAX_LINE_QUANTITY = 99
+
+DEFAULT_CART_STORE_SETTINGS = {
+    'BACKEND': 'cafe.cart.SessionCartStore',
+    'OPTIONS': {},
+}
+
+# Carts abandoned for this long are forgotten by the cookie and cache stores
+CART_MAX_AGE = 14 * 24 * 60 * 60
+
+
+class Cart:
+    # Shopping cart of menu item id -> CartLine, tracking whether anything actually changed
+    # so stores only write when the customer modified it
+
+    def __init__(self, lines=None):
+        self._lines = dict(lines or {})
+        self.changed = False
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    def __contains__(self, menu_item_id):
+        return menu_item_id in self._lines
+
+    def __iter__(self):
+        return iter(self._lines)
+
+    def items(self):
+        return self._lines.items()
+
+    def get(self, menu_item_id):
+        return self._lines.get(menu_item_id)
+
+    def add(self, menu_item_id, quantity, price):
+        line = self._lines.get(menu_item_id)
+        self._set(menu_item_id, CartLine((line.quantity if line else 0) + quantity, price))
+
+    def set_quantity(self, menu_item_id, quantity):
+        line = self._lines.get(menu_item_id)
+        if line is None:
+            return
+        self.set_line(menu_item_id, quantity, line.price)
+
+    def set_line(self, menu_item_id, quantity, price):
+        # Exact quantity and price for a line, adding it if needed - zero or less removes it
+        if quantity <= 0:
+            self.remove(menu_item_id)
+        else:
+            self._set(menu_item_id, CartLine(quantity, price))
+
+    def remove(self, menu_item_id):
+        if self._lines.pop(menu_item_id, None) is not None:
+            self.changed = True
+
+    def clear(self):
+        if self._lines:
+            self._lines.clear()
+            self.changed = True
+
+    def _set(self, menu_item_id, line):
+        if self._lines.get(menu_item_id) != line:
+            self._lines[menu_item_id] = line
+            self.changed = True
+
+    def as_checkout_data(self):
+        # The {item_id: {'quantity', 'price'}} shape cafe.checkout.place_order reads
+        return {
+            str(menu_item_id): {'quantity': line.quantity, 'price': str(line.price) if line.price is not None else None}
+            for menu_item_id, line in self._lines.items()
+        }
+
+    def encode(self):
+        # Compact form, e.g. "12:2:3.50|7:1:2.00" - a few bytes per line instead of a nested dict with names
+        return '|'.join(
+            f"{menu_item_id}:{line.quantity}:{'' if line.price is None else line.price}"
+            for menu_item_id, line in self._lines.items()
+        )
+
+    @classmethod
+    def decode(cls, value):
+        # Accepts the compact form and the old session dict format; anything malformed yields an empty cart
+        lines = {}
+        if isinstance(value, dict):
+            for item_id, item_data in value.items():
+                try:
+                    price = item_data.get('price')
+                    lines[int(item_id)] = CartLine(int(item_data['quantity']), Decimal(price) if price else None)
+                except (AttributeError, KeyError, TypeError, ValueError, InvalidOperation):
+                    continue
+        elif isinstance(value, str) and value:
+            for entry in value.split('|'):
+                try:
+                    item_id, quantity, price = entry.split(':')
+                    lines[int(item_id)] = CartLine(int(quantity), Decimal(price) if price else None)
+                except (ValueError, InvalidOperation):
+                    continue
+        return cls(lines)
+
+
+class SessionCartStore:
+    # Cart inside the Django session (database-backed by default) - the session is only marked
+    # modified when the cart changed, so browsing and viewing the cart never rewrite the session row
+    session_key = 'cart'
+
+    def load(self, request):
+        return Cart.decode(request.session.get(self.session_key))
+
+    def save(self, request, response, cart):
+        if cart:
+            request.session[self.session_key] = cart.encode()
+        else:
+            request.session.pop(self.session_key, None)
+        return response
+
+
+class SignedCookieCartStore:
+    # Cart in a signed cookie - no server-side write at all, at the cost of a few hundred bytes per request
+    cookie_name = 'cart'
+    salt = 'cafe.cart'
+
+    def __init__(self, max_age=CART_MAX_AGE):
+        self.max_age = max_age
+
+    def load(self, request):
+        return Cart.decode(request.get_signed_cookie(self.cookie_name, default=None, salt=self.salt, max_age=self.max_age))
+
+    def save(self, request, response, cart):
+        if cart:
+            response.set_signed_cookie(
+                self.cookie_name, cart.encode(), salt=self.salt, max_age=self.max_age,
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        else:
+            response.delete_cookie(self.cookie_name, samesite='Lax')
+        return response
+
+
+class CacheCartStore:
+    # Cart in a Django cache keyed by a random cart id cookie - cheap writes that bypass the session table
+    cookie_name = 'cart_id'
+
+    def __init__(self, cache_alias='default', max_age=CART_MAX_AGE):
+        self.cache_alias = cache_alias
+        self.max_age = max_age
+
+    def _key(self, cart_id):
+        return f"cafe:cart:{cart_id}"
+
+    def load(self, request):
+        cart_id = request.COOKIES.get(self.cookie_name)
+        if not cart_id:
+            return Cart()
+        return Cart.decode(caches[self.cache_alias].get(self._key(cart_id)))
+
+    def save(self, request, response, cart):
+        cart_id = request.COOKIES.get(self.cookie_name)
+        if not cart:
+            if cart_id:
+                caches[self.cache_alias].delete(self._key(cart_id))
+            return response
+        if not cart_id:
+            cart_id = secrets.token_urlsafe(16)
+            response.set_cookie(
+                self.cookie_name, cart_id, max_age=self.max_age,
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        caches[self.cache_alias].set(self._key(cart_id), cart.encode(), self.max_age)
+        return response
+
+
+class UserCartStore:
+    # Cart saved per signed-in user in cafe.models.SavedCart - used by the API, where token clients
+    # have no session. Loading is one indexed lookup and saving one upsert (or delete when emptied)
+
+    def load(self, request):
+        return Cart.decode(SavedCart.objects.filter(user=request.user).values_list('contents', flat=True).first())
+
+    def save(self, request, response, cart):
+        if cart:
+            SavedCart.objects.bulk_create(
+                [SavedCart(user=request.user, contents=cart.encode(), updated_at=timezone.now())],
+                update_conflicts=True, unique_fields=['user'], update_fields=['contents', 'updated_at'],
+            )
+        else:
+            SavedCart.objects.filter(user=request.user).delete()
+        return response
+
+
+def _build_cart_store():
+    options = dict(DEFAULT_CART_STORE_SETTINGS)
+    options.update(getattr(settings, 'CART_STORE', {}))
+    return import_string(options['BACKEND'])(**options['OPTIONS'])
+
+
+cart_store = _build_cart_store()
+
+
+def get_cart(request):
+    # Load the cart once per request
+    cart = getattr(request, '_cart', None)
+    if cart is None:
+        cart = request._cart = cart_store.load(request)
+    return cart
+
+
+def load_menu_items(menu_item_ids):
+    # The menu rows a cart needs, in one query
+    return MenuItem.objects.only('id', 'name', 'price', 'is_available').in_bulk(list(menu_item_ids))
+
+
+def price_cart(cart, menu_items):
+    # Revalidate every line against the current menu: lines for items removed from the menu are dropped,
+    # stale prices are replaced with the menu price, and unavailable items are flagged and not totalled
+    lines = []
+    item_count = 0
+    total = Decimal('0.00')
+    unavailable = []
+    repriced = []
+    for menu_item_id, line in list(cart.items()):
+        menu_item = menu_items.get(menu_item_id)
+        if menu_item is None:
+            cart.remove(menu_item_id)
+            continue
+        price_changed = line.price is not None and line.price != menu_item.price
+        if price_changed:
+            repriced.append(menu_item.name)
+        cart.set_line(menu_item_id, line.quantity, menu_item.price)
+
+        subtotal = menu_item.price * line.quantity
+        if menu_item.is_available:
+            item_count += line.quantity
+            total += subtotal
+        else:
+            unavailable.append(menu_item_id)
+        lines.append(PricedLine(
+            menu_item_id, menu_item.name, line.quantity, menu_item.price, subtotal, menu_item.is_available, price_changed
+        ))
+    return PricedCart(lines, item_count, total, unavailable, repriced)
+
+
+def apply_updates(cart, updates, menu_items):
+    # Apply a batch of (menu item id, quantity) updates all-or-nothing - quantity 0 removes the line
+    # Returns {position: error}; nothing is changed when any update is invalid
+    errors = {}
+    for position, (menu_item_id, quantity) in enumerate(updates):
+        if quantity <= 0:
+            continue
+        menu_item = menu_items.get(menu_item_id)
+        if menu_item is None:
+            errors[position] = f"Item #{menu_item_id} is not on the menu."
+        elif not menu_item.is_available:
+            errors[position] = f"{menu_item.name} is currently unavailable."
+    if errors:
+        return errors
+
+    for menu_item_id, quantity in updates:
+        menu_item = menu_items.get(menu_item_id)
+        cart.set_line(menu_item_id, quantity, menu_item.price if menu_item is not None else None)
+    return errors
+
+
+def save_cart(request, response):
+    # Persist the request's cart onto the response - a no-op unless it changed
+    cart = getattr(request, '_cart', None)
+    if cart is not None and cart.changed:
+        cart_store.save(request, response, cart)
+        cart.changed = False
+    return response
@@ -0,0 +1,91 @@
+from collections import namedtuple
+from decimal import Decimal
+from django.db import transaction
+from .models import MenuItem, Order, OrderItem, Payment
+from .inventory import InsufficientStock, reserve_stock
+import logging
+
+logger = logging.getLogger('cafe')
+
+
+class CheckoutError(Exception):
+    # Raised when a cart cannot be turned into an order - nothing is written in that case
+    def __init__(self, message, problems=None):
+        super().__init__(message)
+        self.problems = problems or []
+
+
+# repriced lists the names of items whose menu price changed since they were added to the cart
+CheckoutResult = namedtuple('CheckoutResult', ['order', 'payment', 'repriced'])
+
+
+def _parse_cart(cart):
+    # Normalise session cart data into {menu_item_id: (quantity, cart_price)}
+    lines = {}
+    for item_id, item_data in cart.items():
+        try:
+            menu_item_id = int(item_id)
+            quantity = int(item_data['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise CheckoutError("Your cart contains an invalid item.")
+        if quantity < 1:
+            continue
+        price = item_data.get('price')
+        lines[menu_item_id] = (quantity, Decimal(price) if price is not None else None)
+    return lines
+
+
+def place_order(user, cart, notes='', payment_method='ONLINE'):
+    # Turn a session cart into an order in a constant number of queries:
+    # one bulk menu lookup, one stock update, one order insert, one bulk insert of lines and one payment insert.
+    # Prices and availability are always taken from the database, never from the session.
+    lines = _parse_cart(cart)
+    if not lines:
+        raise CheckoutError("Your cart is empty.")
+
+    with transaction.atomic():
+        menu_items = MenuItem.objects.in_bulk(list(lines))
+
+        problems = []
+        for menu_item_id in lines:
+            menu_item = menu_items.get(menu_item_id)
+            if menu_item is None:
+                problems.append(f"Item #{menu_item_id} is no longer on the menu")
+            elif not menu_item.is_available:
+                problems.append(f"{menu_item.name} is currently unavailable")
+        if problems:
+            raise CheckoutError("Some items in your cart can no longer be ordered.", problems)
+
+        # One conditional UPDATE for every stock-tracked line - see cafe.inventory
+        try:
+            reserve_stock({menu_item_id: quantity for menu_item_id, (quantity, _) in lines.items()}, menu_items)
+        except InsufficientStock as error:
+            raise CheckoutError("Some items in your cart are out of stock.", [
+                f"Only {available} x {menu_items[menu_item_id].name} left" for menu_item_id, available in error.shortages
+            ])
+
+        total_amount = Decimal('0.00')
+        repriced = []
+        order_items = []
+        for menu_item_id, (quantity, cart_price) in lines.items():
+            menu_item = menu_items[menu_item_id]
+            if cart_price is not None and cart_price != menu_item.price:
+                repriced.append(menu_item.name)
+            total_amount += menu_item.price * quantity
+            order_items.append(OrderItem(menu_item=menu_item, quantity=quantity, price=menu_item.price))
+
+        order = Order.objects.create(customer=user, total_amount=total_amount, notes=notes)
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+
+        # Demo payment creation - in production would integrate with payment gateway
+        payment = Payment.objects.create(
+            order=order,
+            amount=total_amount,
+            payment_method=payment_method,
+            transaction_id=f"DEMO-{order.order_number}",
+        )
+
+    logger.info("Order %s placed with %d lines", order.order_number, len(order_items))
+    return CheckoutResult(order=order, payment=payment, repriced=repriced)
@@ -0,0 +1,57 @@
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from .cache import menu_cache
+import hashlib
+
+
+def fingerprint(queryset, timestamp_field=None):
+    # Summarise a result set in one aggregate query - row count, highest pk and newest modification time
+    # Inserts change the count/pk, deletes the count, and saves bump the auto_now timestamp
+    aggregates = {'count': Count('pk'), 'last_pk': Max('pk')}
+    if timestamp_field:
+        aggregates['last_modified'] = Max(timestamp_field)
+    return queryset.order_by().aggregate(**aggregates)
+
+
+def fingerprint_rows(rows, timestamp_field=None):
+    # Same summary for rows that are already loaded (e.g. from the menu cache) - no query needed
+    summary = {'count': len(rows), 'last_pk': max((row.pk for row in rows), default=None)}
+    if timestamp_field:
+        summary['last_modified'] = max((getattr(row, timestamp_field) for row in rows), default=None)
+    return summary
+
+
+def make_etag(*parts):
+    # Strong validator - the parts must identify the exact bytes of the representation
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def menu_validators(request, summary, variant=()):
+    # ETag for a menu representation, keyed by the menu version (bumped on every Category/MenuItem
+    # change), the fingerprint and whatever else shapes the body. There is deliberately no
+    # Last-Modified: the newest updated_at of the rows still in the result does not move when an
+    # item is deleted, drops out of the filter or its category is renamed, and it cannot express
+    # per-user variants - an If-Modified-Since check against it would hand out stale 304s
+    last_modified = summary.get('last_modified')
+    return make_etag(
+        menu_cache.get_version(), summary['count'], summary['last_pk'],
+        last_modified.isoformat() if last_modified else '', request.get_full_path(), *variant
+    )
+
+
+def not_modified(request, etag):
+    # Returns a 304 response when the client's If-None-Match still matches, otherwise None
+    return get_conditional_response(request, etag=etag)
+
+
+def set_validators(response, etag):
+    if response.status_code == 200:
+        response['ETag'] = etag
+    return response
+
+
+def has_pending_messages(request):
+    # len() does not mark the messages as read - pages carrying a flash message must be re-rendered
+    return len(get_messages(request)) > 0
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django_otp import device_classes
+import threading
+
+DEFAULT_OTP_DEVICE_CACHE_SETTINGS = {
+    'TIMEOUT': 60,  # Seconds a device-presence answer is trusted - signals also invalidate it on device changes
+    'CACHE': 'default',  # Cache alias holding the answers, should be shared across workers in production
+}
+
+
+def _cache_key(user_pk):
+    return f"cafe:otp_device:{user_pk}"
+
+
+def lookup_devices(user):
+    # Ask each OTP device table in turn whether the user has a confirmed device
+    # Returns (has_device, queries_run) - the "no device" answer costs one query per device model
+    queries = 0
+    for model in device_classes():
+        queries += 1
+        if model.objects.devices_for_user(user, confirmed=True).exists():
+            return True, queries
+    return False, queries
+
+
+class DevicePresenceCache:
+    # Short-lived per-user cache of "does this user have a confirmed OTP device"
+    # Keeps hit/miss counters and how many device-table queries the cache has avoided
+
+    def __init__(self, timeout=60, cache_alias='default'):
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.queries_saved = 0
+
+    def _store(self):
+        return caches[self.cache_alias]
+
+    def has_device(self, user):
+        if user.is_anonymous:
+            return False
+
+        # The query count is stored with the answer so each hit knows what it saved
+        cached = self._store().get(_cache_key(user.pk))
+        if cached is not None:
+            has_device, queries = cached
+            with self._lock:
+                self.hits += 1
+                self.queries_saved += queries
+            return has_device
+
+        has_device, queries = lookup_devices(user)
+        self._store().set(_cache_key(user.pk), (has_device, queries), self.timeout)
+        with self._lock:
+            self.misses += 1
+        return has_device
+
+    def invalidate(self, user_pk):
+        self._store().delete(_cache_key(user_pk))
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.queries_saved = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'queries_saved': self.queries_saved,
+                'queries_saved_per_request': self.queries_saved / lookups if lookups else 0.0,
+            }
+
+
+def _build_device_cache():
+    options = dict(DEFAULT_OTP_DEVICE_CACHE_SETTINGS)
+    options.update(getattr(settings, 'OTP_DEVICE_CACHE', {}))
+    return DevicePresenceCache(timeout=options['TIMEOUT'], cache_alias=options['CACHE'])
+
+
+device_cache = _build_device_cache()
+
+
+def user_has_device(user):
+    # Cached drop-in for django_otp.user_has_device (confirmed devices only)
+    return device_cache.has_device(user)
+
+
+def invalidate_user_devices(user_pk):
+    # Forget the answer now and again once the transaction commits, so a concurrent
+    # request cannot re-cache the pre-change answer in between
+    device_cache.invalidate(user_pk)
+    transaction.on_commit(lambda: device_cache.invalidate(user_pk))
@@ -0,0 +1,138 @@
+from collections import namedtuple
+from .models import Order, OrderItem, Payment
+import csv
+import datetime
+import decimal
+import json
+import uuid
+
+# One exportable table - columns are (header, values_list lookup) pairs, date_field and status_field
+# are the lookups behind the since/until and status filters, ordering follows an index so rows
+# stream out in index order without the database sorting the whole result first
+ExportTable = namedtuple('ExportTable', ['model', 'columns', 'date_field', 'status_field', 'ordering'])
+
+EXPORT_TABLES = {
+    'orders': ExportTable(
+        Order,
+        [
+            ('id', 'id'),
+            ('order_number', 'order_number'),
+            ('customer_id', 'customer_id'),
+            ('customer', 'customer__username'),
+            ('order_date', 'order_date'),
+            ('status', 'status'),
+            ('total_amount', 'total_amount'),
+            ('notes', 'notes'),
+        ],
+        'order_date', 'status', ('order_date', 'id'),
+    ),
+    'order-items': ExportTable(
+        OrderItem,
+        [
+            ('id', 'id'),
+            ('order_id', 'order_id'),
+            ('order_number', 'order__order_number'),
+            ('order_date', 'order__order_date'),
+            ('order_status', 'order__status'),
+            ('menu_item_id', 'menu_item_id'),
+            ('menu_item', 'menu_item__name'),
+            ('quantity', 'quantity'),
+            ('price', 'price'),
+        ],
+        'order__order_date', 'order__status', ('id',),
+    ),
+    'payments': ExportTable(
+        Payment,
+        [
+            ('id', 'id'),
+            ('order_id', 'order_id'),
+            ('order_number', 'order__order_number'),
+            ('order_status', 'order__status'),
+            ('payment_date', 'payment_date'),
+            ('payment_method', 'payment_method'),
+            ('amount', 'amount'),
+            ('transaction_id', 'transaction_id'),
+        ],
+        'payment_date', 'order__status', ('payment_date', 'id'),
+    ),
+}
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched from the database cursor at a time
+LINES_PER_WRITE = 500  # Formatted rows joined into each chunk handed to the response or file
+
+# Leading characters that make a spreadsheet evaluate a cell as a formula (CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def export_rows(table_name, since=None, until=None, status=None, chunk_size=EXPORT_CHUNK_SIZE):
+    # Plain tuples straight from the cursor, chunk_size rows at a time - no model instances, no
+    # result cache, so memory does not grow with the number of rows. since is inclusive, until exclusive
+    table = EXPORT_TABLES[table_name]
+    queryset = table.model.objects.all()
+    if since is not None:
+        queryset = queryset.filter(**{f'{table.date_field}__gte': since})
+    if until is not None:
+        queryset = queryset.filter(**{f'{table.date_field}__lt': until})
+    if status:
+        queryset = queryset.filter(**{table.status_field: status})
+    lookups = [lookup for _, lookup in table.columns]
+    return queryset.order_by(*table.ordering).values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def _cell(value):
+    # Exact text for money and identifiers, ISO 8601 for timestamps
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def _csv_cell(value):
+    # Customer-controlled text (order notes, usernames, transaction ids) is quoted with a leading
+    # apostrophe when it would run as a formula once staff open the file. Only text columns are
+    # touched - amounts are Decimals, so a negative amount keeps its minus sign
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return _cell(value)
+
+
+class _Line:
+    # File-like target for csv.writer that hands each formatted row back instead of buffering it
+    def write(self, value):
+        return value
+
+
+def _csv_lines(headers, rows):
+    writer = csv.writer(_Line())
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def _jsonl_lines(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, map(_cell, row)))) + '\n'
+
+
+def stream_export(table_name, file_format, since=None, until=None, status=None, chunk_size=EXPORT_CHUNK_SIZE):
+    # Text chunks of the export for StreamingHttpResponse or a file. The CSV header goes out before
+    # the query runs, so a client sees the first byte at once however large the export is
+    headers = [header for header, _ in EXPORT_TABLES[table_name].columns]
+    if file_format == 'csv':
+        yield csv.writer(_Line()).writerow(headers)
+    format_lines = _csv_lines if file_format == 'csv' else _jsonl_lines
+    rows = export_rows(table_name, since=since, until=until, status=status, chunk_size=chunk_size)
+
+    batch = []
+    for line in format_lines(headers, rows):
+        batch.append(line)
+        if len(batch) == LINES_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
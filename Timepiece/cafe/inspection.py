@@ -0,0 +1,132 @@
+from django.conf import settings
+from .cache import LRUCache
+import re
+
+# Attack signatures checked against every query string - grouped by the category reported in the security log
+DEFAULT_SIGNATURES = {
+    'sql': [
+        r'(\%27)|(\')|(\-\-)|(\%23)|(#)',
+        r'((\%3D)|(=))[^\n]*((\%27)|(\')|(\-\-)|(\%3B)|(;))',
+        r'((\%27)|(\'))union',
+        r'exec(\s|\+)+(s|x)p\w+',
+    ],
+    'xss': [
+        r'<script',
+        r'javascript:',
+        r'onerror=',
+        r'onload=',
+        r'eval\(',
+    ],
+}
+
+# URL prefixes exempt from two-factor authentication - balance security with usability
+DEFAULT_OTP_EXEMPT_PREFIXES = [
+    '/login/',
+    '/two_factor/setup/',
+    '/static/',
+    '/media/',
+    '/api/',
+]
+
+DEFAULT_INSPECTION_SETTINGS = {
+    'SIGNATURES': DEFAULT_SIGNATURES,
+    'OTP_EXEMPT_PREFIXES': DEFAULT_OTP_EXEMPT_PREFIXES,
+    'CACHE_ENTRIES': 1024,  # Distinct query strings whose verdict is remembered per process
+    'MAX_CACHED_LENGTH': 1024,  # Longer query strings are always scanned, so attackers cannot bloat the cache
+}
+
+
+class SignatureScanner:
+    # Compiles every signature into a single case-insensitive alternation and scans input once
+    # Each alternative sits in a zero-width lookahead so a long SQL match cannot swallow an XSS
+    # signature further along - every category present in the input is reported
+
+    def __init__(self, signatures, cache_entries=1024, max_cached_length=1024):
+        alternatives = []
+        self._categories = {}
+        for category, patterns in signatures.items():
+            group_prefix = re.sub(r'\W', '_', category)
+            for position, pattern in enumerate(patterns):
+                re.compile(pattern)  # Fail fast with the offending signature in the traceback
+                group = f"{group_prefix}_{position}"
+                self._categories[group] = category
+                alternatives.append(f"(?P<{group}>{pattern})")
+        self.category_count = len(signatures)
+        self._pattern = re.compile(f"(?=(?:{'|'.join(alternatives)}))", re.IGNORECASE) if alternatives else None
+        self._cache = LRUCache(max_entries=cache_entries)
+        self.max_cached_length = max_cached_length
+
+    def scan(self, text):
+        # Returns the categories of all signatures found in text, in order of first appearance
+        if not text or self._pattern is None:
+            return ()
+
+        cacheable = len(text) <= self.max_cached_length
+        if cacheable:
+            found = self._cache.get(text)
+            if found is not None:
+                return found
+
+        found = []
+        for match in self._pattern.finditer(text):
+            category = self._categories[match.lastgroup]
+            if category not in found:
+                found.append(category)
+                if len(found) == self.category_count:
+                    break
+        found = tuple(found)
+
+        if cacheable:
+            self._cache.set(text, found)
+        return found
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class PrefixTree:
+    # Character trie answering "does this path start with any of the prefixes" in one walk of the path
+
+    _TERMINAL = object()
+
+    def __init__(self, prefixes=()):
+        self._root = {}
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def add(self, prefix):
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self._TERMINAL] = True
+
+    def matches(self, path):
+        node = self._root
+        if self._TERMINAL in node:
+            return True
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                return False
+            if self._TERMINAL in node:
+                return True
+        return False
+
+
+def inspection_settings():
+    options = dict(DEFAULT_INSPECTION_SETTINGS)
+    options.update(getattr(settings, 'SECURITY_INSPECTION', {}))
+    return options
+
+
+def build_scanner():
+    options = inspection_settings()
+    return SignatureScanner(
+        options['SIGNATURES'],
+        cache_entries=options['CACHE_ENTRIES'],
+        max_cached_length=options['MAX_CACHED_LENGTH'],
+    )
+
+
+def build_exempt_paths():
+    return PrefixTree(inspection_settings()['OTP_EXEMPT_PREFIXES'])
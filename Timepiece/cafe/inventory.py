@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import MenuItem
+from .cache import invalidate_menu
+from .autocomplete import autocomplete_index
+
+
+class InsufficientStock(Exception):
+    # Raised inside the checkout transaction when a line asks for more than is left - the
+    # decrements already made roll back with it. shortages lists (menu_item_id, available) pairs
+    def __init__(self, shortages):
+        super().__init__("Not enough stock for some items.")
+        self.shortages = shortages
+
+
+def _per_item(quantities):
+    # CASE id WHEN 3 THEN 2 WHEN 7 THEN 1 END - the requested amount for each row of the batch
+    return Case(
+        *[When(pk=menu_item_id, then=Value(quantity)) for menu_item_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def reserve_stock(quantities, menu_items):
+    # Decrement stock for a whole order in one conditional UPDATE:
+    #   stock_quantity = stock_quantity - <requested>  WHERE stock_quantity >= <requested>
+    # The database re-checks the condition on the locked row, so concurrent checkouts can never take
+    # the same units twice. Items without a stock count (stock_quantity is NULL) are not tracked.
+    # Must run inside the caller's transaction.atomic() block.
+    tracked = {
+        menu_item_id: quantity for menu_item_id, quantity in quantities.items()
+        if menu_items[menu_item_id].stock_quantity is not None
+    }
+    if not tracked:
+        return []
+
+    requested = _per_item(tracked)
+    updated = MenuItem.objects.filter(pk__in=list(tracked), stock_quantity__gte=requested).update(
+        # Listed first so backends that apply SET clauses left to right still compare the old count
+        is_available=Case(When(stock_quantity=requested, then=Value(False)), default=F('is_available')),
+        stock_quantity=F('stock_quantity') - requested,
+        updated_at=timezone.now(),
+    )
+    if updated != len(tracked):
+        available = dict(MenuItem.objects.filter(pk__in=list(tracked)).values_list('pk', 'stock_quantity'))
+        raise InsufficientStock([
+            (menu_item_id, available.get(menu_item_id) or 0)
+            for menu_item_id, quantity in tracked.items()
+            if available.get(menu_item_id) is not None and available[menu_item_id] < quantity
+        ])
+
+    # update() skips the post_save signals, so cached menu pages and the autocomplete index are
+    # refreshed here - only when something sold out, since pages show availability but not counts
+    sold_out = list(MenuItem.objects.filter(pk__in=list(tracked), stock_quantity=0).values_list('pk', flat=True))
+    if sold_out:
+        invalidate_menu()
+        transaction.on_commit(lambda: _remove_from_autocomplete(sold_out))
+    return sold_out
+
+
+def _remove_from_autocomplete(menu_item_ids):
+    for menu_item_id in menu_item_ids:
+        autocomplete_index.remove_item(menu_item_id)
+
+
+def restock(menu_item_id, quantity):
+    # Add delivered units atomically - an untracked item starts counting from zero. Only an item
+    # that was off sale because it had sold out (stock_quantity 0) goes back on sale; one that staff
+    # took off the menu stays off
+    updated = MenuItem.objects.filter(pk=menu_item_id).update(
+        # Listed first so backends that apply SET clauses left to right still see the old count
+        is_available=Case(When(stock_quantity=0, then=Value(True)), default=F('is_available')),
+        stock_quantity=Coalesce(F('stock_quantity'), 0) + quantity,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        invalidate_menu()
+        name, is_available = MenuItem.objects.values_list('name', 'is_available').get(pk=menu_item_id)
+        transaction.on_commit(lambda: autocomplete_index.update_item(menu_item_id, name, is_available))
+    return updated
@@ -0,0 +1,190 @@
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+# What to do when the log queue is full - the request thread never waits for the disk
+DROP_NEWEST = 'newest'  # Discard the incoming record
+DROP_OLDEST = 'oldest'  # Evict the oldest queued record to make room for the incoming one
+
+# Attributes every LogRecord has - anything else was passed through extra= and is emitted as a field
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    # One JSON object per line, with extra= fields (event_type, ip, user, ...) as top-level keys
+    # so the security log can be filtered and aggregated without parsing free text
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RESERVED_ATTRS and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class RotatingBatchFileHandler(TimedRotatingFileHandler):
+    # File handler that rotates on size or time, whichever comes first, and leaves flushing to the
+    # caller - the queue listener writes a whole batch and then flushes once
+
+    def __init__(self, filename, max_bytes=0, when='midnight', backup_count=0, encoding='utf-8'):
+        super().__init__(filename, when=when, backupCount=backup_count, encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record):
+        if time.time() >= self.rolloverAt:
+            return True
+        if self.max_bytes and self.stream is not None:
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def rotation_filename(self, default_name):
+        # A size rollover inside one time interval must not overwrite the previous backup
+        name = super().rotation_filename(default_name)
+        counter = 1
+        candidate = name
+        while os.path.exists(candidate):
+            candidate = f"{name}.{counter}"
+            counter += 1
+        return candidate
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class BoundedQueueHandler(QueueHandler):
+    # QueueHandler over a bounded queue - enqueueing never blocks, and overflow follows the drop policy
+    # Records are rendered to plain messages here, so handlers on the listener thread never see args
+
+    def __init__(self, log_queue, drop_policy=DROP_NEWEST):
+        super().__init__(log_queue)
+        if drop_policy not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Unknown log drop policy: {drop_policy}")
+        self.drop_policy = drop_policy
+        self._lock_dropped = threading.Lock()
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if self.drop_policy == DROP_OLDEST:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                pass
+        with self._lock_dropped:
+            self.dropped += 1
+
+    def take_dropped(self):
+        # Return and reset the number of records lost since the last call
+        with self._lock_dropped:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class BatchingQueueListener(QueueListener):
+    # Drains up to batch_size queued records per wake-up, writes them all and flushes once
+
+    def __init__(self, log_queue, *handlers, batch_size=256, respect_handler_level=True, on_batch=None):
+        super().__init__(log_queue, *handlers, respect_handler_level=respect_handler_level)
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+
+    def _monitor(self):
+        while True:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+
+            stopping = False
+            for record in batch:
+                if record is self._sentinel:
+                    stopping = True
+                else:
+                    self.handle(record)
+            if self.on_batch is not None:
+                self.on_batch()
+            for handler in self.handlers:
+                handler.flush()
+            for _ in batch:
+                self.queue.task_done()
+            if stopping:
+                return
+
+    def enqueue_sentinel(self):
+        # The queue may be full at shutdown - wait briefly for room rather than losing the stop signal
+        self.queue.put(self._sentinel, timeout=5)
+
+
+class AsyncFileHandler(BoundedQueueHandler):
+    # Drop-in replacement for logging.FileHandler in LOGGING: the request thread only enqueues,
+    # and a background listener writes batches to a size/time rotating file
+    # Lost records are reported in the log itself once the queue drains
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, when='midnight', backup_count=14,
+                 queue_size=10000, drop_policy=DROP_NEWEST, batch_size=256):
+        super().__init__(queue.Queue(maxsize=queue_size), drop_policy=drop_policy)
+        self.target = RotatingBatchFileHandler(
+            filename, max_bytes=max_bytes, when=when, backup_count=backup_count
+        )
+        self.listener = BatchingQueueListener(
+            self.queue, self.target, batch_size=batch_size, on_batch=self._report_dropped
+        )
+        self.listener.start()
+        atexit.register(self.close)
+
+    def setFormatter(self, formatter):
+        # The formatter applies to the file output; enqueueing only renders the message
+        self.target.setFormatter(formatter)
+
+    def setLevel(self, level):
+        super().setLevel(level)
+        self.target.setLevel(level)
+
+    def _report_dropped(self):
+        dropped = self.take_dropped()
+        if dropped:
+            record = logging.LogRecord(
+                'cafe.logqueue', logging.WARNING, __file__, 0,
+                f"Log queue full - {dropped} records dropped ({self.drop_policy} policy)", None, None
+            )
+            record.dropped = dropped
+            self.target.handle(record)
+
+    def close(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+        self.target.close()
+        super().close()
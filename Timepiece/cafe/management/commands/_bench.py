@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.test.utils import setup_databases, teardown_databases
+import os
+import tempfile
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    # Run a benchmark against a throwaway, fully migrated test database so the project data is never touched
+    # SQLite benchmarks use an on-disk file rather than the in-memory test database to reflect real locking
+    connection = connections[DEFAULT_DB_ALIAS]
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST'] = dict(
+                connection.settings_dict.get('TEST') or {},
+                NAME=os.path.join(directory, 'benchmark.sqlite3'),
+            )
+        old_config = setup_databases(verbosity=verbosity, interactive=False, aliases={DEFAULT_DB_ALIAS})
+        try:
+            yield connection
+        finally:
+            teardown_databases(old_config, verbosity=verbosity)
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from cafe.autocomplete import PrefixIndex, Suggestion
+import random
+import string
+import time
+
+WORDS = [
+    'espresso', 'latte', 'mocha', 'cappuccino', 'americano', 'chai', 'matcha', 'croissant', 'scone',
+    'muffin', 'bagel', 'panini', 'wrap', 'salad', 'soup', 'cake', 'cheesecake', 'tiramisu', 'brownie',
+    'vanilla', 'caramel', 'hazelnut', 'almond', 'oat', 'chocolate', 'cinnamon', 'honey', 'lemon',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark autocomplete prefix index lookups (p50/p99 latency) on a synthetic menu'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=20000)
+        parser.add_argument('--lookups', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        suggestions = [
+            Suggestion('item', i, ' '.join(rng.sample(WORDS, 3)), rng.randint(0, 5000))
+            for i in range(options['entries'])
+        ]
+
+        start = time.perf_counter()
+        index = PrefixIndex(suggestions)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # Mix of typed prefixes from real words plus misses
+        prefixes = [word[:rng.randint(1, len(word))] for word in rng.choices(WORDS, k=500)]
+        prefixes += [''.join(rng.choices(string.ascii_lowercase, k=3)) for _ in range(100)]
+        for prefix in prefixes:
+            index.lookup(prefix)  # warm the per-node top-k caches
+
+        timings = []
+        for _ in range(options['lookups']):
+            prefix = rng.choice(prefixes)
+            start = time.perf_counter()
+            index.lookup(prefix)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+
+        def percentile(fraction):
+            return timings[min(int(len(timings) * fraction), len(timings) - 1)] * 1e6
+
+        self.stdout.write(f"Built index over {len(index)} entries in {build_ms:.1f} ms")
+        self.stdout.write(
+            f"lookup p50 {percentile(0.50):.1f} us | p99 {percentile(0.99):.1f} us | max {timings[-1] * 1e6:.1f} us"
+        )
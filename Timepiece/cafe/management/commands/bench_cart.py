@@ -0,0 +1,108 @@
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from cafe.cart import CacheCartStore, SessionCartStore, SignedCookieCartStore
+from decimal import Decimal
+from ._bench import benchmark_database
+import random
+import time
+
+# Share of clicks per action in the replayed stream - most traffic only looks at the cart
+ACTIONS = [('view', 60), ('add', 20), ('same_quantity', 10), ('update', 5), ('remove', 5)]
+
+
+class Command(BaseCommand):
+    help = 'Compare session writes and bytes per cart click for the old session cart and the cafe.cart stores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clicks', type=int, default=2000)
+        parser.add_argument('--items', type=int, default=30, help='Distinct menu items in the click stream')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        names, weights = zip(*ACTIONS)
+        clicks = [
+            (action, rng.randrange(1, options['items'] + 1), rng.randint(1, 4))
+            for action in rng.choices(names, weights, k=options['clicks'])
+        ]
+
+        with benchmark_database():
+            self._report('legacy session dict', clicks, self._legacy_click)
+            for label, store in [
+                ('session store', SessionCartStore()),
+                ('signed cookie store', SignedCookieCartStore()),
+                ('cache store', CacheCartStore()),
+            ]:
+                self._report(label, clicks, lambda request, response, click, store=store: self._store_click(
+                    store, request, response, click
+                ))
+
+    def _report(self, label, clicks, apply_click):
+        factory = RequestFactory()
+        session = SessionStore()
+        session.create()
+        cookies = {}
+        writes = written_bytes = cookie_bytes = 0
+
+        start = time.perf_counter()
+        for click in clicks:
+            request = factory.post('/cart/')
+            request.session = SessionStore(session.session_key)
+            request.COOKIES.update(cookies)
+            response = HttpResponse()
+            apply_click(request, response, click)
+
+            # What SessionMiddleware would do at the end of the request
+            if request.session.modified:
+                request.session.save()
+                writes += 1
+                written_bytes += len(request.session.encode(request.session._get_session()))
+            for name, morsel in response.cookies.items():
+                cookie_bytes += len(morsel.OutputString())
+                cookies[name] = morsel.value
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{label:>20} | {writes:5d} session writes ({writes / len(clicks):5.1%} of clicks) | "
+            f"{written_bytes / 1024:8.1f} KiB written | {cookie_bytes / 1024:7.1f} KiB Set-Cookie | "
+            f"{elapsed / len(clicks) * 1e6:7.1f} us/click"
+        )
+
+    def _legacy_click(self, request, response, click):
+        # The pre-cafe.cart view logic: nested dicts with names, and the session marked modified on every mutation
+        action, item_id, quantity = click
+        cart = request.session.get('cart', {})
+        if not cart:
+            request.session['cart'] = {}
+        cart = request.session['cart']
+        key = str(item_id)
+        if action == 'add':
+            if key in cart:
+                cart[key]['quantity'] += quantity
+            else:
+                cart[key] = {'quantity': quantity, 'price': '3.50', 'name': f"Menu item number {item_id}"}
+            request.session.modified = True
+        elif action in ('update', 'same_quantity'):
+            if key in cart:
+                cart[key]['quantity'] = quantity if action == 'update' else cart[key]['quantity']
+            request.session.modified = True
+        elif action == 'remove' and key in cart:
+            del cart[key]
+            request.session.modified = True
+
+    def _store_click(self, store, request, response, click):
+        action, item_id, quantity = click
+        cart = store.load(request)
+        if action == 'add':
+            cart.add(item_id, quantity, Decimal('3.50'))
+        elif action == 'update':
+            cart.set_quantity(item_id, quantity)
+        elif action == 'same_quantity':
+            line = cart.get(item_id)
+            if line is not None:
+                cart.set_quantity(item_id, line.quantity)
+        elif action == 'remove':
+            cart.remove(item_id)
+        if cart.changed:
+            store.save(request, response, cart)
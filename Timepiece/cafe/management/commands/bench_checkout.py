@@ -0,0 +1,103 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from django.test.utils import CaptureQueriesContext
+from cafe.checkout import place_order
+from cafe.models import Category, MenuItem
+from decimal import Decimal
+from timepiece.database import BASIC, TUNED, database_settings
+from django.conf import settings
+from ._bench import benchmark_database
+import logging
+import threading
+import time
+
+
+class Command(BaseCommand):
+    help = 'Benchmark checkout queries per order and throughput under concurrent load (uses a throwaway database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=20, help='Cart lines per order')
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--orders', type=int, default=50, help='Orders placed per thread')
+        parser.add_argument(
+            '--profile', choices=[BASIC, TUNED, 'both'], default='both',
+            help='Database profile from timepiece.database to run under (SQLite only)'
+        )
+
+    def handle(self, *args, **options):
+        # Keep per-order log lines out of the measurements
+        logging.disable(logging.INFO)
+        if connection.vendor != 'sqlite':
+            self._run_profile(options)
+            return
+        
+        profiles = [BASIC, TUNED] if options['profile'] == 'both' else [options['profile']]
+        original = dict(connection.settings_dict)
+        for profile in profiles:
+            # Every worker thread opens its connection from this same settings dict
+            connection.close()
+            profile_settings = database_settings(settings.BASE_DIR, profile)
+            connection.settings_dict['OPTIONS'] = profile_settings.get('OPTIONS', {})
+            connection.settings_dict['CONN_MAX_AGE'] = profile_settings.get('CONN_MAX_AGE', 0)
+            self.stdout.write(f"-- {profile} profile")
+            try:
+                self._run_profile(options)
+            finally:
+                connection.close()
+                connection.settings_dict.clear()
+                connection.settings_dict.update(original)
+
+    def _run_profile(self, options):
+        with benchmark_database():
+            menu_items, users = self._seed(options)
+            cart = {
+                str(item.id): {'quantity': 2, 'price': str(item.price), 'name': item.name}
+                for item in menu_items[:options['lines']]
+            }
+
+            with CaptureQueriesContext(connection) as queries:
+                place_order(users[0], cart)
+            self.stdout.write(f"{options['lines']}-line checkout: {len(queries)} queries")
+
+            placed, failed, elapsed = self._run_concurrently(users, cart, options)
+            self.stdout.write(
+                f"{options['threads']} threads: {placed} orders in {elapsed:.2f}s "
+                f"({placed / elapsed:.1f} orders/s), {failed} failed"
+            )
+
+    def _seed(self, options):
+        category = Category.objects.create(name='Benchmark')
+        menu_items = MenuItem.objects.bulk_create([
+            MenuItem(name=f'Item {i}', description='Benchmark item', price=Decimal('2.50'), category=category)
+            for i in range(options['lines'])
+        ])
+        users = [User.objects.create_user(username=f'bench{i}') for i in range(options['threads'])]
+        return menu_items, users
+
+    def _run_concurrently(self, users, cart, options):
+        counts = {'placed': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def worker(user):
+            placed = failed = 0
+            try:
+                for _ in range(options['orders']):
+                    try:
+                        place_order(user, cart)
+                        placed += 1
+                    except OperationalError:
+                        failed += 1
+            finally:
+                connection.close()
+            with lock:
+                counts['placed'] += placed
+                counts['failed'] += failed
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts['placed'], counts['failed'], time.perf_counter() - start
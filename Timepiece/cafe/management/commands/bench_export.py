@@ -0,0 +1,61 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from cafe.api.serializers import OrderSummarySerializer
+from cafe.exports import stream_export
+from cafe.models import Category, MenuItem, Order, OrderItem, Payment
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from ._bench import benchmark_database
+import time
+import tracemalloc
+
+
+class Command(BaseCommand):
+    help = 'Compare peak memory and time to first byte of the streaming export against serializing every order at once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='Order counts to export')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'jsonl'], default='csv')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            customer = User.objects.create_user(username='bench_export')
+            category = Category.objects.create(name='Coffee')
+            latte = MenuItem.objects.create(name='Latte', description='Milky', price=Decimal('3.50'), category=category)
+            start = timezone.now() - timedelta(days=365)
+            created = 0
+            for size in sorted(options['sizes']):
+                self._add_orders(customer, latte, start, created, size)
+                created = size
+                self._report(size, 'stream_export', lambda: stream_export('orders', options['file_format']))
+                # What paging through the API amounts to in one process: every row as a model instance and a dict
+                self._report(size, 'serialize all', lambda: iter([OrderSummarySerializer(Order.objects.all(), many=True).data]))
+
+    def _add_orders(self, customer, menu_item, start, created, size):
+        for first in range(created, size, 5000):
+            orders = Order.objects.bulk_create([
+                Order(customer=customer, total_amount=Decimal('7.00'), status='COMPLETED', order_date=start + timedelta(seconds=n))
+                for n in range(first, min(first + 5000, size))
+            ])
+            OrderItem.objects.bulk_create([OrderItem(order=order, menu_item=menu_item, quantity=2, price=Decimal('3.50')) for order in orders])
+            Payment.objects.bulk_create([
+                Payment(order=order, amount=order.total_amount, payment_method='CASH', payment_date=order.order_date) for order in orders
+            ])
+
+    def _report(self, size, label, produce):
+        tracemalloc.start()
+        started = time.perf_counter()
+        chunks = produce()
+        next(chunks)
+        first_chunk = time.perf_counter() - started
+        for _ in chunks:
+            pass
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"{size:>8} orders | {label:>14} | first chunk {first_chunk * 1000:8.1f} ms | "
+            f"total {elapsed:6.2f} s | peak {peak / 1024 / 1024:7.1f} MiB"
+        )
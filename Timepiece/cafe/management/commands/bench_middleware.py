@@ -0,0 +1,99 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from cafe.inspection import DEFAULT_OTP_EXEMPT_PREFIXES, DEFAULT_SIGNATURES
+from cafe.middleware import SecurityMiddleware
+import logging
+import random
+import re
+import time
+
+QUERY_STRINGS = [
+    '',
+    'category=3',
+    'search=caramel+latte&price_max=4.50',
+    'page=2&ordering=-price&is_available=true',
+    'cursor=eyJvIjpbIi1vcmRlcl9kYXRlIiwiLWlkIl0sInYiOlsiMjAyNi0xMC0xOCIsNDJdLCJyIjowfQ',
+    "search=%27+union+select+password+from+auth_user--",
+    'q=<script>alert(1)</script>',
+]
+
+PATHS = ['/menu/', '/api/menu-items/', '/orders/12/', '/static/css/style.css', '/support/', '/login/']
+
+
+def legacy_scan(query_string):
+    # The previous implementation - nine re.search calls over patterns rebuilt on every request
+    found = []
+    for category, patterns in DEFAULT_SIGNATURES.items():
+        for pattern in list(patterns):
+            if re.search(pattern, query_string, re.IGNORECASE):
+                found.append(category)
+                break
+    return found
+
+
+def legacy_exempt(path):
+    for prefix in DEFAULT_OTP_EXEMPT_PREFIXES:
+        if re.match(f"^{re.escape(prefix)}", path):
+            return True
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-request SecurityMiddleware inspection overhead in microseconds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50000)
+        parser.add_argument('--unique', type=float, default=0.1, help='Fraction of query strings never seen before')
+
+    def handle(self, *args, **options):
+        # Detections would otherwise flood the security log
+        logging.disable(logging.CRITICAL)
+        try:
+            self._run(options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def _run(self, options):
+        rng = random.Random(42)
+        factory = RequestFactory()
+        middleware = SecurityMiddleware(lambda request: HttpResponse())
+
+        requests = []
+        for position in range(options['requests']):
+            query_string = rng.choice(QUERY_STRINGS)
+            if rng.random() < options['unique']:
+                query_string = f"{query_string}&_={position}"
+            request = factory.get(rng.choice(PATHS), QUERY_STRING=query_string)
+            request.user = AnonymousUser()
+            requests.append(request)
+
+        def inspect_legacy(request):
+            legacy_scan(request.META['QUERY_STRING'])
+            legacy_exempt(request.path)
+
+        def inspect_compiled(request):
+            middleware._check_for_suspicious_patterns(request)
+            middleware.otp_exempt_paths.matches(request.path)
+
+        def full_request(request):
+            middleware(request)
+
+        for label, run in [
+            ('legacy inspection', inspect_legacy),
+            ('compiled inspection', inspect_compiled),
+            ('full middleware call', full_request),
+        ]:
+            self.stdout.write(f"{label:>22} | {self._time(run, requests):7.2f} us/request")
+
+        stats = middleware.scanner.stats()
+        self.stdout.write(f"scan cache hit rate {stats['hit_rate']:.1%} over {stats['entries']} distinct query strings")
+
+    def _time(self, run, requests):
+        for request in requests[:1000]:
+            run(request)  # warm-up
+        start = time.perf_counter()
+        for request in requests:
+            run(request)
+        return (time.perf_counter() - start) * 1e6 / len(requests)
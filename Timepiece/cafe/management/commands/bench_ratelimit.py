@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from cafe.ratelimit import LocalBucketStore, RateLimiter, SQLiteBucketStore, parse_rate
+import os
+import random
+import tempfile
+import time
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the per-check overhead of the token-bucket rate limiter stores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=200000)
+        parser.add_argument('--clients', type=int, default=5000, help='Distinct IPs/users being limited')
+        parser.add_argument('--rate', default='120/min')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        rate = parse_rate(options['rate'])
+        keys = [f"api_write:ip:10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(options['clients'])]
+        workload = [rng.choice(keys) for _ in range(options['checks'])]
+
+        self._report('local (per process)', LocalBucketStore(), rate, workload)
+
+        # Full check as the middleware and throttles call it, including the settings lookup
+        limiter = RateLimiter()
+        start = time.perf_counter()
+        for key in workload:
+            limiter.check('api_write', [key])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{'RateLimiter.check':>20} | mean {elapsed / len(workload) * 1e6:6.2f} us")
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = SQLiteBucketStore(os.path.join(directory, 'ratelimit.sqlite3'))
+            # The shared store is much slower, so time a slice of the workload
+            self._report('sqlite (shared)', store, rate, workload[:max(len(workload) // 20, 1)])
+
+    def _report(self, label, store, rate, workload):
+        timings = []
+        rejected = 0
+        for key in workload:
+            start = time.perf_counter()
+            allowed, _ = store.consume(key, rate, time.time())
+            timings.append(time.perf_counter() - start)
+            rejected += not allowed
+        timings.sort()
+
+        def percentile(fraction):
+            return timings[min(int(len(timings) * fraction), len(timings) - 1)] * 1e6
+
+        self.stdout.write(
+            f"{label:>20} | mean {sum(timings) / len(timings) * 1e6:6.2f} us | p50 {percentile(0.5):6.2f} us | "
+            f"p99 {percentile(0.99):7.2f} us | {rejected} of {len(workload)} rejected"
+        )
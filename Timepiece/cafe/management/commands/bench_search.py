@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand
+from cafe import search
+import random
+import sqlite3
+import time
+
+WORDS = [
+    'espresso', 'latte', 'mocha', 'cappuccino', 'americano', 'chai', 'matcha', 'earl', 'grey',
+    'croissant', 'scone', 'muffin', 'bagel', 'panini', 'wrap', 'salad', 'soup', 'cake', 'cheesecake',
+    'tiramisu', 'brownie', 'cookie', 'vanilla', 'caramel', 'hazelnut', 'almond', 'oat', 'soy',
+    'chocolate', 'cinnamon', 'honey', 'lemon', 'berry', 'avocado', 'chicken', 'turkey', 'vegan',
+    'iced', 'hot', 'double', 'single', 'large', 'small', 'seasonal', 'house', 'special', 'classic',
+]
+
+QUERIES = ['lat', 'choc cake', 'iced caramel', 'vegan wrap', 'cinnamon', 'house special mocha']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark FTS5 menu search against the icontains (LIKE) scan on synthetic menus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--limit', type=int, default=10, help='Rows fetched per query (one API page)')
+
+    def handle(self, *args, **options):
+        # Runs against a throwaway in-memory SQLite database, never the project database
+        for size in options['sizes']:
+            connection = self._build_database(size)
+            like_ms = self._time(connection, self._like_query, options)
+            fts_ms = self._time(connection, self._fts_query, options)
+            connection.close()
+
+            speedup = like_ms / fts_ms if fts_ms else float('inf')
+            self.stdout.write(
+                f"{size:>9} items | icontains {like_ms:8.3f} ms | fts5 {fts_ms:8.3f} ms | {speedup:6.1f}x"
+            )
+
+    def _build_database(self, size):
+        rng = random.Random(size)
+        connection = sqlite3.connect(':memory:')
+        connection.execute("CREATE TABLE cafe_menuitem (id INTEGER PRIMARY KEY, name TEXT, description TEXT)")
+        connection.executemany(
+            "INSERT INTO cafe_menuitem (id, name, description) VALUES (?, ?, ?)",
+            (
+                (i, ' '.join(rng.sample(WORDS, 3)), ' '.join(rng.choices(WORDS, k=12)))
+                for i in range(1, size + 1)
+            )
+        )
+        connection.execute(
+            f"CREATE VIRTUAL TABLE {search.SEARCH_TABLE} USING fts5("
+            "name, description, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+        )
+        connection.execute(
+            f"INSERT INTO {search.SEARCH_TABLE}(rowid, name, description) "
+            "SELECT id, name, description FROM cafe_menuitem"
+        )
+        connection.execute(f"INSERT INTO {search.SEARCH_TABLE}({search.SEARCH_TABLE}) VALUES ('optimize')")
+        connection.commit()
+        return connection
+
+    def _like_query(self, connection, query, limit):
+        # Mirrors the old SearchFilter: every term must appear in name or description
+        terms = search.tokenize(query)
+        where = ' AND '.join('(name LIKE ? OR description LIKE ?)' for _ in terms)
+        params = [value for term in terms for value in (f'%{term}%', f'%{term}%')]
+        return connection.execute(
+            f"SELECT id, name FROM cafe_menuitem WHERE {where} ORDER BY name LIMIT ?", params + [limit]
+        ).fetchall()
+
+    def _fts_query(self, connection, query, limit):
+        return connection.execute(
+            f"SELECT m.id, m.name FROM {search.SEARCH_TABLE} f JOIN cafe_menuitem m ON m.id = f.rowid "
+            f"WHERE {search.SEARCH_TABLE} MATCH ? "
+            f"ORDER BY bm25({search.SEARCH_TABLE}, {search.NAME_WEIGHT}, {search.DESCRIPTION_WEIGHT}) LIMIT ?",
+            [search.build_match_expression(query), limit]
+        ).fetchall()
+
+    def _time(self, connection, run, options):
+        # Average milliseconds per query across the query mix
+        elapsed = 0.0
+        for query in QUERIES:
+            run(connection, query, options['limit'])  # warm-up
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                run(connection, query, options['limit'])
+            elapsed += time.perf_counter() - start
+        return elapsed * 1000 / (len(QUERIES) * options['repeat'])
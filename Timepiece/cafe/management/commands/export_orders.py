@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from cafe.api.serializers import ExportFilterSerializer
+from cafe.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORT_TABLES, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream orders, order items or payments as CSV or JSON lines in bounded memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', nargs='?', default='orders', choices=list(EXPORT_TABLES))
+        parser.add_argument('--format', dest='file_format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--since', help="Start date or time, e.g. '2026-10-01' (inclusive)")
+        parser.add_argument('--until', help='End date or time (exclusive)')
+        parser.add_argument('--status', help='Only orders in this status, e.g. COMPLETED')
+        parser.add_argument('--output', '-o', help='File to write (defaults to stdout)')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        filters = ExportFilterSerializer(data={
+            name: options[name] for name in ('since', 'until', 'status') if options[name]
+        })
+        if not filters.is_valid():
+            problems = '; '.join(f"--{name}: {' '.join(errors)}" for name, errors in filters.errors.items())
+            raise CommandError(problems)
+
+        chunks = stream_export(
+            options['table'], options['file_format'], chunk_size=options['chunk_size'], **filters.validated_data
+        )
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as export_file:
+            for chunk in chunks:
+                export_file.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Exported {options['table']} to {options['output']}"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, DEFAULT_DB_ALIAS
+from cafe import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text menu search index from MenuItem'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to rebuild')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        connection = connections[using]
+        
+        if not search.sqlite_supports_fts5(connection):
+            self.stdout.write(self.style.WARNING('FTS5 is not available on this database, search uses the icontains fallback'))
+            return
+        
+        search.create_search_table(connection)
+        count = search.rebuild_index(using=using)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} menu items'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from cafe.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recount MenuItem rating totals from the Review table and repair any that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--item', type=int, action='append', dest='items', help='Only check this menu item id (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted items without fixing them')
+
+    def handle(self, *args, **options):
+        drifted = recompute_ratings(menu_item_ids=options['items'], dry_run=options['dry_run'])
+        
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All rating totals match the reviews'))
+            return
+        
+        ids = ', '.join(str(menu_item_id) for menu_item_id in drifted)
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(drifted)} menu items have drifted totals: {ids}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Repaired rating totals for {len(drifted)} menu items: {ids}'))
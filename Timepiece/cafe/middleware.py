@@ -1,29 +1,59 @@
 from django.urls import resolve
 from django.conf import settings
 from django.shortcuts import redirect
+from django.http import HttpResponse
 from django.contrib.auth import REDIRECT_FIELD_NAME
 from django.utils.deprecation import MiddlewareMixin
-from django_otp import user_has_device
-from django_otp.util import is_verified
 from .auth import log_security_event, get_client_ip
+from .inspection import build_scanner, build_exempt_paths
+from .devices import user_has_device
+from .ratelimit import rate_limiter, rate_limit_settings, request_keys, retry_after_header
+from .routers import replica_routing_settings, routing_scope
 import logging
 import time
-import re
 
 # Security logger for middleware events - implements security monitoring requirement
 security_logger = logging.getLogger('security')
 
-# URLs exempt from two-factor authentication - balance security with usability
-OTP_EXEMPT_URLS = [
-    r'^/login/',
-    r'^/two_factor/setup/',
-    r'^/static/',
-    r'^/media/',
-    r'^/api/',
-]
+# Log lines for each signature category found by the request inspection engine (see cafe.inspection)
+DETECTION_MESSAGES = {
+    'sql': 'Potential SQL Injection detected',
+    'xss': 'Potential XSS attempt detected',
+}
+
+def is_verified(user):
+    # django_otp's OTPMiddleware attaches is_verified() once a device has been confirmed this session
+    return getattr(user, 'is_verified', lambda: False)()
+
+def check_rate_limit(request):
+    # Token-bucket limit on POSTs to login and checkout (see RATE_LIMITS) - returns a 429 or None
+    if request.method != 'POST':
+        return None
+    scope = rate_limit_settings()['PATHS'].get(request.path)
+    if scope is None:
+        return None
+    
+    ip_address = get_client_ip(request)
+    decision = rate_limiter.check(scope, request_keys(request, ip_address))
+    if decision.allowed:
+        return None
+    
+    security_logger.warning(
+        "Rate limit exceeded - Scope: %s, Key: %s, Path: %s", scope, decision.key, request.path,
+        extra={'event_type': 'RATE_LIMITED', 'ip': ip_address, 'path': request.path},
+    )
+    response = HttpResponse("Too many requests. Please try again later.", status=429, content_type='text/plain')
+    response['Retry-After'] = retry_after_header(decision)
+    return response
 
 class SecurityMiddleware(MiddlewareMixin):
     
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        # Signatures and exempt paths are compiled once per process - see SECURITY_INSPECTION setting
+        self.scanner = build_scanner()
+        self.otp_exempt_paths = build_exempt_paths()
+    
     def process_request(self, request):
         # Initialize request timing for performance monitoring
         request.start_time = time.time()
@@ -31,6 +61,11 @@ class SecurityMiddleware(MiddlewareMixin):
         # Check for potentially malicious inputs - implements attack prevention requirement
         self._check_for_suspicious_patterns(request)
         
+        # Throttle login and checkout floods before they reach a view
+        response = check_rate_limit(request)
+        if response is not None:
+            return response
+        
         # Enforce two-factor authentication if required - implements enhanced authentication requirement
         if self._should_enforce_2fa(request):
             return redirect(settings.LOGIN_URL)
@@ -40,9 +75,11 @@ class SecurityMiddleware(MiddlewareMixin):
         if hasattr(request, 'start_time'):
             duration = time.time() - request.start_time
             if duration > 3.0:
+                ip_address = get_client_ip(request)
                 security_logger.warning(
-                    f"Slow request detected: {request.method} {request.path} - "
-                    f"Duration: {duration:.2f}s, IP: {get_client_ip(request)}"
+                    "Slow request detected: %s %s - Duration: %.2fs, IP: %s",
+                    request.method, request.path, duration, ip_address,
+                    extra={'event_type': 'SLOW_REQUEST', 'ip': ip_address, 'path': request.path},
                 )
         
         # Apply security headers to all responses - implements secure communication requirement
@@ -51,41 +88,19 @@ class SecurityMiddleware(MiddlewareMixin):
         return response
     
     def _check_for_suspicious_patterns(self, request):
-        # Analyze query string for potential SQL injection patterns - attack prevention requirement
+        # Analyze query string for SQL injection and XSS signatures - attack prevention requirement
+        # One pass of a precompiled alternation, with verdicts cached for repeated query strings
         query_string = request.META.get('QUERY_STRING', '')
         
-        # SQL injection pattern detection - defense against database attacks
-        sql_patterns = [
-            r'(\%27)|(\')|(\-\-)|(\%23)|(#)',
-            r'((\%3D)|(=))[^\n]*((\%27)|(\')|(\-\-)|(\%3B)|(;))',
-            r'((\%27)|(\'))union',
-            r'exec(\s|\+)+(s|x)p\w+',
-        ]
-        
-        for pattern in sql_patterns:
-            if re.search(pattern, query_string, re.IGNORECASE):
-                security_logger.warning(
-                    f"Potential SQL Injection detected: {query_string} - "
-                    f"IP: {get_client_ip(request)}, Path: {request.path}"
-                )
-                break
-        
-        # XSS (Cross-Site Scripting) detection - client-side attack prevention
-        xss_patterns = [
-            r'<script',
-            r'javascript:',
-            r'onerror=',
-            r'onload=',
-            r'eval\(',
-        ]
-        
-        for pattern in xss_patterns:
-            if re.search(pattern, query_string, re.IGNORECASE):
-                security_logger.warning(
-                    f"Potential XSS attempt detected: {query_string} - "
-                    f"IP: {get_client_ip(request)}, Path: {request.path}"
-                )
-                break
+        categories = self.scanner.scan(query_string)
+        for category in categories:
+            message = DETECTION_MESSAGES.get(category, f"Suspicious pattern ({category}) detected")
+            ip_address = get_client_ip(request)
+            security_logger.warning(
+                "%s: %s - IP: %s, Path: %s", message, query_string, ip_address, request.path,
+                extra={'event_type': f"SUSPICIOUS_{category.upper()}", 'ip': ip_address, 'path': request.path},
+            )
+        return categories
     
     def _should_enforce_2fa(self, request):
         # Determine if two-factor authentication should be enforced for this request
@@ -94,12 +109,12 @@ class SecurityMiddleware(MiddlewareMixin):
             return False
         
         # Skip 2FA for exempted URLs (public or setup paths)
-        for url_pattern in OTP_EXEMPT_URLS:
-            if re.match(url_pattern, request.path):
-                return False
+        if self.otp_exempt_paths.matches(request.path):
+            return False
         
         # If user has 2FA device but not verified for this session, enforce verification
-        if user_has_device(request.user) and not is_verified(request.user):
+        # Verified sessions skip the lookup, and device presence is cached per user - see cafe.devices
+        if not is_verified(request.user) and user_has_device(request.user):
             return True
         
         return False
@@ -121,4 +136,35 @@ class SecurityMiddleware(MiddlewareMixin):
         if 'Strict-Transport-Security' not in response and not settings.DEBUG:
             response['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
         
-        return response
\ No newline at end of file
+        return response
+
+class RateLimitMiddleware(MiddlewareMixin):
+    # Rate limiting on its own, for deployments that do not run SecurityMiddleware
+    # (which already performs the same check - do not enable both)
+    
+    def process_request(self, request):
+        return check_rate_limit(request)
+
+
+class ReplicaPinningMiddleware:
+    # Read-after-write for cafe.routers.ReplicaRouter: a request that writes is answered from the
+    # primary, and a short-lived cookie keeps the client's next requests there until the replicas
+    # have caught up - a customer always sees the order they just placed
+    # A cookie rather than the session, so pinning never costs a session write
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        options = replica_routing_settings()
+        if not options['REPLICAS']:
+            return self.get_response(request)
+        
+        with routing_scope(pinned=options['COOKIE_NAME'] in request.COOKIES) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                options['COOKIE_NAME'], '1', max_age=options['PIN_SECONDS'],
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite specific - other backends use the icontains fallback in cafe.search
+    from cafe import search
+    connection = schema_editor.connection
+    if not search.sqlite_supports_fts5(connection):
+        return
+    search.create_search_table(connection)
+    search.rebuild_index(using=connection.alias)
+
+
+def drop_search_index(apps, schema_editor):
+    from cafe import search
+    if schema_editor.connection.vendor == 'sqlite':
+        search.drop_search_table(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cafe', '0002_supportrequest_supportmessage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cafe', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['is_available', 'updated_at'], name='cafe_menuitem_avail_upd_idx'),
+        ),
+    ]
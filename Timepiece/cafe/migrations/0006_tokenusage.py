@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0004_alter_tokenproxy_options'),
+        ('cafe', '0005_menuitem_fingerprint_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenUsage',
+            fields=[
+                ('token', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='authtoken.token')),
+                ('last_used', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
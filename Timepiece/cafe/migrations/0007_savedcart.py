@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('cafe', '0006_tokenusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedCart',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saved_cart', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('contents', models.TextField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
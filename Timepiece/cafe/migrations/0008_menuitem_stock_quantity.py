@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cafe', '0007_savedcart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='stock_quantity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:39
+
+from django.db import migrations, models
+
+
+def fill_rating_totals(apps, schema_editor):
+    # Existing reviews are counted once here - cafe.ratings keeps the totals current afterwards
+    from cafe.ratings import recompute_ratings
+    recompute_ratings(menu_item_model=apps.get_model('cafe', 'MenuItem'), review_model=apps.get_model('cafe', 'Review'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cafe', '0008_menuitem_stock_quantity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cafe', '0009_menuitem_rating_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'name'], name='cafe_menuitem_avail_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'order_date', 'id'], name='cafe_order_cust_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'order_date', 'id'], name='cafe_order_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_method', 'payment_date', 'id'], name='cafe_payment_method_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['menu_item', 'created_at'], name='cafe_review_item_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportmessage',
+            index=models.Index(fields=['support_request', 'created_at'], name='cafe_supportmsg_req_crt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportrequest',
+            index=models.Index(fields=['customer', 'created_at', 'id'], name='cafe_support_cust_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportrequest',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='cafe_support_status_crt_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Step 1 of 3 moving Order.order_number from text to a native UUID column - a nullable column
+    # is added without touching existing rows, 0012 fills it and 0013 swaps it in
+
+    dependencies = [
+        ('cafe', '0010_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='order_uuid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:05
+
+from django.db import migrations
+
+
+def backfill_order_uuids(apps, schema_editor):
+    # Converted in primary-key batches, each committed on its own - see cafe.order_numbers
+    from cafe.order_numbers import backfill_order_uuids
+    backfill_order_uuids(apps.get_model('cafe', 'Order'))
+
+
+class Migration(migrations.Migration):
+    # Step 2 of 3 - not atomic, so every batch commits separately and the table is never locked for
+    # the whole backfill. If the run is interrupted, migrating again picks up the unconverted rows
+    atomic = False
+
+    dependencies = [
+        ('cafe', '0011_order_uuid'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_uuids, migrations.RunPython.noop, elidable=True),
+    ]
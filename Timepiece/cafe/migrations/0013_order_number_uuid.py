@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:05
+
+from django.db import migrations, models
+import uuid
+
+
+def backfill_remaining(apps, schema_editor):
+    # Orders placed while 0012 ran - normally none, or a handful
+    from cafe.order_numbers import backfill_order_uuids
+    backfill_order_uuids(apps.get_model('cafe', 'Order'))
+
+
+def drop_text_numbers(apps, schema_editor):
+    # The state already marks order_uuid required and unique, so the table rebuild that dropping the
+    # unique text column needs also creates the UUID column with its constraint - one copy of the table
+    Order = apps.get_model('cafe', 'Order')
+    schema_editor.remove_field(Order, Order._meta.get_field('order_number'))
+
+
+def restore_text_numbers(apps, schema_editor):
+    # Reverse only - re-add the text column empty, refill it from the UUIDs in the dashed form it used
+    # to hold, then put back its unique constraint and drop the one on the UUID column as 0011 had it
+    from cafe.order_numbers import BACKFILL_BATCH_SIZE
+    Order = apps.get_model('cafe', 'Order')
+    nullable = models.CharField(max_length=50, null=True)
+    plain_uuid = models.UUIDField(editable=False, null=True)
+    for name, field in [('order_number', nullable), ('order_uuid', plain_uuid)]:
+        field.set_attributes_from_name(name)
+        field.model = Order
+    schema_editor.add_field(Order, nullable)
+
+    batch = []
+    for order in Order.objects.only('pk', 'order_uuid').iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        order.order_number = str(order.order_uuid)
+        batch.append(order)
+        if len(batch) == BACKFILL_BATCH_SIZE:
+            Order.objects.bulk_update(batch, ['order_number'])
+            batch = []
+    Order.objects.bulk_update(batch, ['order_number'])
+
+    schema_editor.alter_field(Order, nullable, Order._meta.get_field('order_number'))
+    schema_editor.alter_field(Order, Order._meta.get_field('order_uuid'), plain_uuid)
+
+
+class Migration(migrations.Migration):
+    # Step 3 of 3 - the UUID column replaces the text one and takes over its unique index
+    # Forwards the table is copied once, when the unique text column is dropped (see drop_text_numbers);
+    # the rename afterwards is a plain ALTER. Migrating backwards rebuilds it more than once, which
+    # only matters for a rollback
+
+    dependencies = [
+        ('cafe', '0012_backfill_order_uuid'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_remaining, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='order',
+                    name='order_uuid',
+                    field=models.UUIDField(default=uuid.uuid4, unique=True),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='order',
+                    name='order_number',
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(drop_text_numbers, restore_text_numbers),
+            ],
+        ),
+        migrations.RenameField(
+            model_name='order',
+            old_name='order_uuid',
+            new_name='order_number',
+        ),
+    ]
@@ -23,9 +23,33 @@ class MenuItem(models.Model):
     image = models.ImageField(upload_to='menu_items/', blank=True, null=True)  # Supporting visual menu display requirement
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='menu_items')  # Hierarchical organization
     is_available = models.BooleanField(default=True)  # Supports inventory management requirement
+    stock_quantity = models.PositiveIntegerField(null=True, blank=True)  # Units left - empty means stock is not tracked, see cafe.inventory
+    # Running review totals kept by cafe.ratings, so listing ratings never aggregates the review table
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)  # Audit trail for menu changes
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_available', 'updated_at'], name='cafe_menuitem_avail_upd_idx'),  # Conditional GET fingerprint
+            # Menu page, featured and related items - partial, since the filter is a bare boolean the
+            # planner cannot use as the leading column of a composite index
+            models.Index(fields=['category', 'name'], name='cafe_menuitem_avail_cat_idx', condition=models.Q(is_available=True)),
+        ]
+    
+    def get_average_rating(self):
+        # Mean star rating to two places, or None before the first review
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 2)
+    
+    def save(self, *args, **kwargs):
+        # An item with no stock left cannot be ordered
+        if self.stock_quantity == 0:
+            self.is_available = False
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return self.name
 
@@ -54,7 +78,14 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES, default='PENDING')  # Status workflow tracking
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)  # Order total for financial reporting
     notes = models.TextField(blank=True, null=True)  # Customer special requests or dietary needs
-    order_number = models.CharField(max_length=50, unique=True, default=uuid.uuid4)  # Public-facing order identifier
+    order_number = models.UUIDField(unique=True, default=uuid.uuid4)  # Public-facing order identifier - stored natively, not as text
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['order_date', 'id'], name='cafe_order_date_id_idx'),  # Keyset pagination
+            models.Index(fields=['customer', 'order_date', 'id'], name='cafe_order_cust_date_idx'),  # Order history
+            models.Index(fields=['status', 'order_date', 'id'], name='cafe_order_status_date_idx'),  # ?status= filter
+        ]
     
     def __str__(self):
         return f"Order #{self.order_number} - {self.customer.username}"
@@ -91,6 +122,12 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)  # Payment amount for reconciliation
     transaction_id = models.CharField(max_length=100, blank=True, null=True)  # External payment reference
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['payment_date', 'id'], name='cafe_payment_date_id_idx'),  # Keyset pagination
+            models.Index(fields=['payment_method', 'payment_date', 'id'], name='cafe_payment_method_date_idx'),  # ?payment_method= filter
+        ]
+    
     def __str__(self):
         return f"Payment for Order #{self.order.order_number}"
 
@@ -104,6 +141,16 @@ class Review(models.Model):
     
     class Meta:
         unique_together = ('customer', 'menu_item')  # Prevent duplicate reviews
+        indexes = [
+            models.Index(fields=['menu_item', 'created_at'], name='cafe_review_item_created_idx'),  # Reviews of an item
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Remember the stored rating and item so an edit can adjust the menu item totals by the difference
+        instance = super().from_db(db, field_names, values)
+        instance._stored_rating = (instance.__dict__.get('menu_item_id'), instance.__dict__.get('rating'))
+        return instance
     
     def __str__(self):
         return f"{self.customer.username}'s review for {self.menu_item.name}"
@@ -126,6 +173,13 @@ class SupportRequest(models.Model):
     resolved_at = models.DateTimeField(null=True, blank=True)  # When marked as resolved
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_support_requests')  # Staff member handling case
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='cafe_support_created_id_idx'),  # Keyset pagination
+            models.Index(fields=['customer', 'created_at', 'id'], name='cafe_support_cust_created_idx'),  # Customer's requests
+            models.Index(fields=['status', 'created_at', 'id'], name='cafe_support_status_crt_idx'),  # ?status= filter
+        ]
+    
     def __str__(self):
         return f"Support Request #{self.id} - {self.subject}"
     
@@ -139,5 +193,29 @@ class SupportMessage(models.Model):
     message = models.TextField()  # Message content
     created_at = models.DateTimeField(auto_now_add=True)  # Timestamp for conversation flow
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['support_request', 'created_at'], name='cafe_supportmsg_req_crt_idx'),  # Conversation thread
+        ]
+    
     def __str__(self):
         return f"Message from {self.sender.username} on Support Request #{self.support_request.id}"
+
+class TokenUsage(models.Model):
+    # When each API token was last used - written in batches by CachedTokenAuthentication
+    # so cached authentications do not need a write per request
+    token = models.OneToOneField('authtoken.Token', on_delete=models.CASCADE, primary_key=True, related_name='usage')
+    last_used = models.DateTimeField(db_index=True)  # Lets stale kiosk tokens be found and revoked
+    
+    def __str__(self):
+        return f"Token for user #{self.token.user_id} last used {self.last_used}"
+
+class SavedCart(models.Model):
+    # Shopping cart kept per user for the cart API (see cafe.cart.UserCartStore) - contents use the
+    # compact "id:quantity:price|..." encoding so a cart is one short row
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='saved_cart')
+    contents = models.TextField()
+    updated_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Cart for user #{self.user_id}"
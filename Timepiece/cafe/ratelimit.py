@@ -0,0 +1,220 @@
+from collections import namedtuple
+from django.conf import settings
+from django.utils.module_loading import import_string
+import functools
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+
+# capacity is the burst size in tokens, refill the tokens added back per second
+Rate = namedtuple('Rate', ['capacity', 'refill'])
+
+# Outcome of a check - retry_after is the number of seconds until the request would be allowed
+Decision = namedtuple('Decision', ['allowed', 'retry_after', 'key'])
+
+PERIODS = {
+    's': 1, 'sec': 1, 'second': 1,
+    'm': 60, 'min': 60, 'minute': 60,
+    'h': 3600, 'hour': 3600,
+    'd': 86400, 'day': 86400,
+}
+
+DEFAULT_RATE_LIMIT_SETTINGS = {
+    'ENABLED': True,
+    'RATES': {
+        'login': '10/min',  # /accounts/login/ and /api-auth/login/ POSTs, per IP
+        'token_auth': '10/min',  # /api-token-auth/, per IP
+        'checkout': '20/hour',  # Orders placed through the site, per IP and per user
+        'api_write': '120/min',  # Unsafe methods on the cafe.api viewsets, per IP and per token/user
+    },
+    'SHARED_BACKEND': None,  # Dotted path of a store shared by all workers, e.g. 'cafe.ratelimit.SQLiteBucketStore'
+    'SHARED_OPTIONS': {},
+    # POSTs to these paths are limited by the middleware - API views use the DRF throttles instead
+    'PATHS': {
+        '/accounts/login/': 'login',
+        '/api-auth/login/': 'login',
+        '/checkout/': 'checkout',
+    },
+    'MAX_LOCAL_KEYS': 100000,  # Buckets kept per process before idle ones are swept
+}
+
+
+@functools.lru_cache(maxsize=64)
+def parse_rate(rate):
+    # '10/min' -> a burst of 10 requests, refilled at 10 per minute
+    count, _, period = rate.partition('/')
+    number, unit = '', period
+    while unit and unit[0].isdigit():
+        number, unit = number + unit[0], unit[1:]
+    seconds = PERIODS[unit] * int(number or 1)
+    capacity = int(count)
+    return Rate(capacity, capacity / seconds)
+
+
+class LocalBucketStore:
+    # Per-process token buckets in a plain dict - no lock on the hot path
+    # Under the GIL each step is atomic, so the worst a race between threads can do is grant
+    # one extra token; the shared backend (if configured) stays authoritative
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+
+    def consume(self, key, rate, now, cost=1):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._sweep(now)
+            bucket = self._buckets.setdefault(key, [float(rate.capacity), now, rate])
+        tokens = min(rate.capacity, bucket[0] + (now - bucket[1]) * rate.refill)
+        bucket[1] = now
+        if tokens >= cost:
+            bucket[0] = tokens - cost
+            return True, 0.0
+        bucket[0] = tokens
+        return False, (cost - tokens) / rate.refill
+
+    def _sweep(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        for key, (tokens, updated, rate) in list(self._buckets.items()):
+            if tokens + (now - updated) * rate.refill >= rate.capacity:
+                self._buckets.pop(key, None)
+        excess = len(self._buckets) - int(self.max_keys * 0.9)
+        if excess > 0:
+            # Still full of active keys - evict the least recently used down to 90% of max_keys, so a
+            # flood of new keys cannot reset the buckets of clients that are still being charged
+            oldest = sorted(self._buckets.items(), key=lambda item: item[1][1])[:excess]
+            for key, _ in oldest:
+                del self._buckets[key]
+
+    def clear(self):
+        self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    # Shared stand-in for a networked store (e.g. Redis) - buckets in a local SQLite file that every
+    # worker on the host opens. Each check is one atomic UPSERT, so concurrent workers cannot overspend
+
+    def __init__(self, path=None, timeout=1.0):
+        self.path = str(path or settings.BASE_DIR / 'ratelimit.sqlite3')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, allowed INTEGER NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def consume(self, key, rate, now, cost=1):
+        # refilled = min(capacity, tokens + elapsed * refill), spent only if it covers the cost
+        refilled = "min(:capacity, tokens + (:now - updated) * :refill)"
+        tokens, allowed = self._connection().execute(
+            "INSERT INTO rate_buckets (key, tokens, updated, allowed) VALUES (:key, :capacity - :cost, :now, 1) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            f"allowed = {refilled} >= :cost, "
+            f"tokens = CASE WHEN {refilled} >= :cost THEN {refilled} - :cost ELSE {refilled} END, "
+            "updated = :now "
+            "RETURNING tokens, allowed",
+            {'key': key, 'capacity': rate.capacity, 'refill': rate.refill, 'now': now, 'cost': cost},
+        ).fetchone()
+        if allowed:
+            return True, 0.0
+        return False, (cost - tokens) / rate.refill
+
+    def clear(self):
+        self._connection().execute("DELETE FROM rate_buckets")
+
+
+def rate_limit_settings():
+    options = dict(DEFAULT_RATE_LIMIT_SETTINGS)
+    options.update(getattr(settings, 'RATE_LIMITS', {}))
+    return options
+
+
+class RateLimiter:
+    # Token-bucket limiter keyed by scope and client identity
+    # The per-process bucket is checked first, so a flood is rejected without touching the shared
+    # store; requests that pass locally are then charged against the shared store when one is configured
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = None
+        self._shared = None
+        self._shared_path = None
+        self.checks = 0
+        self.rejections = 0
+
+    def _stores(self, options):
+        if self._local is None or self._shared_path != options['SHARED_BACKEND']:
+            with self._lock:
+                self._local = LocalBucketStore(max_keys=options['MAX_LOCAL_KEYS'])
+                self._shared_path = options['SHARED_BACKEND']
+                self._shared = import_string(self._shared_path)(**options['SHARED_OPTIONS']) \
+                    if self._shared_path else None
+        return self._local, self._shared
+
+    def check(self, scope, keys, cost=1):
+        # Charge every identity key (e.g. IP and user) for the scope - denied if any bucket is empty
+        options = rate_limit_settings()
+        rate_spec = options['RATES'].get(scope)
+        if not options['ENABLED'] or not rate_spec:
+            return Decision(True, 0.0, None)
+
+        rate = parse_rate(rate_spec)
+        local, shared = self._stores(options)
+        now = time.time()
+        self.checks += 1
+        for key in keys:
+            bucket_key = f"{scope}:{key}"
+            allowed, retry_after = local.consume(bucket_key, rate, now, cost)
+            if allowed and shared is not None:
+                allowed, retry_after = shared.consume(bucket_key, rate, now, cost)
+            if not allowed:
+                self.rejections += 1
+                return Decision(False, retry_after, bucket_key)
+        return Decision(True, 0.0, None)
+
+    def reset(self):
+        with self._lock:
+            if self._shared is not None:
+                self._shared.clear()
+            self._local = None
+            self._shared = None
+            self._shared_path = None
+            self.checks = self.rejections = 0
+
+
+rate_limiter = RateLimiter()
+
+
+def retry_after_header(decision):
+    # Retry-After is whole seconds, rounded up so an immediate retry is never told 0
+    return str(max(1, math.ceil(decision.retry_after)))
+
+
+def request_keys(request, client_ip):
+    # Identities a request is charged to. The client IP always pays, so a caller cannot dodge the
+    # per-IP limits by sending made-up credentials; a token or user is added only once it has been
+    # authenticated (request.auth/request.user set by DRF or AuthenticationMiddleware) - never from
+    # the raw Authorization header
+    keys = [f"ip:{client_ip}"]
+    token = getattr(request, 'auth', None)
+    user = getattr(request, 'user', None)
+    if getattr(token, 'key', None):
+        keys.append(f"token:{hashlib.sha1(token.key.encode('utf-8')).hexdigest()[:16]}")
+    elif user is not None and user.is_authenticated:
+        keys.append(f"user:{user.pk}")
+    return keys
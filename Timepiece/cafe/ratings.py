@@ -0,0 +1,70 @@
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+from .models import MenuItem, Review
+from .cache import invalidate_menu
+
+# Mean rating computed from the stored totals - lets list views order by rating without touching reviews
+AVERAGE_RATING = Case(
+    When(rating_count=0, then=Value(None)),
+    default=Cast('rating_sum', FloatField()) / F('rating_count'),
+    output_field=FloatField(),
+)
+
+
+def adjust_rating_totals(menu_item_id, rating_delta, count_delta):
+    # Atomic in-database increment, so concurrent reviews of the same item never lose an update
+    MenuItem.objects.filter(pk=menu_item_id).update(
+        rating_sum=F('rating_sum') + rating_delta,
+        rating_count=F('rating_count') + count_delta,
+        updated_at=timezone.now(),
+    )
+    # update() skips post_save, so cached menu pages are invalidated here
+    invalidate_menu()
+
+
+def review_saved(review, created):
+    # Apply the difference between the stored review and the one just saved
+    previous_item_id, previous_rating = getattr(review, '_stored_rating', (None, None))
+    if created:
+        adjust_rating_totals(review.menu_item_id, review.rating, 1)
+    elif previous_item_id is None:
+        # Saved from an instance that was never loaded - the old rating is unknown, so recount the item
+        recompute_ratings(menu_item_ids=[review.menu_item_id])
+    elif previous_item_id != review.menu_item_id:
+        adjust_rating_totals(previous_item_id, -previous_rating, -1)
+        adjust_rating_totals(review.menu_item_id, review.rating, 1)
+    elif previous_rating != review.rating:
+        adjust_rating_totals(review.menu_item_id, review.rating - previous_rating, 0)
+    review._stored_rating = (review.menu_item_id, review.rating)
+
+
+def review_deleted(review):
+    menu_item_id, rating = getattr(review, '_stored_rating', (review.menu_item_id, review.rating))
+    adjust_rating_totals(menu_item_id, -rating, -1)
+
+
+def _actual_totals(review_model):
+    reviews = review_model.objects.filter(menu_item=OuterRef('pk')).order_by().values('menu_item')
+    return (
+        Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+        Coalesce(Subquery(reviews.annotate(total=Count('pk')).values('total')), 0),
+    )
+
+
+def recompute_ratings(menu_item_ids=None, dry_run=False, menu_item_model=MenuItem, review_model=Review):
+    # Repair the stored totals from the review table and return the ids that had drifted
+    # The model arguments let migrations pass their historical models
+    rating_sum, rating_count = _actual_totals(review_model)
+    menu_items = menu_item_model.objects.all()
+    if menu_item_ids is not None:
+        menu_items = menu_items.filter(pk__in=list(menu_item_ids))
+    drifted = list(
+        menu_items.annotate(actual_sum=rating_sum, actual_count=rating_count)
+        .exclude(rating_sum=F('actual_sum'), rating_count=F('actual_count'))
+        .values_list('pk', flat=True)
+    )
+    if drifted and not dry_run:
+        menu_item_model.objects.filter(pk__in=drifted).update(rating_sum=rating_sum, rating_count=rating_count)
+        invalidate_menu()
+    return drifted
@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+import contextvars
+import random
+
+DEFAULT_REPLICA_ROUTING_SETTINGS = {
+    'REPLICAS': [],  # Database aliases that serve reads - empty disables routing
+    'APPS': ['cafe'],  # Apps whose reads may go to a replica
+    'PIN_SECONDS': 5,  # How long a client keeps reading from the primary after a write - covers replication lag
+    'COOKIE_NAME': 'cafe_db_pin',
+    # Bookkeeping models (app_label.model_name) whose writes go to the primary without pinning the
+    # client - their rows are never read back by the client's next requests
+    'UNPINNED_MODELS': ['cafe.tokenusage'],
+}
+
+
+class RoutingState:
+    # Per-request routing flags - pinned sends every read to the primary, wrote records that this
+    # request changed data so the client should stay pinned for the next few requests
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_routing_state = contextvars.ContextVar('cafe_routing_state', default=None)
+
+
+def replica_routing_settings():
+    options = dict(DEFAULT_REPLICA_ROUTING_SETTINGS)
+    options.update(getattr(settings, 'REPLICA_ROUTING', {}))
+    return options
+
+
+@contextmanager
+def routing_scope(pinned=False):
+    # Routing state for one request (or management command) - see ReplicaPinningMiddleware
+    state = RoutingState(pinned)
+    token = _routing_state.set(state)
+    try:
+        yield state
+    finally:
+        _routing_state.reset(token)
+
+
+class ReplicaRouter:
+    # Sends reads of the configured apps to a replica and every write to the primary
+    # Reads stay on the primary when the request is pinned (it or a recent request wrote), inside
+    # a transaction on the primary (e.g. checkout reading stock it is about to decrement), and when
+    # following a relation from an object that was loaded from the primary
+
+    def db_for_read(self, model, **hints):
+        options = replica_routing_settings()
+        replicas = options['REPLICAS']
+        if not replicas or model._meta.app_label not in options['APPS']:
+            return None
+        state = _routing_state.get()
+        if state is not None and state.pinned:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        options = replica_routing_settings()
+        if not options['REPLICAS'] or model._meta.app_label not in options['APPS']:
+            return None
+        state = _routing_state.get()
+        if state is not None and model._meta.label_lower not in options['UNPINNED_MODELS']:
+            # Read-your-writes: the rest of this request and the client's next requests use the primary
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary, so objects may be related across them
+        databases = {DEFAULT_DB_ALIAS, *replica_routing_settings()['REPLICAS']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        if db in replica_routing_settings()['REPLICAS']:
+            return False
+        return None
@@ -0,0 +1,126 @@
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Q
+import logging
+import re
+
+logger = logging.getLogger('cafe')
+
+# FTS5 virtual table mirroring MenuItem name/description, rowid is the MenuItem id
+SEARCH_TABLE = 'cafe_menuitem_fts'
+
+# Name matches outweigh description matches when ranking with bm25
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Per-alias cache of whether the search table is usable on that database
+_fts_available = {}
+
+
+def tokenize(query):
+    # Split user input into search terms - punctuation and FTS operators are dropped
+    return _TOKEN_RE.findall(query or '')
+
+
+def build_match_expression(query):
+    # Every term must match, each as a prefix so results show up while the user is still typing
+    return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+
+def sqlite_supports_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def create_search_table(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "name, description, "
+            "prefix='2 3', "
+            "tokenize='unicode61 remove_diacritics 2'"
+            ")"
+        )
+    _fts_available.pop(connection.alias, None)
+
+
+def drop_search_table(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+    _fts_available.pop(connection.alias, None)
+
+
+def fts_available(using=DEFAULT_DB_ALIAS):
+    # True when the database has the FTS5 search table - checked once per alias
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = (
+            connection.vendor == 'sqlite'
+            and SEARCH_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[using]
+
+
+def index_menu_item(menu_item, using=DEFAULT_DB_ALIAS):
+    # Insert or refresh a single item in the search index
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {SEARCH_TABLE}(rowid, name, description) VALUES (%s, %s, %s)",
+            [menu_item.pk, menu_item.name, menu_item.description or '']
+        )
+
+
+def remove_menu_item(menu_item_id, using=DEFAULT_DB_ALIAS):
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [menu_item_id])
+
+
+def rebuild_index(using=DEFAULT_DB_ALIAS):
+    # Repopulate the search index from MenuItem in a single statement
+    connection = connections[using]
+    if not fts_available(using):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, name, description) "
+            "SELECT id, name, COALESCE(description, '') FROM cafe_menuitem"
+        )
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def search_menu_items(queryset, query, ranked=True):
+    # Restrict a MenuItem queryset to items matching the query
+    # Uses the FTS5 index when present and falls back to icontains on other backends
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset
+
+    if fts_available(queryset.db):
+        queryset = queryset.extra(
+            tables=[SEARCH_TABLE],
+            where=[f'{SEARCH_TABLE}.rowid = cafe_menuitem.id', f'{SEARCH_TABLE} MATCH %s'],
+            params=[build_match_expression(query)],
+            select={'search_rank': f'bm25({SEARCH_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT})'},
+        )
+        if ranked:
+            # bm25 scores are negative, lower is a better match
+            queryset = queryset.extra(order_by=['search_rank', 'name'])
+        return queryset
+
+    for token in tokens:
+        queryset = queryset.filter(Q(name__icontains=token) | Q(description__icontains=token))
+    if ranked:
+        queryset = queryset.order_by('name')
+    return queryset
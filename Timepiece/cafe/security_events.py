@@ -0,0 +1,114 @@
+from django.conf import settings
+import glob
+import json
+import os
+
+# Event types written by cafe.auth and cafe.middleware - see the extra= fields there
+LOGIN_FAILED = 'LOGIN_FAILED'
+
+
+def event_log_path():
+    # The security event store is the JSON lines file behind the 'security_file' handler
+    handler = settings.LOGGING.get('handlers', {}).get('security_file', {})
+    return handler.get('filename') or os.path.join(settings.BASE_DIR, 'logs/security.log')
+
+
+def event_files(path, include_rotated=True):
+    # Rotated backups oldest first, then the live file - events come out in time order
+    files = []
+    if include_rotated:
+        files = sorted(
+            (name for name in glob.glob(f"{glob.escape(path)}.*") if os.path.isfile(name)),
+            key=os.path.getmtime,
+        )
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def normalize_time(value):
+    # Event times are 'YYYY-MM-DD HH:MM:SS,mmm', so ISO input only needs its 'T' replaced to compare as strings
+    return value.replace('T', ' ') if value else value
+
+
+def read_events(paths, event_type=None, ip=None, user=None, since=None, until=None):
+    # Stream matching events one at a time - memory use does not depend on the size of the store
+    # A substring check on the raw line skips JSON parsing for most non-matching lines
+    since, until = normalize_time(since), normalize_time(until)
+    needle = f'"{event_type}"' if event_type else None
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as event_file:
+            for line in event_file:
+                if needle is not None and needle not in line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # Plain-text lines from before the structured format
+                if not isinstance(event, dict):
+                    continue
+                if event_type and event.get('event_type') != event_type:
+                    continue
+                if ip and event.get('ip') != ip:
+                    continue
+                if user and event.get('user') != user:
+                    continue
+                timestamp = event.get('time', '')
+                if since and timestamp < since:
+                    continue
+                if until and timestamp >= until:
+                    continue
+                yield event
+
+
+class TopCounter:
+    # Misra-Gries heavy hitters: tracks at most `capacity` keys, so memory is bounded no matter how
+    # many distinct IPs or user agents appear. Counts are exact while the distinct keys fit in
+    # capacity, otherwise each count underestimates by at most `max_error`
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = {}
+        self.total = 0
+        self.max_error = 0
+
+    def add(self, key):
+        self.total += 1
+        counts = self.counts
+        if key in counts:
+            counts[key] += 1
+        elif len(counts) < self.capacity:
+            counts[key] = 1
+        else:
+            # Decrement every counter and drop those that reach zero - this happens at most
+            # total / (capacity + 1) times, so updates stay O(1) amortised
+            self.max_error += 1
+            for other in list(counts):
+                if counts[other] == 1:
+                    del counts[other]
+                else:
+                    counts[other] -= 1
+
+    def most_common(self, limit):
+        return sorted(self.counts.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
+
+
+def per_minute_counts(events, key_field, threshold=1):
+    # Yield (minute, key, count) for every key seen at least `threshold` times in a minute
+    # Events arrive in time order, so only the current minute's counters are ever held in memory
+    current_minute = None
+    counts = {}
+    for event in events:
+        minute = event.get('time', '')[:16]
+        if minute != current_minute:
+            yield from _flush_minute(current_minute, counts, threshold)
+            current_minute, counts = minute, {}
+        key = event.get(key_field) or 'unknown'
+        counts[key] = counts.get(key, 0) + 1
+    yield from _flush_minute(current_minute, counts, threshold)
+
+
+def _flush_minute(minute, counts, threshold):
+    for key, count in sorted(counts.items(), key=lambda item: -item[1]):
+        if count >= threshold:
+            yield minute, key, count
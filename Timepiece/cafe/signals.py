@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Category, MenuItem, Review
+from .cache import invalidate_menu
+from . import ratings, search
+from .autocomplete import autocomplete_index
+from .devices import invalidate_user_devices
+from .api.authentication import invalidate_token, invalidate_user_tokens
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from django_otp import device_classes
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def invalidate_menu_cache(sender, **kwargs):
+    # Any menu change (price edit, availability toggle, new category) invalidates cached menu pages
+    invalidate_menu()
+
+
+@receiver(post_save, sender=MenuItem)
+def update_search_index(sender, instance, using, **kwargs):
+    # Keep the full-text search index in step with menu edits
+    search.index_menu_item(instance, using=using)
+
+
+@receiver(post_delete, sender=MenuItem)
+def remove_from_search_index(sender, instance, using, **kwargs):
+    search.remove_menu_item(instance.pk, using=using)
+
+
+@receiver(post_save, sender=MenuItem)
+def update_autocomplete_item(sender, instance, using, **kwargs):
+    # Patch the in-process autocomplete index instead of rebuilding it - only once the change has
+    # committed, so a rolled-back edit never reaches the index. Values are captured now because the
+    # instance may change (or lose its pk on delete) before the callback runs
+    menu_item_id, name, is_available = instance.pk, instance.name, instance.is_available
+    transaction.on_commit(lambda: autocomplete_index.update_item(menu_item_id, name, is_available), using=using)
+
+
+@receiver(post_delete, sender=MenuItem)
+def remove_autocomplete_item(sender, instance, using, **kwargs):
+    menu_item_id = instance.pk
+    transaction.on_commit(lambda: autocomplete_index.remove_item(menu_item_id), using=using)
+
+
+@receiver(post_save, sender=Category)
+def update_autocomplete_category(sender, instance, using, **kwargs):
+    category_id, name = instance.pk, instance.name
+    transaction.on_commit(lambda: autocomplete_index.update_category(category_id, name), using=using)
+
+
+@receiver(post_delete, sender=Category)
+def remove_autocomplete_category(sender, instance, using, **kwargs):
+    category_id = instance.pk
+    transaction.on_commit(lambda: autocomplete_index.remove_category(category_id), using=using)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_totals(sender, instance, created, **kwargs):
+    # Keep MenuItem.rating_sum/rating_count in step without aggregating reviews on read
+    ratings.review_saved(instance, created)
+
+
+@receiver(post_delete, sender=Review)
+def remove_from_rating_totals(sender, instance, **kwargs):
+    ratings.review_deleted(instance)
+
+
+def invalidate_device_presence(sender, instance, **kwargs):
+    # Adding, confirming or removing a 2FA device changes whether the user must verify
+    invalidate_user_devices(instance.user_id)
+
+
+# Device models come from whichever django_otp plugins are installed, so connect to each one
+for device_model in device_classes():
+    post_save.connect(invalidate_device_presence, sender=device_model, dispatch_uid=f"cafe_otp_{device_model._meta.label_lower}_save")
+    post_delete.connect(invalidate_device_presence, sender=device_model, dispatch_uid=f"cafe_otp_{device_model._meta.label_lower}_delete")
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    # A revoked token must stop authenticating straight away
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    # Cached API users are snapshots - deactivation or permission changes drop them
+    invalidate_user_tokens(instance.pk, instance.is_active)
@@ -0,0 +1,34 @@
+from django import template
+from cafe.cache import menu_cache, make_key
+
+register = template.Library()
+
+
+class MenuCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        # Cache the rendered fragment under the current menu version and the vary-on values
+        name = self.fragment_name.resolve(context)
+        vary = [str(var.resolve(context)) for var in self.vary_on]
+        key = make_key('fragment', name, *vary)
+        return menu_cache.get_or_set(key, lambda: self.nodelist.render(context))
+
+
+@register.tag('menucache')
+def do_menucache(parser, token):
+    # Usage: {% menucache "fragment_name" [var1 var2 ...] %} ... {% endmenucache %}
+    # Only wrap markup that depends on menu data - never user, session or CSRF content
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least one argument.")
+    nodelist = parser.parse(('endmenucache',))
+    parser.delete_first_token()
+    return MenuCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -1,3 +1,11 @@
 from cafe.tests.test_models import *
 from cafe.tests.test_views import *
 from cafe.tests.test_api import *
+from cafe.tests.test_order_numbers import *
+from cafe.tests.test_migrations import *
+from cafe.tests.test_logging import *
+from cafe.tests.test_security_report import *
+from cafe.tests.test_inventory import *
+from cafe.tests.test_database import *
+from cafe.tests.test_routers import *
+from cafe.tests.test_query_plans import *
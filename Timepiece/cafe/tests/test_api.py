@@ -1,10 +1,37 @@
-from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
-from rest_framework import status
-from django.contrib.auth.models import User
-from cafe.models import Category, MenuItem, Order, Review
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+import csv
 import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, DatabaseError, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from cafe.api.authentication import token_cache, token_usage, UsageRecorder
+from cafe.api.pagination import Cursor, OrderPagination
+from cafe.autocomplete import AUTOCOMPLETE_GENERATION_KEY, autocomplete_index
+from cafe.cache import invalidate_menu
+from cafe.exports import stream_export
+from cafe.models import Category, MenuItem, Order, OrderItem, Payment, Review, TokenUsage
+from cafe.ratelimit import LocalBucketStore, parse_rate, rate_limiter, SQLiteBucketStore
+from cafe.ratings import recompute_ratings
+from cafe.tests.utils import QueryBudgetMixin
 
 class CategoryAPITestCase(APITestCase):
     def setUp(self):
@@ -243,4 +270,791 @@ class AuthenticationAPITestCase(APITestCase):
         response = self.client.get(orders_url)
         
         # Should be denied
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED) 
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class MenuSearchAPITestCase(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/menu-items/search/'
+        self.category = Category.objects.create(name="Coffee")
+        self.latte = MenuItem.objects.create(
+            name="Caramel Latte",
+            description="Espresso with steamed milk",
+            price=Decimal('3.75'),
+            category=self.category
+        )
+        self.cake = MenuItem.objects.create(
+            name="Carrot Cake",
+            description="Pairs well with a latte",
+            price=Decimal('4.00'),
+            category=self.category
+        )
+        MenuItem.objects.create(
+            name="Green Tea",
+            description="Light and refreshing",
+            price=Decimal('3.00'),
+            category=self.category
+        )
+    
+    def test_prefix_search_ranks_name_matches_first(self):
+        response = self.client.get(self.url, {'q': 'lat'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [item['name'] for item in response.data['results']]
+        self.assertEqual(names, ["Caramel Latte", "Carrot Cake"])
+    
+    def test_search_index_follows_edits(self):
+        self.cake.name = "Lemon Drizzle"
+        self.cake.description = "Citrus sponge"
+        self.cake.save()
+        self.latte.delete()
+        
+        response = self.client.get(self.url, {'q': 'lat'})
+        self.assertEqual(len(response.data['results']), 0)
+        
+        response = self.client.get(self.url, {'q': 'drizz'})
+        self.assertEqual(response.data['results'][0]['name'], "Lemon Drizzle")
+    
+    def test_search_filter_parameter_uses_index(self):
+        response = self.client.get('/api/menu-items/', {'search': 'green'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in response.data['results']], ["Green Tea"])
+
+class AutocompleteAPITestCase(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/menu-items/autocomplete/'
+        autocomplete_index.reset()
+        
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.category = Category.objects.create(name="Coffee")
+        self.latte = MenuItem.objects.create(
+            name="Caramel Latte", description="Sweet", price=Decimal('3.75'), category=self.category
+        )
+        self.cappuccino = MenuItem.objects.create(
+            name="Cappuccino", description="Foamy", price=Decimal('3.50'), category=self.category
+        )
+        order = Order.objects.create(customer=self.user, total_amount=Decimal('7.00'))
+        OrderItem.objects.create(order=order, menu_item=self.cappuccino, quantity=2, price=Decimal('3.50'))
+    
+    def test_suggestions_ordered_by_popularity(self):
+        response = self.client.get(self.url, {'q': 'ca'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        labels = [suggestion['label'] for suggestion in response.data]
+        self.assertEqual(labels, ["Cappuccino", "Caramel Latte"])
+    
+    def test_matches_word_starts_and_categories(self):
+        response = self.client.get(self.url, {'q': 'LAT'})
+        self.assertEqual([s['label'] for s in response.data], ["Caramel Latte"])
+        
+        response = self.client.get(self.url, {'q': 'cof'})
+        self.assertEqual(response.data, [{'type': 'category', 'id': self.category.id, 'label': "Coffee"}])
+    
+    def test_lookup_runs_no_queries_once_loaded(self):
+        self.client.get(self.url, {'q': 'c'})
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'q': 'cap'})
+        self.assertEqual(len(response.data), 1)
+    
+    def test_index_follows_menu_changes(self):
+        self.client.get(self.url, {'q': 'c'})
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.latte.is_available = False
+            self.latte.save()
+            MenuItem.objects.create(
+                name="Latte Macchiato", description="Layered", price=Decimal('3.90'), category=self.category
+            )
+        
+        # Patched in place on commit - no rebuild even though the menu version moved
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'q': 'lat'})
+        self.assertEqual([s['label'] for s in response.data], ["Latte Macchiato"])
+    
+    def test_rolled_back_edit_never_reaches_the_index(self):
+        self.client.get(self.url, {'q': 'c'})
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.cappuccino.name = "Flat White"
+                    self.cappuccino.save()
+                    raise DatabaseError("checkout failed")
+            except DatabaseError:
+                pass
+        
+        self.assertEqual(callbacks, [])
+        self.assertEqual([s['label'] for s in self.client.get(self.url, {'q': 'cap'}).data], ["Cappuccino"])
+        self.assertEqual(self.client.get(self.url, {'q': 'flat'}).data, [])
+    
+    def test_change_from_another_process_triggers_a_rebuild(self):
+        self.client.get(self.url, {'q': 'c'})
+        # Another worker renamed the item and bumped the shared generation after its commit
+        MenuItem.objects.filter(pk=self.cappuccino.pk).update(name="Flat White")
+        caches['shared'].incr(AUTOCOMPLETE_GENERATION_KEY)
+        
+        response = self.client.get(self.url, {'q': 'flat'})
+        self.assertEqual([s['label'] for s in response.data], ["Flat White"])
+
+class BulkOrderAPITestCase(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/orders/'
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        
+        self.category = Category.objects.create(name="Coffee")
+        self.menu_items = [
+            MenuItem.objects.create(
+                name=f"Item {i}", description="Test", price=Decimal('2.00'), category=self.category
+            )
+            for i in range(60)
+        ]
+    
+    def test_large_order_query_budget(self):
+        data = {
+            'notes': 'Kiosk order',
+            'order_items': [{'menu_item_id': item.id, 'quantity': 1} for item in self.menu_items]
+        }
+        
+        with self.assertQueryBudget(8):
+            response = self.client.post(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['items']), 60)
+        order = Order.objects.get(id=response.data['id'])
+        self.assertEqual(order.total_amount, Decimal('120.00'))
+        self.assertEqual(order.items.count(), 60)
+    
+    def test_unknown_and_unavailable_items_are_rejected(self):
+        self.menu_items[1].is_available = False
+        self.menu_items[1].save()
+        data = {
+            'order_items': [
+                {'menu_item_id': self.menu_items[0].id, 'quantity': 1},
+                {'menu_item_id': self.menu_items[1].id, 'quantity': 1},
+                {'menu_item_id': 999999, 'quantity': 1},
+                {'menu_item_id': self.menu_items[2].id, 'quantity': 0},
+            ]
+        }
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data['order_items']
+        self.assertEqual(errors[0], {})
+        self.assertIn('menu_item_id', errors[1])
+        self.assertIn('menu_item_id', errors[2])
+        self.assertIn('quantity', errors[3])
+        self.assertFalse(Order.objects.exists())
+    
+    def test_order_cannot_exceed_stock(self):
+        MenuItem.objects.filter(pk=self.menu_items[0].pk).update(stock_quantity=2)
+        data = {'order_items': [
+            {'menu_item_id': self.menu_items[0].id, 'quantity': 1},
+            {'menu_item_id': self.menu_items[0].id, 'quantity': 2},
+        ]}
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+        
+        data['order_items'].pop()
+        self.assertEqual(self.client.post(self.url, data, format='json').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(MenuItem.objects.get(pk=self.menu_items[0].pk).stock_quantity, 1)
+
+class EagerLoadingAPITestCase(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='staff', password='testpassword123', is_staff=True)
+        self.client.force_authenticate(user=self.staff)
+        
+        category = Category.objects.create(name="Coffee")
+        menu_items = [
+            MenuItem.objects.create(name=f"Item {i}", description="Test", price=Decimal('2.00'), category=category)
+            for i in range(5)
+        ]
+        for i in range(100):
+            customer = User.objects.create_user(username=f"customer{i}")
+            order = Order.objects.create(customer=customer, total_amount=Decimal('10.00'))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, menu_item=item, quantity=1, price=item.price) for item in menu_items
+            ])
+            Payment.objects.create(order=order, payment_method='CASH', amount=Decimal('10.00'))
+    
+    def test_staff_order_list_query_budget(self):
+        # Orders with customers, and the prefetched items with their menu items
+        with self.assertQueryBudget(2):
+            response = self.client.get('/api/orders/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(len(response.data['results'][0]['items']), 5)
+    
+    def test_payment_list_uses_order_summary(self):
+        with self.assertQueryBudget(1):
+            response = self.client.get('/api/payments/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order = response.data['results'][0]['order']
+        self.assertIn('order_number', order)
+        self.assertNotIn('items', order)
+    
+    def test_sparse_fieldset_skips_unrequested_relations(self):
+        # Without customer or items there is nothing to join or prefetch
+        with self.assertQueryBudget(1):
+            response = self.client.get('/api/orders/?fields=id,order_number,status')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'order_number', 'status'})
+    
+    def test_expand_nests_full_related_object(self):
+        # Payments joined to orders and customers, then one prefetch for the order items
+        with self.assertQueryBudget(2):
+            response = self.client.get('/api/payments/?expand=order&fields=id,amount,order')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        payment = response.data['results'][0]
+        self.assertEqual(set(payment), {'id', 'amount', 'order'})
+        self.assertEqual(len(payment['order']['items']), 5)
+        self.assertIn('username', payment['order']['customer'])
+
+class KeysetPaginationAPITestCase(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/orders/'
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        
+        # Several orders share a timestamp so the id tiebreaker matters
+        now = timezone.now()
+        self.orders = [
+            Order.objects.create(
+                customer=self.user,
+                total_amount=Decimal('1.00'),
+                order_date=now - timedelta(minutes=i // 3)
+            )
+            for i in range(25)
+        ]
+    
+    def test_cursor_pages_cover_every_order_once(self):
+        seen = []
+        url = self.url
+        while url:
+            with self.assertQueryBudget(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(order['id'] for order in response.data['results'])
+            url = response.data['next']
+        
+        expected = [order.id for order in sorted(self.orders, key=lambda o: (o.order_date, o.id), reverse=True)]
+        self.assertEqual(seen, expected)
+    
+    def test_previous_link_returns_to_earlier_page(self):
+        first = self.client.get(self.url)
+        second = self.client.get(first.data['next'])
+        previous = self.client.get(second.data['previous'])
+        
+        self.assertEqual(
+            [order['id'] for order in previous.data['results']],
+            [order['id'] for order in first.data['results']]
+        )
+        self.assertIsNone(previous.data['previous'])
+    
+    def test_page_number_compatibility_mode(self):
+        response = self.client.get(self.url, {'page': 3})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 5)
+    
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_tampered_cursor_values_are_rejected(self):
+        paginator = OrderPagination()
+        for values in (["notadate", 1], [{"x": 1}, 1], [None, 1], [self.orders[0].order_date.isoformat(), "one"]):
+            cursor = paginator.encode_cursor(Cursor(('-order_date', '-id'), values, False))
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+            self.assertEqual(str(response.data['detail']), 'Invalid cursor')
+
+class ConditionalGetAPITestCase(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Coffee")
+        self.menu_item = MenuItem.objects.create(
+            name="Espresso", description="Strong coffee", price=Decimal('2.50'), category=self.category
+        )
+    
+    def test_matching_etag_returns_304_after_one_query(self):
+        response = self.client.get('/api/menu-items/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', response)
+        
+        with self.assertQueryBudget(1):
+            response = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_etag_changes_with_menu_and_query(self):
+        etag = self.client.get('/api/menu-items/')['ETag']
+        self.assertNotEqual(self.client.get('/api/menu-items/?is_available=true')['ETag'], etag)
+        
+        self.menu_item.price = Decimal('2.80')
+        self.menu_item.save()
+        response = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_if_modified_since_alone_never_gets_a_stale_304(self):
+        since = http_date(time.time() + 3600)
+        MenuItem.objects.create(name="Mocha", description="Chocolate", price=Decimal('3.00'), category=self.category)
+        self.client.get('/api/menu-items/')
+        
+        # Taking an item off sale drops it from the result without moving any remaining updated_at
+        MenuItem.objects.filter(name="Mocha").update(is_available=False)
+        invalidate_menu()
+        response = self.client.get('/api/menu-items/?is_available=true', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in response.data['results']], ["Espresso"])
+    
+    def test_category_and_detail_endpoints(self):
+        etag = self.client.get('/api/categories/')['ETag']
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.category.name = "Hot Drinks"
+        self.category.save()
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        detail_url = f'/api/menu-items/{self.menu_item.id}/'
+        etag = self.client.get(detail_url)['ETag']
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get('/api/menu-items/999/').status_code, status.HTTP_404_NOT_FOUND)
+
+@override_settings(RATE_LIMITS={'RATES': {'api_write': '2/min', 'token_auth': '2/min', 'login': '2/min'}})
+class RateLimitAPITestCase(APITestCase):
+    def setUp(self):
+        rate_limiter.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.category = Category.objects.create(name="Coffee")
+    
+    def tearDown(self):
+        rate_limiter.reset()
+    
+    def test_api_writes_are_throttled_per_user(self):
+        self.client.force_authenticate(user=self.user)
+        for i in range(2):
+            response = self.client.post('/api/categories/', {'name': f"Category {i}"})
+            self.assertNotEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        
+        response = self.client.post('/api/categories/', {'name': "One too many"})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        
+        # Reads are not charged
+        self.assertEqual(self.client.get('/api/categories/').status_code, status.HTTP_200_OK)
+    
+    def test_token_auth_and_login_are_throttled_per_ip(self):
+        for _ in range(2):
+            self.client.post('/api-token-auth/', {'username': 'testuser', 'password': 'wrong'})
+        response = self.client.post('/api-token-auth/', {'username': 'testuser', 'password': 'testpassword123'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        
+        for _ in range(2):
+            self.client.post('/accounts/login/', {'username': 'testuser', 'password': 'wrong'})
+        response = self.client.post('/accounts/login/', {'username': 'testuser', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+    
+    def test_fake_tokens_do_not_bypass_the_ip_limit(self):
+        # An unverified Authorization header must not move the request into a fresh bucket
+        for _ in range(2):
+            self.client.post('/accounts/login/', {'username': 'testuser', 'password': 'wrong'})
+        for _ in range(5):
+            response = self.client.post(
+                '/accounts/login/', {'username': 'testuser', 'password': 'wrong'},
+                HTTP_AUTHORIZATION=f"Token {os.urandom(20).hex()}",
+            )
+            self.assertEqual(response.status_code, 429)
+
+    def test_spoofed_forwarded_for_does_not_get_a_fresh_bucket(self):
+        # Without trusted proxies X-Forwarded-For is ignored and every request is charged to REMOTE_ADDR
+        for path in ('/accounts/login/', '/api-token-auth/'):
+            responses = [
+                self.client.post(path, {'username': 'testuser', 'password': 'wrong'}, HTTP_X_FORWARDED_FOR=f"10.0.0.{i}")
+                for i in range(5)
+            ]
+            self.assertEqual([response.status_code for response in responses][2:], [429, 429, 429])
+    
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_trusted_proxy_address_is_used(self):
+        # Behind one proxy the address it appended is the client - anything the client prepended is ignored
+        for i in range(3):
+            response = self.client.post(
+                '/api-token-auth/', {'username': 'testuser', 'password': 'wrong'},
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{i}, 203.0.113.7",
+            )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+        response = self.client.post(
+            '/api-token-auth/', {'username': 'testuser', 'password': 'wrong'}, HTTP_X_FORWARDED_FOR="203.0.113.8",
+        )
+        self.assertNotEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def test_authenticated_token_is_charged_with_the_ip(self):
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        for i in range(2):
+            self.assertEqual(self.client.post('/api/categories/', {'name': f"Category {i}"}).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post('/api/categories/', {'name': "One too many"}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        
+        # Another user from the same address shares the IP bucket
+        other = User.objects.create_user(username='other', password='testpassword123')
+        self.client.credentials()
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.post('/api/categories/', {'name': "Other"}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def test_full_local_store_evicts_least_recently_used_buckets(self):
+        rate = parse_rate('2/min')
+        store = LocalBucketStore(max_keys=10)
+        for i in range(9):
+            store.consume(f"login:ip:10.0.0.{i}", rate, 1000.0 + i)
+        # The account under attack has emptied its bucket and is still being charged
+        for _ in range(2):
+            store.consume('login:user:1', rate, 1010.0)
+        
+        # A flood of new keys evicts the idle buckets, not the one in use
+        for i in range(20):
+            store.consume(f"login:ip:192.0.2.{i}", rate, 1011.0 + i / 10)
+            self.assertLessEqual(len(store), 10)
+            self.assertFalse(store.consume('login:user:1', rate, 1011.05 + i / 10)[0])
+        self.assertNotIn('login:ip:10.0.0.0', store._buckets)
+    
+    def test_shared_sqlite_store_enforces_the_bucket(self):
+        rate = parse_rate('3/min')
+        with tempfile.TemporaryDirectory() as directory:
+            store = SQLiteBucketStore(os.path.join(directory, 'ratelimit.sqlite3'))
+            results = [store.consume('login:ip:10.0.0.1', rate, 1000.0)[0] for _ in range(4)]
+            self.assertEqual(results, [True, True, True, False])
+            
+            # One token refills every 20 seconds
+            allowed, retry_after = store.consume('login:ip:10.0.0.1', rate, 1010.0)
+            self.assertFalse(allowed)
+            self.assertAlmostEqual(retry_after, 10.0)
+            self.assertTrue(store.consume('login:ip:10.0.0.1', rate, 1020.0)[0])
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='kiosk', password='testpassword123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+    
+    def _token_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/')
+        return response, [query['sql'] for query in queries if 'authtoken_token' in query['sql']]
+    
+    def test_warm_token_skips_the_token_query(self):
+        response, token_queries = self._token_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(token_queries), 1)
+        
+        response, token_queries = self._token_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_queries, [])
+    
+    def test_deleted_token_and_inactive_user_are_rejected(self):
+        self.assertEqual(self.client.get('/api/orders/').status_code, status.HTTP_200_OK)
+        
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/orders/').status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/orders/').status_code, status.HTTP_200_OK)
+        
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/orders/').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_last_used_is_written_in_batches(self):
+        for _ in range(3):
+            self.client.get('/api/orders/')
+        self.assertFalse(TokenUsage.objects.exists())
+        
+        self.assertEqual(token_usage.flush(), 1)
+        self.assertTrue(TokenUsage.objects.filter(token=self.token).exists())
+    
+    def test_recording_never_writes_on_the_request_thread(self):
+        recorder = UsageRecorder(interval=3600)
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                recorder.record(self.token.key)
+        self.assertEqual(len(queries), 0)
+        self.assertTrue(recorder._thread.is_alive())
+        
+        self.assertEqual(recorder.flush(), 1)
+        self.assertEqual(recorder.flush(), 0)
+    
+    def test_concurrent_records_are_not_lost_across_a_flush(self):
+        recorder = UsageRecorder(interval=3600)
+        recorded = {}
+        recorder.flush = lambda: recorded.update(recorder._take_pending())
+        
+        def record(thread_number):
+            for n in range(500):
+                recorder.record(f"{thread_number}-{n}")
+                if n % 100 == 0:
+                    recorder.flush()
+        
+        threads = [threading.Thread(target=record, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        recorder.flush()
+        self.assertEqual(len(recorded), 8 * 500)
+
+class CartAPITestCase(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/cart/'
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        rate_limiter.reset()
+        
+        self.category = Category.objects.create(name="Coffee")
+        self.latte = MenuItem.objects.create(name="Latte", description="Milky", price=Decimal('3.50'), category=self.category)
+        self.mocha = MenuItem.objects.create(name="Mocha", description="Chocolate", price=Decimal('4.00'), category=self.category)
+    
+    def test_batched_update_returns_totals(self):
+        # Cart lookup, one menu query for every line and one upsert
+        with self.assertQueryBudget(3):
+            response = self.client.patch(self.url, [
+                {'item': self.latte.id, 'qty': 2},
+                {'item': self.mocha.id, 'qty': 1},
+            ], format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['item_count'], 3)
+        self.assertEqual(Decimal(response.data['total']), Decimal('11.00'))
+        
+        response = self.client.patch(self.url, [{'item': self.mocha.id, 'qty': 0}], format='json')
+        self.assertEqual([line['item'] for line in response.data['lines']], [self.latte.id])
+        self.assertEqual(Decimal(response.data['total']), Decimal('7.00'))
+    
+    def test_cart_is_repriced_against_the_menu(self):
+        self.client.patch(self.url, [{'item': self.latte.id, 'qty': 2}], format='json')
+        MenuItem.objects.filter(pk=self.latte.pk).update(price=Decimal('3.75'))
+        
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.data['repriced'], ['Latte'])
+        self.assertEqual(Decimal(response.data['total']), Decimal('7.50'))
+        self.assertTrue(response.data['lines'][0]['price_changed'])
+        # The refreshed price is stored, so the change is only reported once
+        self.assertEqual(self.client.get(self.url).data['repriced'], [])
+    
+    def test_invalid_batch_changes_nothing(self):
+        self.mocha.is_available = False
+        self.mocha.save()
+        
+        response = self.client.patch(self.url, [
+            {'item': self.latte.id, 'qty': 1},
+            {'item': self.mocha.id, 'qty': 1},
+            {'item': 999999, 'qty': 1},
+        ], format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('unavailable', response.data[1]['item'][0])
+        self.assertEqual(self.client.get(self.url).data['lines'], [])
+        
+        response = self.client.patch(self.url, [{'item': self.latte.id, 'qty': -1}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_unavailable_items_are_kept_but_not_totalled(self):
+        self.client.patch(self.url, [{'item': self.latte.id, 'qty': 1}, {'item': self.mocha.id, 'qty': 1}], format='json')
+        self.mocha.is_available = False
+        self.mocha.save()
+        
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.data['unavailable'], [self.mocha.id])
+        self.assertEqual(Decimal(response.data['total']), Decimal('3.50'))
+        
+        self.assertEqual(self.client.delete(self.url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(self.url).data['lines'], [])
+    
+    def test_cart_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        
+        response = self.client.get(self.url)
+        
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+class RatingTotalsAPITestCase(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [User.objects.create_user(username=f"user{i}", password='testpassword123') for i in range(3)]
+        self.category = Category.objects.create(name="Coffee")
+        self.latte = MenuItem.objects.create(name="Latte", description="Milky", price=Decimal('3.50'), category=self.category)
+        self.mocha = MenuItem.objects.create(name="Mocha", description="Chocolate", price=Decimal('4.00'), category=self.category)
+    
+    def test_review_hooks_keep_totals_current(self):
+        first = Review.objects.create(customer=self.users[0], menu_item=self.latte, rating=5)
+        Review.objects.create(customer=self.users[1], menu_item=self.latte, rating=2)
+        self.latte.refresh_from_db()
+        self.assertEqual((self.latte.rating_sum, self.latte.rating_count), (7, 2))
+        self.assertEqual(self.latte.get_average_rating(), 3.5)
+        
+        review = Review.objects.get(pk=first.pk)
+        review.rating = 3
+        review.save()
+        review.menu_item = self.mocha
+        review.save()
+        self.latte.refresh_from_db()
+        self.mocha.refresh_from_db()
+        self.assertEqual((self.latte.rating_sum, self.latte.rating_count), (2, 1))
+        self.assertEqual((self.mocha.rating_sum, self.mocha.rating_count), (3, 1))
+        
+        self.users[1].delete()
+        self.latte.refresh_from_db()
+        self.assertEqual((self.latte.rating_sum, self.latte.rating_count), (0, 0))
+        self.assertIsNone(self.latte.get_average_rating())
+    
+    def test_menu_with_ratings_adds_no_queries(self):
+        Review.objects.create(customer=self.users[0], menu_item=self.latte, rating=4)
+        Review.objects.create(customer=self.users[1], menu_item=self.mocha, rating=5)
+        
+        # ETag fingerprint, paginator count and the page itself - the same as without ratings
+        with self.assertQueryBudget(3):
+            response = self.client.get('/api/menu-items/?ordering=-average_rating')
+        
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([item['name'] for item in results], ['Mocha', 'Latte'])
+        self.assertEqual(results[0]['average_rating'], 5.0)
+        self.assertEqual(results[0]['rating_count'], 1)
+    
+    def test_recompute_ratings_repairs_drift(self):
+        Review.objects.create(customer=self.users[0], menu_item=self.latte, rating=4)
+        MenuItem.objects.filter(pk=self.latte.pk).update(rating_sum=40, rating_count=9)
+        
+        out = StringIO()
+        call_command('recompute_ratings', '--dry-run', stdout=out)
+        self.assertIn(str(self.latte.id), out.getvalue())
+        self.assertEqual(MenuItem.objects.get(pk=self.latte.pk).rating_count, 9)
+        
+        call_command('recompute_ratings', stdout=StringIO())
+        self.latte.refresh_from_db()
+        self.assertEqual((self.latte.rating_sum, self.latte.rating_count), (4, 1))
+        self.assertEqual(recompute_ratings(), [])
+
+class ExportAPITestCase(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='finance', password='testpassword123', is_staff=True)
+        self.customer = User.objects.create_user(username='customer', password='testpassword123')
+        category = Category.objects.create(name="Coffee")
+        self.latte = MenuItem.objects.create(name="Latte", description="Milky", price=Decimal('3.50'), category=category)
+        
+        start = timezone.now().replace(microsecond=0) - timedelta(days=10)
+        self.orders = []
+        for day, order_status in enumerate(['COMPLETED', 'PENDING', 'COMPLETED', 'CANCELLED']):
+            order = Order.objects.create(
+                customer=self.customer, total_amount=Decimal('7.00'), status=order_status,
+                order_date=start + timedelta(days=day), notes='Oat milk, "extra" hot' if day == 0 else None,
+            )
+            OrderItem.objects.create(order=order, menu_item=self.latte, quantity=2, price=Decimal('3.50'))
+            Payment.objects.create(
+                order=order, amount=order.total_amount, payment_method='CASH', payment_date=order.order_date
+            )
+            self.orders.append(order)
+        self.client.force_authenticate(user=self.staff)
+    
+    def _content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_orders_stream_as_csv(self):
+        response = self.client.get('/api/export/orders.csv')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.csv"')
+        rows = list(csv.reader(StringIO(self._content(response))))
+        self.assertEqual(rows[0], [
+            'id', 'order_number', 'customer_id', 'customer', 'order_date', 'status', 'total_amount', 'notes'
+        ])
+        self.assertEqual([row[1] for row in rows[1:]], [str(order.order_number) for order in self.orders])
+        self.assertEqual(rows[1][3:], [
+            'customer', self.orders[0].order_date.isoformat(), 'COMPLETED', '7.00', 'Oat milk, "extra" hot'
+        ])
+    
+    def test_csv_export_neutralises_formulas(self):
+        Order.objects.filter(pk=self.orders[0].pk).update(notes='=HYPERLINK("http://evil.example","x")')
+        Order.objects.filter(pk=self.orders[1].pk).update(notes='-2+3')
+        Payment.objects.filter(order=self.orders[0]).update(transaction_id='@SUM(A1)', amount=Decimal('-7.00'))
+        
+        rows = list(csv.reader(StringIO(self._content(self.client.get('/api/export/orders.csv')))))
+        self.assertEqual(rows[1][-1], '\'=HYPERLINK("http://evil.example","x")')
+        self.assertEqual(rows[2][-1], "'-2+3")
+        payment = list(csv.reader(StringIO(self._content(self.client.get('/api/export/payments.csv')))))[1]
+        self.assertEqual(payment[-2:], ['-7.00', "'@SUM(A1)"])
+        
+        # JSON lines are data, not a spreadsheet - values are exported as stored
+        line = json.loads(self._content(self.client.get('/api/export/orders.jsonl')).splitlines()[0])
+        self.assertEqual(line['notes'], '=HYPERLINK("http://evil.example","x")')
+    
+    def test_jsonl_export_with_date_and_status_filters(self):
+        since = self.orders[1].order_date.isoformat()
+        until = self.orders[3].order_date.isoformat()
+        response = self.client.get('/api/export/payments.jsonl', {'since': since, 'until': until, 'status': 'COMPLETED'})
+        
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['order_number'], str(self.orders[2].order_number))
+        self.assertEqual(lines[0]['amount'], '7.00')
+        self.assertEqual(lines[0]['order_status'], 'COMPLETED')
+        
+        response = self.client.get('/api/export/order-items.jsonl', {'status': 'COMPLETED'})
+        items = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual([item['order_id'] for item in items], [self.orders[0].id, self.orders[2].id])
+        self.assertEqual(items[0]['menu_item'], 'Latte')
+    
+    def test_export_is_staff_only_and_validates_filters(self):
+        self.client.force_authenticate(user=self.customer)
+        self.assertEqual(self.client.get('/api/export/orders.csv').status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.client.get('/api/export/customers.csv').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/export/orders.xlsx').status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/export/orders.csv', {'status': 'LOST', 'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'status', 'since'})
+        response = self.client.get('/api/export/orders.csv', {'since': '2026-10-02', 'until': '2026-10-01'})
+        self.assertIn('until', response.data)
+    
+    def test_header_is_sent_before_the_query_and_rows_come_from_one_cursor(self):
+        chunks = stream_export('orders', 'csv', chunk_size=2)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(next(chunks).startswith('id,order_number'))
+        self.assertEqual(len(queries), 0)
+        
+        with CaptureQueriesContext(connection) as queries:
+            body = ''.join(chunks)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(body.splitlines()), len(self.orders))
@@ -0,0 +1,42 @@
+from pathlib import Path
+import tempfile
+
+from django.db import connection, connections, DEFAULT_DB_ALIAS
+from django.test import TestCase
+
+from timepiece.database import database_settings, TUNED
+
+class DatabaseProfileTestCase(TestCase):
+    def test_profiles_are_selected_by_environment(self):
+        base_dir = Path('/srv/timepiece')
+        
+        basic = database_settings(base_dir, environ={'TIMEPIECE_DB_PROFILE': 'basic'})
+        self.assertEqual(basic, {'ENGINE': 'django.db.backends.sqlite3', 'NAME': base_dir / 'db.sqlite3'})
+        
+        tuned = database_settings(base_dir, environ={'TIMEPIECE_DB_CONN_MAX_AGE': '60', 'TIMEPIECE_DB_PATH': '/data/cafe.db'})
+        self.assertEqual(tuned['NAME'], '/data/cafe.db')
+        self.assertEqual(tuned['CONN_MAX_AGE'], 60)
+        self.assertTrue(tuned['CONN_HEALTH_CHECKS'])
+        self.assertEqual(tuned['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode=WAL', tuned['OPTIONS']['init_command'])
+        
+        with self.assertRaises(ValueError):
+            database_settings(base_dir, environ={'TIMEPIECE_DB_PROFILE': 'postgres'})
+    
+    def test_tuned_pragmas_apply_on_connect(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = dict(
+                connection.settings_dict,
+                **database_settings(Path(directory), TUNED, environ={}),
+            )
+            wrapper = type(connections[DEFAULT_DB_ALIAS])(settings_dict)
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = {
+                        name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                        for name in ('journal_mode', 'synchronous', 'busy_timeout')
+                    }
+            finally:
+                wrapper.close()
+        
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000})
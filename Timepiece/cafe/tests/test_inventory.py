@@ -0,0 +1,127 @@
+from decimal import Decimal
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection, OperationalError
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+
+from cafe.cache import menu_cache
+from cafe.checkout import CheckoutError, place_order
+from cafe.inventory import restock
+from cafe.models import Category, MenuItem, Order, OrderItem
+from cafe.tests.utils import QueryBudgetMixin
+
+class InventoryTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.category = Category.objects.create(name="Coffee")
+        self.croissant = MenuItem.objects.create(
+            name="Croissant", description="Buttery", price=Decimal('2.00'), category=self.category, stock_quantity=3
+        )
+        self.latte = MenuItem.objects.create(name="Latte", description="Milky", price=Decimal('3.50'), category=self.category)
+    
+    def _cart(self, **quantities):
+        items = {'croissant': self.croissant, 'latte': self.latte}
+        return {str(items[name].id): {'quantity': quantity} for name, quantity in quantities.items()}
+    
+    def test_checkout_decrements_stock_and_sells_out(self):
+        place_order(self.user, self._cart(croissant=2, latte=5))
+        self.croissant.refresh_from_db()
+        self.assertEqual(self.croissant.stock_quantity, 1)
+        self.assertTrue(self.croissant.is_available)
+        
+        version = menu_cache.get_version()
+        place_order(self.user, self._cart(croissant=1))
+        self.croissant.refresh_from_db()
+        self.assertEqual(self.croissant.stock_quantity, 0)
+        self.assertFalse(self.croissant.is_available)
+        # The bulk update bypasses post_save, so the menu version is bumped explicitly
+        self.assertGreater(menu_cache.get_version(), version)
+    
+    def test_overselling_aborts_the_whole_order(self):
+        with self.assertRaises(CheckoutError) as raised:
+            place_order(self.user, self._cart(croissant=4, latte=1))
+        
+        self.assertIn("Only 3 x Croissant left", raised.exception.problems)
+        self.assertFalse(Order.objects.exists())
+        self.croissant.refresh_from_db()
+        self.assertEqual(self.croissant.stock_quantity, 3)
+    
+    def test_stock_is_one_statement_per_order(self):
+        extra = [
+            MenuItem.objects.create(name=f"Muffin {i}", description="Baked", price=Decimal('1.00'), category=self.category, stock_quantity=10)
+            for i in range(10)
+        ]
+        cart = {str(item.id): {'quantity': 1} for item in extra}
+        
+        # Savepoint, menu lookup, stock update, sold-out check, order, order items, payment and release
+        with self.assertQueryBudget(8):
+            place_order(self.user, cart)
+    
+    def test_restock_puts_item_back_on_sale(self):
+        place_order(self.user, self._cart(croissant=3))
+        
+        restock(self.croissant.id, 5)
+        
+        self.croissant.refresh_from_db()
+        self.assertEqual(self.croissant.stock_quantity, 5)
+        self.assertTrue(self.croissant.is_available)
+    
+    def test_restock_keeps_items_staff_took_off_sale(self):
+        self.croissant.is_available = False
+        self.croissant.save()
+        
+        restock(self.croissant.id, 5)
+        restock(self.latte.id, 2)
+        
+        self.croissant.refresh_from_db()
+        self.assertEqual((self.croissant.stock_quantity, self.croissant.is_available), (8, False))
+        self.latte.refresh_from_db()
+        self.assertEqual((self.latte.stock_quantity, self.latte.is_available), (2, True))
+
+class ConcurrentCheckoutTestCase(TransactionTestCase):
+    # Many threads race to buy the last units - each thread has its own database connection
+    databases = '__all__'  # Reads outside a transaction go to replicas when TIMEPIECE_DB_REPLICAS is set
+    
+    def test_concurrent_checkouts_never_oversell(self):
+        category = Category.objects.create(name="Bakery")
+        croissant = MenuItem.objects.create(
+            name="Croissant", description="Buttery", price=Decimal('2.00'), category=category, stock_quantity=25
+        )
+        users = [User.objects.create_user(username=f"buyer{i}", password='testpassword123') for i in range(8)]
+        cart = {str(croissant.id): {'quantity': 2}}
+        outcomes = []
+        start = threading.Barrier(len(users))
+        
+        def buy(user):
+            start.wait()
+            try:
+                for _ in range(5):
+                    while True:
+                        try:
+                            place_order(user, cart)
+                            outcomes.append('sold')
+                        except CheckoutError:
+                            outcomes.append('refused')
+                        except OperationalError:
+                            # SQLite allows one writer at a time - a locked database is retried
+                            time.sleep(0.001)
+                            continue
+                        break
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=buy, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        croissant.refresh_from_db()
+        sold = outcomes.count('sold')
+        self.assertEqual(len(outcomes), 40)
+        self.assertEqual(sold, 12)  # 25 units in pairs - the last unit can never be sold
+        self.assertEqual(croissant.stock_quantity, 1)
+        self.assertEqual(OrderItem.objects.filter(menu_item=croissant).aggregate(total=Sum('quantity'))['total'], 24)
@@ -0,0 +1,46 @@
+import json
+import logging
+import os
+import queue
+import tempfile
+
+from django.test import TestCase
+
+from cafe.logqueue import AsyncFileHandler, BoundedQueueHandler, DROP_OLDEST, JSONFormatter
+
+class LogPipelineTestCase(TestCase):
+    def _record(self, message, **extra):
+        record = logging.LogRecord('security', logging.WARNING, __file__, 0, message, None, None)
+        record.__dict__.update(extra)
+        return record
+    
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = BoundedQueueHandler(queue.Queue(maxsize=2))
+        for i in range(5):
+            handler.handle(self._record(f"event {i}"))
+        
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.take_dropped(), 3)
+        self.assertEqual(handler.take_dropped(), 0)
+        self.assertEqual(handler.queue.get_nowait().msg, 'event 0')
+        
+        handler = BoundedQueueHandler(queue.Queue(maxsize=2), drop_policy=DROP_OLDEST)
+        for i in range(5):
+            handler.handle(self._record(f"event {i}"))
+        self.assertEqual([handler.queue.get_nowait().msg for _ in range(2)], ['event 3', 'event 4'])
+    
+    def test_async_handler_writes_structured_lines_and_rotates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'security.log')
+            handler = AsyncFileHandler(filename, max_bytes=200)
+            handler.setFormatter(JSONFormatter())
+            for i in range(10):
+                handler.handle(self._record("Login failed - Username: %s", event_type='LOGIN_FAILED', ip='10.0.0.1'))
+            handler.close()
+            
+            with open(filename) as log_file:
+                entries = [json.loads(line) for line in log_file]
+            self.assertTrue(entries)
+            self.assertEqual(entries[-1]['event_type'], 'LOGIN_FAILED')
+            self.assertEqual(entries[-1]['ip'], '10.0.0.1')
+            self.assertGreater(len(os.listdir(directory)), 1)
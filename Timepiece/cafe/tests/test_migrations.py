@@ -0,0 +1,66 @@
+from decimal import Decimal
+import uuid
+
+from django.db import connection, IntegrityError, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from cafe.order_numbers import backfill_order_uuids, legacy_order_uuid
+
+class OrderNumberMigrationTestCase(TransactionTestCase):
+    # Runs the real 0011-0013 migrations against orders written with text order numbers
+    before = [('cafe', '0011_order_uuid')]
+    after = [('cafe', '0013_order_number_uuid')]
+    
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+        self.executor.loader.build_graph()
+        apps = self.executor.loader.project_state(self.before).apps
+        self.Order = apps.get_model('cafe', 'Order')
+        customer = apps.get_model('auth', 'User').objects.create(username='legacy')
+        self.numbers = [str(uuid.uuid4()) for _ in range(4)] + ['ORD-1001']
+        for number in self.numbers:
+            self.Order.objects.create(customer=customer, total_amount=Decimal('1.00'), order_number=number)
+    
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+    
+    def test_backfill_runs_in_batches_and_resumes(self):
+        class Interrupted(Exception):
+            pass
+        
+        def stop_after_first_batch(converted):
+            raise Interrupted
+        
+        with self.assertRaises(Interrupted):
+            backfill_order_uuids(self.Order, batch_size=2, progress=stop_after_first_batch)
+        # The first batch was committed on its own and is not converted again
+        self.assertEqual(self.Order.objects.filter(order_uuid__isnull=False).count(), 2)
+        self.assertEqual(backfill_order_uuids(self.Order, batch_size=2), 3)
+        
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.after)
+        
+        Order = self.executor.loader.project_state(self.after).apps.get_model('cafe', 'Order')
+        converted = list(Order.objects.order_by('pk').values_list('order_number', flat=True))
+        expected = [uuid.UUID(number) for number in self.numbers[:4]] + [legacy_order_uuid('ORD-1001')]
+        self.assertEqual(converted, expected)
+    
+    def test_swap_copies_the_table_once_and_reverses(self):
+        backfill_order_uuids(self.Order)
+        self.executor.loader.build_graph()
+        with CaptureQueriesContext(connection) as queries:
+            self.executor.migrate(self.after)
+        rebuilds = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('INSERT INTO "new__cafe_order"')]
+        self.assertLessEqual(len(rebuilds), 1)
+        
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.before)
+        Order = self.executor.loader.project_state(self.before).apps.get_model('cafe', 'Order')
+        restored = list(Order.objects.order_by('pk').values_list('order_number', flat=True))
+        self.assertEqual(restored[:4], self.numbers[:4])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Order.objects.create(customer_id=Order.objects.first().customer_id, total_amount=Decimal('1.00'), order_number=restored[0])
@@ -0,0 +1,58 @@
+from decimal import Decimal
+import uuid
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.urls import resolve, reverse
+
+from cafe.models import Order
+from cafe.order_numbers import legacy_order_uuid, parse_order_number
+
+class OrderNumberTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.login(username='testuser', password='testpassword123')
+        self.order = Order.objects.create(customer=self.user, total_amount=Decimal('3.50'))
+    
+    def test_order_number_is_stored_as_a_native_uuid(self):
+        self.order.refresh_from_db()
+        self.assertIsInstance(self.order.order_number, uuid.UUID)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT order_number FROM cafe_order WHERE id = %s", [self.order.id])
+            stored = cursor.fetchone()[0]
+        if connection.vendor == 'sqlite':
+            # 32 hex digits instead of the 36-character dashed text
+            self.assertEqual(stored, self.order.order_number.hex)
+    
+    def test_order_detail_url_and_lookups(self):
+        url = reverse('cafe:order_detail', args=[self.order.order_number])
+        self.assertEqual(url, f"/orders/{self.order.order_number}/")
+        # The uuid path converter hands the view a UUID, which matches the column directly
+        self.assertEqual(resolve(url).kwargs, {'order_number': self.order.order_number})
+        self.assertEqual(Order.objects.get(order_number=str(self.order.order_number)), self.order)
+        
+        other = User.objects.create_user(username='other', password='testpassword123')
+        foreign = Order.objects.create(customer=other, total_amount=Decimal('1.00'))
+        self.assertEqual(self.client.get(reverse('cafe:order_detail', args=[foreign.order_number])).status_code, 404)
+    
+    def test_legacy_order_numbers_map_to_stable_uuids(self):
+        value = uuid.uuid4()
+        self.assertEqual(parse_order_number(str(value)), value)
+        self.assertEqual(parse_order_number(f"  {value.hex.upper()} "), value)
+        self.assertIsNone(parse_order_number('ORD-1001'))
+        self.assertEqual(legacy_order_uuid(str(value)), value)
+        self.assertEqual(legacy_order_uuid('ORD-1001'), legacy_order_uuid('ORD-1001'))
+        self.assertNotEqual(legacy_order_uuid('ORD-1001'), legacy_order_uuid('ORD-1002'))
+    
+    def test_admin_search_matches_order_numbers_exactly(self):
+        other = Order.objects.create(customer=self.user, total_amount=Decimal('1.00'))
+        order_admin = admin.site._registry[Order]
+        request = RequestFactory().get('/admin/cafe/order/')
+        
+        results, may_have_duplicates = order_admin.get_search_results(request, Order.objects.all(), str(other.order_number))
+        self.assertEqual(list(results), [other])
+        self.assertFalse(may_have_duplicates)
+        results, _ = order_admin.get_search_results(request, Order.objects.all(), 'testuser')
+        self.assertEqual(set(results), {self.order, other})
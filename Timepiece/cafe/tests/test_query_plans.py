@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.utils import timezone
+
+from cafe.models import Category, MenuItem, Order, OrderItem, Payment, Review, SavedCart, SupportMessage, SupportRequest
+
+class QueryPlanTestCase(TestCase):
+    # Every hot query from cafe.views and cafe.api.views must be answered from an index -
+    # EXPLAIN QUERY PLAN reports a full table scan as "SCAN <table>" with no "USING ... INDEX"
+    # and a sort the index could not provide as "USE TEMP B-TREE FOR ORDER BY"
+    
+    def _hot_queries(self):
+        user = User.objects.create_user(username='planner', password='testpassword123')
+        category = Category.objects.create(name="Coffee")
+        order = Order.objects.create(customer=user, total_amount=Decimal('1.00'))
+        support_request = SupportRequest.objects.create(customer=user, subject="Help", description="Cold coffee")
+        last_seen = timezone.now()
+        
+        return {
+            'home featured items': MenuItem.objects.filter(is_available=True).order_by('category', 'name')[:6],
+            'menu page': MenuItem.objects.filter(is_available=True).select_related('category').order_by('category', 'name'),
+            'menu page by category': MenuItem.objects.filter(is_available=True, category=category).order_by('category', 'name'),
+            'related items': MenuItem.objects.filter(category=category.id, is_available=True).exclude(id=1)[:4],
+            'menu fingerprint': MenuItem.objects.filter(is_available=True).order_by().values('updated_at'),
+            'order history': Order.objects.filter(customer=user).order_by('-order_date'),
+            'order detail': Order.objects.select_related('payment').filter(order_number=order.order_number, customer=user),
+            'api orders page': Order.objects.filter(customer=user).order_by('-order_date', '-id')[:11],
+            'api orders next page': Order.objects.filter(customer=user).filter(
+                Q(order_date__lt=last_seen) | Q(order_date=last_seen, id__lt=order.id)
+            ).order_by('-order_date', '-id')[:11],
+            'api orders by status': Order.objects.filter(status='PENDING').order_by('-order_date', '-id')[:11],
+            'api order items': OrderItem.objects.filter(order__customer=user),
+            'api payments by method': Payment.objects.filter(payment_method='ONLINE').order_by('-payment_date', '-id')[:11],
+            'api payment for order': Payment.objects.filter(order=order),
+            'support requests': SupportRequest.objects.filter(customer=user).order_by('-created_at'),
+            'api support requests': SupportRequest.objects.filter(customer=user).order_by('-created_at', '-id')[:11],
+            'api support requests by status': SupportRequest.objects.filter(status='OPEN').order_by('-created_at', '-id')[:11],
+            'support thread': support_request.messages.order_by('created_at'),
+            'api support messages': SupportMessage.objects.filter(support_request__customer=user),
+            'api reviews for item': Review.objects.filter(menu_item=1).order_by('created_at'),
+            'saved cart': SavedCart.objects.filter(user=user),
+        }
+    
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN output is SQLite specific')
+        
+        scans = []
+        for label, queryset in self._hot_queries().items():
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                # A full scan, or rows read in index order but then sorted again
+                if (step.startswith('SCAN ') and 'INDEX' not in step) or 'TEMP B-TREE' in step:
+                    scans.append(f"{label}: {step}")
+        
+        self.assertEqual(scans, [], "Hot queries without a usable index:\n" + "\n".join(scans))
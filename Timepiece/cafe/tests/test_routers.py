@@ -0,0 +1,83 @@
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import override_settings, RequestFactory, SimpleTestCase, TestCase
+
+from cafe.middleware import ReplicaPinningMiddleware
+from cafe.models import MenuItem, Order, TokenUsage
+from cafe.routers import ReplicaRouter, routing_scope
+from timepiece.database import database_settings, replica_databases, TUNED
+
+@override_settings(REPLICA_ROUTING={'REPLICAS': ['replica']})
+class ReplicaRouterTestCase(SimpleTestCase):
+    # Routing decisions only - 'replica' is never connected to, and no test transaction is open
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+    
+    def _middleware(self, view):
+        return ReplicaPinningMiddleware(view)
+    
+    def test_reads_go_to_replicas_and_writes_to_primary(self):
+        with routing_scope():
+            self.assertEqual(self.router.db_for_read(MenuItem), 'replica')
+            self.assertIsNone(self.router.db_for_read(User))
+            self.assertEqual(self.router.db_for_write(Order), 'default')
+            # The write pins the rest of the request to the primary
+            self.assertEqual(self.router.db_for_read(Order), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'cafe'))
+    
+    def test_writing_request_pins_the_client(self):
+        routes = []
+        
+        def place_order_view(request):
+            self.router.db_for_write(Order)
+            return HttpResponse()
+        
+        def order_list_view(request):
+            routes.append(self.router.db_for_read(Order))
+            return HttpResponse()
+        
+        response = self._middleware(place_order_view)(self.factory.post('/checkout/'))
+        cookie = response.cookies['cafe_db_pin']
+        self.assertEqual(cookie['max-age'], 5)
+        
+        pinned = self.factory.get('/orders/')
+        pinned.COOKIES['cafe_db_pin'] = cookie.value
+        self._middleware(order_list_view)(pinned)
+        self._middleware(order_list_view)(self.factory.get('/orders/'))
+        self.assertEqual(routes, ['default', 'replica'])
+    
+    def test_bookkeeping_writes_do_not_pin(self):
+        with routing_scope() as state:
+            self.assertEqual(self.router.db_for_write(TokenUsage), 'default')
+            self.assertFalse(state.wrote)
+            self.assertEqual(self.router.db_for_read(MenuItem), 'replica')
+            
+            self.router.db_for_write(Order)
+            self.assertTrue(state.wrote)
+    
+    @override_settings(REPLICA_ROUTING={'REPLICAS': []})
+    def test_routing_is_off_without_replicas(self):
+        self.assertIsNone(self.router.db_for_read(MenuItem))
+        response = self._middleware(lambda request: HttpResponse())(self.factory.get('/'))
+        self.assertNotIn('cafe_db_pin', response.cookies)
+    
+    def test_replica_aliases_come_from_the_environment(self):
+        primary = database_settings(Path('/srv/timepiece'), TUNED, environ={})
+        
+        replicas = replica_databases(primary, environ={'TIMEPIECE_DB_REPLICAS': '/data/r1.db, /data/r2.db'})
+        
+        self.assertEqual(sorted(replicas), ['replica1', 'replica2'])
+        self.assertEqual(replicas['replica2']['NAME'], '/data/r2.db')
+        self.assertTrue(replicas['replica1']['OPTIONS']['init_command'].endswith('PRAGMA query_only=ON'))
+        self.assertNotIn('transaction_mode', replicas['replica1']['OPTIONS'])
+        self.assertEqual(replicas['replica1']['TEST'], {'MIRROR': 'default'})
+
+@override_settings(REPLICA_ROUTING={'REPLICAS': ['replica']})
+class ReplicaRouterTransactionTestCase(TestCase):
+    def test_reads_inside_a_transaction_use_the_primary(self):
+        # TestCase runs inside an atomic block, like checkout reading the stock it is about to decrement
+        self.assertEqual(ReplicaRouter().db_for_read(MenuItem), 'default')
+        self.assertEqual(MenuItem.objects.all().db, 'default')
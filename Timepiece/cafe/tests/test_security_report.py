@@ -0,0 +1,59 @@
+from io import StringIO
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from cafe.security_events import TopCounter
+
+class SecurityReportTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'security.log')
+        events = []
+        for second in range(6):
+            events.append({'time': f'2026-10-18 09:00:{second:02d},000', 'event_type': 'LOGIN_FAILED',
+                           'ip': '10.0.0.1', 'user': 'admin', 'user_agent': 'curl/8.0'})
+        events.append({'time': '2026-10-18 09:00:30,000', 'event_type': 'LOGIN_FAILED',
+                       'ip': '10.0.0.2', 'user': 'alice', 'user_agent': 'Firefox'})
+        events.append({'time': '2026-10-18 09:01:00,000', 'event_type': 'LOGIN',
+                       'ip': '10.0.0.2', 'user': 'alice', 'user_agent': 'Firefox'})
+        with open(self.path, 'w') as log_file:
+            log_file.write('INFO 2026-10-17 legacy plain text line\n')
+            for event in events:
+                log_file.write(json.dumps(event) + '\n')
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def _report(self, *args):
+        out = StringIO()
+        call_command('security_report', *args, '--file', self.path, stdout=out)
+        return out.getvalue()
+    
+    def test_failed_logins_per_ip_per_minute(self):
+        output = self._report('failed-per-minute', '--threshold', '5')
+        
+        self.assertIn('2026-10-18 09:00  10.0.0.1', output)
+        self.assertNotIn('10.0.0.2', output)
+        self.assertIn('1 IP/minute windows', output)
+    
+    def test_top_user_agents_with_filters(self):
+        output = self._report('top-user-agents', '--event-type', 'LOGIN_FAILED')
+        self.assertIn('       6  curl/8.0', output)
+        self.assertIn('7 events scanned', output)
+        
+        output = self._report('top-users', '--since', '2026-10-18T09:00:30')
+        self.assertIn('       2  alice', output)
+        self.assertNotIn('admin', output)
+    
+    def test_top_counter_keeps_heavy_hitters_in_bounded_memory(self):
+        counter = TopCounter(capacity=3)
+        for i in range(1000):
+            counter.add('attacker')
+            counter.add(f"noise-{i}")
+        
+        self.assertLessEqual(len(counter.counts), 3)
+        self.assertEqual(counter.most_common(1)[0][0], 'attacker')
@@ -1,8 +1,28 @@
-from django.test import TestCase, Client
-from django.urls import reverse
-from django.contrib.auth.models import User
-from cafe.models import Category, MenuItem, CustomerProfile, Order
 from decimal import Decimal
+from io import StringIO
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, override_settings, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from django_otp.plugins.otp_totp.models import TOTPDevice
+
+from cafe.cache import LRUCache, menu_cache, MENU_VERSION_KEY
+from cafe.cart import CacheCartStore, Cart, CartLine, SignedCookieCartStore
+from cafe.devices import device_cache
+from cafe.inspection import DEFAULT_SIGNATURES, PrefixTree, SignatureScanner
+from cafe.middleware import SecurityMiddleware
+from cafe.models import Category, MenuItem, Order, SupportMessage, SupportRequest
+from cafe.tests.utils import QueryBudgetMixin
 
 class HomeViewTestCase(TestCase):
     def setUp(self):
@@ -74,6 +94,14 @@ class MenuViewTestCase(TestCase):
         # Check all items are shown
         self.assertEqual(len(response.context['menu_items']), 5)
     
+    def test_menu_view_with_search(self):
+        response = self.client.get(self.url, {'search': 'foo'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['menu_items']), 2)
+        for item in response.context['menu_items']:
+            self.assertEqual(item.category, self.food_category)
+    
     def test_menu_view_with_category_filter(self):
         url = reverse('cafe:menu_category', args=[self.coffee_category.id])
         response = self.client.get(url)
@@ -193,4 +221,373 @@ class ProtectedViewsTestCase(TestCase):
         response = self.client.get(profile_url)
         
         # Should be accessible after login
-        self.assertEqual(response.status_code, 200) 
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+class MenuCacheTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('cafe:menu')
+        menu_cache.clear()
+        menu_cache.reset_stats()
+        
+        self.category = Category.objects.create(name="Coffee")
+        self.menu_item = MenuItem.objects.create(
+            name="Espresso",
+            description="Strong coffee",
+            price=Decimal('2.50'),
+            category=self.category,
+            is_available=True
+        )
+    
+    def test_repeated_menu_requests_hit_cache(self):
+        self.client.get(self.url)
+        misses = menu_cache.stats()['misses']
+        
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(menu_cache.stats()['misses'], misses)
+        self.assertTrue(menu_cache.stats()['hits'] > 0)
+    
+    def test_price_change_invalidates_menu(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, '2.50')
+        
+        self.menu_item.price = Decimal('3.10')
+        self.menu_item.save()
+        
+        response = self.client.get(self.url)
+        self.assertContains(response, '3.10')
+        self.assertNotContains(response, '2.50')
+    
+    def test_change_from_another_worker_invalidates_menu(self):
+        etag = self.client.get(self.url)['ETag']
+        # Another worker saved the price and bumped the version through its own connection to the shared cache
+        MenuItem.objects.filter(pk=self.menu_item.pk).update(price=Decimal('3.10'))
+        caches.create_connection(menu_cache.version_cache).incr(MENU_VERSION_KEY)
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '3.10')
+    
+    def test_deleted_item_disappears_from_detail(self):
+        detail_url = reverse('cafe:menu_item_detail', args=[self.menu_item.id])
+        self.assertEqual(self.client.get(detail_url).status_code, 200)
+        
+        self.menu_item.delete()
+        
+        self.assertEqual(self.client.get(detail_url).status_code, 404)
+    
+    def test_unchanged_menu_revalidates_with_304(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        
+        self.menu_item.price = Decimal('3.10')
+        self.menu_item.save()
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_lru_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = Client()
+        menu_cache.clear()
+        
+        self.categories = [Category.objects.create(name=f"Category {i}") for i in range(5)]
+        for i in range(30):
+            MenuItem.objects.create(
+                name=f"Item {i}",
+                description=f"Description {i}",
+                price=Decimal('2.50'),
+                category=self.categories[i % 5],
+                is_available=True
+            )
+        self.menu_item = MenuItem.objects.first()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        self.staff = User.objects.create_user(username='staff', password='testpassword123', is_staff=True)
+    
+    def test_menu_query_budget(self):
+        # Budget holds on a cold cache, independent of menu size
+        with self.assertQueryBudget(2):
+            response = self.client.get(reverse('cafe:menu'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '6 items')
+    
+    def test_home_query_budget(self):
+        with self.assertQueryBudget(2):
+            response = self.client.get(reverse('cafe:home'))
+        self.assertEqual(response.status_code, 200)
+    
+    def test_menu_item_detail_query_budget(self):
+        with self.assertQueryBudget(2):
+            response = self.client.get(reverse('cafe:menu_item_detail', args=[self.menu_item.id]))
+        self.assertEqual(response.status_code, 200)
+    
+    def test_support_request_list_query_budget(self):
+        for i in range(10):
+            SupportRequest.objects.create(
+                customer=self.user, subject=f"Issue {i}", description="Details", assigned_to=self.staff
+            )
+        self.client.force_login(self.staff)
+        
+        # Session, user and the request list itself
+        with self.assertQueryBudget(3):
+            response = self.client.get(reverse('cafe:support_request_list'))
+        self.assertEqual(response.status_code, 200)
+    
+    def test_support_request_detail_query_budget(self):
+        support_request = SupportRequest.objects.create(
+            customer=self.user, subject="Issue", description="Details"
+        )
+        for i in range(10):
+            SupportMessage.objects.create(support_request=support_request, sender=self.user, message=f"Message {i}")
+        self.client.force_login(self.user)
+        
+        with self.assertQueryBudget(4):
+            response = self.client.get(reverse('cafe:support_request_detail', args=[support_request.id]))
+        self.assertEqual(response.status_code, 200)
+
+class CheckoutTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('cafe:checkout')
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_login(self.user)
+        
+        self.category = Category.objects.create(name="Coffee")
+        self.menu_items = [
+            MenuItem.objects.create(
+                name=f"Item {i}",
+                description=f"Description {i}",
+                price=Decimal('2.50'),
+                category=self.category
+            )
+            for i in range(20)
+        ]
+    
+    def _fill_cart(self, menu_items, price='2.50'):
+        session = self.client.session
+        session['cart'] = {
+            str(item.id): {'quantity': 2, 'price': price, 'name': item.name}
+            for item in menu_items
+        }
+        session.save()
+    
+    def test_checkout_query_budget_is_constant(self):
+        self._fill_cart(self.menu_items)
+        
+        # Session/user lookup, bulk menu load, order, order items, payment and session save
+        with self.assertQueryBudget(12):
+            response = self.client.post(self.url, {'notes': 'No sugar'})
+        
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.get(customer=self.user)
+        self.assertEqual(order.items.count(), 20)
+        self.assertEqual(order.total_amount, Decimal('100.00'))
+        self.assertEqual(order.payment.amount, Decimal('100.00'))
+    
+    def test_checkout_charges_current_menu_price(self):
+        self._fill_cart(self.menu_items[:1], price='1.00')
+        
+        self.client.post(self.url)
+        
+        order = Order.objects.get(customer=self.user)
+        self.assertEqual(order.total_amount, Decimal('5.00'))
+        self.assertEqual(order.items.get().price, Decimal('2.50'))
+    
+    def test_unavailable_item_aborts_checkout(self):
+        self._fill_cart(self.menu_items[:3])
+        self.menu_items[1].is_available = False
+        self.menu_items[1].save()
+        
+        response = self.client.post(self.url)
+        
+        self.assertRedirects(response, reverse('cafe:cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.filter(customer=self.user).exists())
+        self.assertEqual(len(self.client.session['cart']), 3)
+
+class SecurityInspectionTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+    
+    def test_scanner_reports_every_category_once(self):
+        scanner = SignatureScanner(DEFAULT_SIGNATURES)
+        
+        self.assertEqual(scanner.scan('category=3&search=latte'), ())
+        self.assertEqual(scanner.scan("search=%27+union+select"), ('sql',))
+        # A greedy SQL signature must not hide the XSS payload that follows it
+        self.assertEqual(scanner.scan("q=1;<script>alert(1)</script>"), ('sql', 'xss'))
+        self.assertEqual(scanner.scan('q=JavaScript:alert(1)'), ('xss',))
+    
+    def test_scanner_caches_repeated_query_strings(self):
+        scanner = SignatureScanner(DEFAULT_SIGNATURES, max_cached_length=32)
+        scanner.scan('search=latte')
+        scanner.scan('search=latte')
+        scanner.scan('search=' + 'x' * 64)
+        
+        stats = scanner.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['entries'], 1)
+    
+    def test_prefix_tree_matches_only_prefixes(self):
+        tree = PrefixTree(['/api/', '/static/'])
+        
+        self.assertTrue(tree.matches('/api/orders/'))
+        self.assertTrue(tree.matches('/static/css/style.css'))
+        self.assertFalse(tree.matches('/apix/'))
+        self.assertFalse(tree.matches('/menu/'))
+    
+    @override_settings(SECURITY_INSPECTION={'SIGNATURES': {'probe': [r'wp-admin']}})
+    def test_middleware_uses_configured_signatures(self):
+        middleware = SecurityMiddleware(lambda request: HttpResponse())
+        request = self.factory.get('/menu/', QUERY_STRING='next=/wp-admin/')
+        request.user = AnonymousUser()
+        
+        with self.assertLogs('security', level='WARNING') as logs:
+            middleware(request)
+        self.assertIn('Suspicious pattern (probe) detected', logs.output[0])
+
+class DevicePresenceCacheTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.middleware = SecurityMiddleware(lambda request: HttpResponse())
+        device_cache.invalidate(self.user.pk)
+        device_cache.reset_stats()
+    
+    def _request(self):
+        request = RequestFactory().get('/orders/')
+        request.user = self.user
+        return request
+    
+    def test_no_device_answer_is_served_without_queries(self):
+        self.assertFalse(self.middleware._should_enforce_2fa(self._request()))
+        
+        with self.assertNumQueries(0):
+            self.assertFalse(self.middleware._should_enforce_2fa(self._request()))
+        
+        stats = device_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertGreater(stats['queries_saved'], 0)
+    
+    def test_device_changes_invalidate_cached_answer(self):
+        self.assertFalse(device_cache.has_device(self.user))
+        
+        device = TOTPDevice.objects.create(user=self.user, name='phone', confirmed=True)
+        self.assertTrue(device_cache.has_device(self.user))
+        self.assertTrue(self.middleware._should_enforce_2fa(self._request()))
+        
+        device.delete()
+        self.assertFalse(device_cache.has_device(self.user))
+
+class CartStoreTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.category = Category.objects.create(name="Coffee")
+        self.latte = MenuItem.objects.create(
+            name="Latte", description="Milky", price=Decimal('3.50'), category=self.category
+        )
+    
+    def _request(self, cookies=None):
+        request = self.factory.get('/cart/')
+        request.COOKIES.update(cookies or {})
+        return request
+    
+    def test_compact_encoding_round_trips_and_reads_legacy_carts(self):
+        cart = Cart()
+        cart.add(12, 2, Decimal('3.50'))
+        cart.add(7, 1, Decimal('2.00'))
+        
+        self.assertEqual(cart.encode(), '12:2:3.50|7:1:2.00')
+        self.assertEqual(dict(Cart.decode(cart.encode()).items()), dict(cart.items()))
+        legacy = Cart.decode({'12': {'quantity': 2, 'price': '3.50', 'name': 'Latte'}})
+        self.assertEqual(legacy.get(12), CartLine(2, Decimal('3.50')))
+        self.assertFalse(Cart.decode('garbage|1:x:2'))
+    
+    def test_unchanged_cart_is_not_rewritten(self):
+        cart = Cart.decode('12:2:3.50')
+        cart.set_quantity(12, 2)
+        cart.remove(99)
+        
+        self.assertFalse(cart.changed)
+        cart.set_quantity(12, 3)
+        self.assertTrue(cart.changed)
+    
+    def test_session_is_only_saved_when_the_cart_changes(self):
+        add_url = reverse('cafe:add_to_cart', args=[self.latte.id])
+        update_url = reverse('cafe:update_cart_item', args=[self.latte.id])
+        self.client.post(add_url, {'quantity': 2})
+        self.assertEqual(self.client.session['cart'], f"{self.latte.id}:2:3.50")
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(update_url, {'quantity': 2})
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "django_session"')])
+        
+        self.client.post(update_url, {'quantity': 0})
+        self.assertNotIn('cart', self.client.session)
+    
+    def test_signed_cookie_store_rejects_tampering(self):
+        store = SignedCookieCartStore()
+        cart = Cart()
+        cart.add(self.latte.id, 1, self.latte.price)
+        response = store.save(self._request(), HttpResponse(), cart)
+        value = response.cookies['cart'].value
+        
+        self.assertEqual(store.load(self._request({'cart': value})).get(self.latte.id).quantity, 1)
+        self.assertFalse(store.load(self._request({'cart': value.replace(':1:', ':9:', 1)})))
+    
+    def test_cache_store_keys_carts_by_cookie(self):
+        store = CacheCartStore()
+        cart = Cart()
+        cart.add(self.latte.id, 4, self.latte.price)
+        response = store.save(self._request(), HttpResponse(), cart)
+        cookies = {'cart_id': response.cookies['cart_id'].value}
+        
+        self.assertEqual(store.load(self._request(cookies)).get(self.latte.id).quantity, 4)
+        self.assertFalse(store.load(self._request({'cart_id': 'someone-else'})))
+        store.save(self._request(cookies), HttpResponse(), Cart())
+        self.assertFalse(store.load(self._request(cookies)))
+
+class ExportCommandTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.completed = Order.objects.create(customer=user, total_amount=Decimal('3.50'), status='COMPLETED')
+        self.pending = Order.objects.create(customer=user, total_amount=Decimal('2.00'))
+    
+    def test_exports_to_stdout_and_file(self):
+        out = StringIO()
+        call_command('export_orders', '--format', 'jsonl', '--status', 'COMPLETED', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['order_number'] for row in rows], [str(self.completed.order_number)])
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'orders.csv')
+            call_command('export_orders', '--output', path, '--chunk-size', '1', stdout=StringIO())
+            with open(path, encoding='utf-8') as export_file:
+                lines = export_file.read().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[2].startswith(f"{self.pending.id},{self.pending.order_number},"))
+    
+    def test_rejects_invalid_filters(self):
+        with self.assertRaisesMessage(CommandError, '--status'):
+            call_command('export_orders', '--status', 'LOST', stdout=StringIO())
@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    # TestCase mixin that fails a test when a block of code runs more queries than allowed
+    # Unlike assertNumQueries the budget is an upper bound, so harmless savings don't break tests
+    
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        
+        executed = len(context)
+        if executed > budget:
+            queries = '\n'.join(
+                f"{index}. {query['sql']}"
+                for index, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(
+                f"{executed} queries executed, query budget is {budget}\n"
+                f"Captured queries were:\n{queries}"
+            )
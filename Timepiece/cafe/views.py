@@ -5,18 +5,26 @@ from django.utils import timezone
 from django.urls import reverse_lazy
 from django.views.generic.edit import CreateView
 from django.contrib.auth import login
-from django.http import HttpResponseRedirect, HttpResponse
-from django.db.models import F, Sum
-from decimal import Decimal
+from django.http import HttpResponseRedirect, HttpResponse, Http404
+from django.db.models import F, Sum, Count, Q
 from .forms import UserRegistrationForm, CustomerProfileForm, SupportRequestForm, SupportMessageForm
-from .models import Category, MenuItem, Order, OrderItem, SupportRequest, SupportMessage, Payment
+from .models import Category, MenuItem, Order, SupportRequest, SupportMessage, Payment
+from .cache import cached_query, make_key
+from .search import search_menu_items, tokenize
+from .checkout import place_order, CheckoutError
+from .cart import get_cart, load_menu_items, price_cart, save_cart
+from .conditional import fingerprint_rows, has_pending_messages, menu_validators, not_modified, set_validators
 from django.template.loader import render_to_string
 from django.utils.html import escape
 
 def home(request):
     # Homepage view that displays featured menu items - satisfies the browsing requirement
-    categories = Category.objects.all()
-    featured_items = MenuItem.objects.filter(is_available=True)[:6]
+    # Query results are cached per menu version - see cafe.cache
+    categories = cached_query('home:categories', lambda: list(Category.objects.all()))
+    # Menu order rather than an unordered slice, so the query is a range read of cafe_menuitem_avail_cat_idx
+    featured_items = cached_query(
+        'home:featured', lambda: list(MenuItem.objects.filter(is_available=True).order_by('category', 'name')[:6])
+    )
     
     context = {
         'categories': categories,
@@ -43,28 +51,35 @@ def newsletter_signup(request):
 
 def menu(request, category_id=None):
     # Menu browsing view with filtering options - core browse feature from use cases
-    categories = Category.objects.all().order_by('name')
+    # Item counts are annotated so the category list renders without a query per category
+    categories = cached_query('menu:categories', lambda: list(
+        Category.objects.annotate(
+            item_count=Count('menu_items', filter=Q(menu_items__is_available=True))
+        ).order_by('name')
+    ))
+    categories_by_id = {category.id: category for category in categories}
     
     filters = {}
     active_category = None
     
     if category_id:
         # Filter by direct category ID in URL
-        active_category = get_object_or_404(Category, id=category_id)
-        filters['category'] = active_category
+        active_category = categories_by_id.get(category_id)
+        if active_category is None:
+            raise Http404("No Category matches the given query.")
+        filters['category_id'] = active_category.id
     elif request.GET.get('category'):
         # Filter by category ID in query parameters
         try:
-            category_id = int(request.GET.get('category'))
-            active_category = Category.objects.get(id=category_id)
-            filters['category'] = active_category
-        except (ValueError, Category.DoesNotExist):
+            active_category = categories_by_id.get(int(request.GET.get('category')))
+        except ValueError:
             pass
+        if active_category is not None:
+            filters['category_id'] = active_category.id
     
-    if request.GET.get('search'):
-        # Search functionality for menu items - addressing search requirement
-        search_query = request.GET.get('search')
-        filters['name__icontains'] = search_query
+    # Search functionality for menu items - addressing search requirement
+    # Uses the full-text index and ranks results by relevance (see cafe.search)
+    search_terms = ' '.join(tokenize(request.GET.get('search', ''))).lower()
     
     if request.GET.get('price_min'):
         # Price range filter - minimum
@@ -97,20 +112,52 @@ def menu(request, category_id=None):
     # Only show available items - inventory management feature
     filters['is_available'] = True
     
-    menu_items = MenuItem.objects.filter(**filters).order_by('category', 'name')
+    # Each filter combination gets its own cached result and rendered fragment
+    filter_key = make_key(*(f"{name}={value}" for name, value in sorted(filters.items())), f"search={search_terms}")
+    
+    def load_filtered_items():
+        items = MenuItem.objects.filter(**filters).select_related('category')
+        if search_terms:
+            return list(search_menu_items(items, search_terms))
+        return list(items.order_by('category', 'name'))
+    
+    menu_items = cached_query(make_key('menu:items', filter_key), load_filtered_items)
+    
+    # Conditional GET - kiosks re-polling an unchanged menu get a 304 without rendering
+    # The fingerprint comes from the cached rows and the page greets the signed-in user
+    conditional = request.method in ('GET', 'HEAD') and not has_pending_messages(request)
+    if conditional:
+        etag = menu_validators(
+            request, fingerprint_rows(menu_items, 'updated_at'), variant=(request.user.pk,)
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
     
     context = {
         'categories': categories,
         'active_category': active_category,
         'menu_items': menu_items,
+        'menu_cache_key': filter_key,
     }
     
-    return render(request, 'cafe/menu.html', context)
+    response = render(request, 'cafe/menu.html', context)
+    if conditional:
+        set_validators(response, etag)
+    return response
 
 def menu_item_detail(request, item_id):
     # Detailed item view - supports the detailed product information requirement
-    menu_item = get_object_or_404(MenuItem, id=item_id, is_available=True)
-    related_items = MenuItem.objects.filter(category=menu_item.category, is_available=True).exclude(id=item_id)[:4]
+    menu_item = cached_query(
+        make_key('detail:item', item_id),
+        lambda: MenuItem.objects.filter(id=item_id, is_available=True).select_related('category').first()
+    )
+    if menu_item is None:
+        raise Http404("No MenuItem matches the given query.")
+    related_items = cached_query(
+        make_key('detail:related', item_id),
+        lambda: list(MenuItem.objects.filter(category=menu_item.category_id, is_available=True).exclude(id=item_id)[:4])
+    )
     
     context = {
         'menu_item': menu_item,
@@ -128,6 +175,8 @@ def support_request_list(request):
     else:
         # Customers can only see their own requests
         support_requests = SupportRequest.objects.filter(customer=request.user).order_by('-created_at')
+    # Customer and assignee names are shown on every row
+    support_requests = support_requests.select_related('customer', 'assigned_to')
     
     context = {
         'support_requests': support_requests
@@ -138,7 +187,9 @@ def support_request_list(request):
 @login_required
 def support_request_detail(request, request_id):
     # Support ticket details view with messaging - customer service requirement
-    support_request = get_object_or_404(SupportRequest, id=request_id)
+    support_request = get_object_or_404(
+        SupportRequest.objects.select_related('customer', 'assigned_to'), id=request_id
+    )
     
     # Security check - only allow staff or the ticket owner to view
     if not request.user.is_staff and request.user != support_request.customer:
@@ -168,7 +219,7 @@ def support_request_detail(request, request_id):
             messages.error(request, "Message cannot be empty.")
     
     # Get all messages in chronological order
-    support_messages = support_request.messages.all().order_by('created_at')
+    support_messages = support_request.messages.select_related('sender').order_by('created_at')
     
     context = {
         'support_request': support_request,
@@ -201,7 +252,9 @@ def support_request_create(request):
 @login_required
 def support_request_update(request, request_id):
     # Support ticket status update - staff functionality for customer service
-    support_request = get_object_or_404(SupportRequest, id=request_id)
+    support_request = get_object_or_404(
+        SupportRequest.objects.select_related('customer', 'assigned_to'), id=request_id
+    )
     
     # Security check - only staff or assigned staff can update
     if not request.user.is_staff and request.user != support_request.assigned_to:
@@ -363,93 +416,77 @@ def register_direct(request):
     
     return HttpResponse(html)
 
-def get_cart(request):
-    # Helper function to get or initialize the shopping cart in session
-    cart = request.session.get('cart', {})
-    if not cart:
-        request.session['cart'] = {}
-    return request.session['cart']
+def _cart_context(request, cart):
+    # Cart rows for display, revalidated against the menu in one query - see cafe.cart.price_cart
+    priced = price_cart(cart, load_menu_items(cart))
+    if priced.repriced:
+        messages.warning(request, f"Prices were updated for: {', '.join(priced.repriced)}")
+    if priced.unavailable:
+        messages.warning(request, "Some items in your cart are currently unavailable.")
+    
+    cart_items = [
+        {
+            'id': line.item,
+            'name': line.name,
+            'price': line.unit_price,
+            'quantity': line.qty,
+            'subtotal': line.subtotal,
+            'is_available': line.is_available
+        }
+        for line in priced.lines
+    ]
+    
+    return {
+        'cart_items': cart_items,
+        'total': priced.total
+    }
 
 def add_to_cart(request, item_id):
     # Add item to cart functionality - implements ordering requirement
+    # The cart is only written back when it changed - see cafe.cart
     cart = get_cart(request)
     menu_item = get_object_or_404(MenuItem, id=item_id, is_available=True)
-    item_id_str = str(item_id)
     
     quantity = int(request.POST.get('quantity', 1))
     
     # Update quantity if item already in cart, otherwise add new entry
-    if item_id_str in cart:
-        cart[item_id_str]['quantity'] += quantity
-    else:
-        cart[item_id_str] = {
-            'quantity': quantity,
-            'price': str(menu_item.price),
-            'name': menu_item.name
-        }
-    
-    request.session.modified = True
+    cart.add(menu_item.id, quantity, menu_item.price)
     messages.success(request, f"{menu_item.name} added to your cart.")
     
     next_url = request.POST.get('next', 'cafe:cart')
-    return redirect(next_url)
+    return save_cart(request, redirect(next_url))
 
 def update_cart_item(request, item_id):
     # Update cart item quantity - part of cart management requirement
     cart = get_cart(request)
-    item_id_str = str(item_id)
     
-    if item_id_str in cart:
+    if item_id in cart:
         quantity = int(request.POST.get('quantity', 1))
         if quantity > 0:
-            cart[item_id_str]['quantity'] = quantity
+            cart.set_quantity(item_id, quantity)
             messages.success(request, "Cart updated.")
         else:
             return remove_from_cart(request, item_id)
     
-    request.session.modified = True
-    return redirect('cafe:cart')
+    return save_cart(request, redirect('cafe:cart'))
 
 def remove_from_cart(request, item_id):
     # Remove item from cart - part of cart management requirement
     cart = get_cart(request)
-    item_id_str = str(item_id)
     
-    if item_id_str in cart:
-        item_name = cart[item_id_str]['name']
-        del cart[item_id_str]
-        request.session.modified = True
+    if item_id in cart:
+        cart.remove(item_id)
+        item_name = MenuItem.objects.filter(id=item_id).values_list('name', flat=True).first() or "Item"
         messages.success(request, f"{item_name} removed from your cart.")
     
-    return redirect('cafe:cart')
+    return save_cart(request, redirect('cafe:cart'))
 
 def cart_view(request):
     # Cart viewing functionality - displays current order items and total
     # Implements part of the shopping cart requirement
-    cart = get_cart(request)
-    cart_items = []
-    total = Decimal('0.00')
-    
-    for item_id, item_data in cart.items():
-        price = Decimal(item_data['price'])
-        quantity = item_data['quantity']
-        subtotal = price * quantity
-        total += subtotal
-        
-        cart_items.append({
-            'id': item_id,
-            'name': item_data['name'],
-            'price': price,
-            'quantity': quantity,
-            'subtotal': subtotal
-        })
+    context = _cart_context(request, get_cart(request))
     
-    context = {
-        'cart_items': cart_items,
-        'total': total
-    }
-    
-    return render(request, 'cafe/cart.html', context)
+    return save_cart(request, render(request, 'cafe/cart.html', context))
 
 @login_required
 def checkout(request):
@@ -463,77 +500,29 @@ def checkout(request):
         return redirect('cafe:cart')
     
     if request.method == 'POST':
-        # Process checkout form submission
-        total_amount = Decimal('0.00')
-        
-        # Calculate total from cart items
-        for item_id, item_data in cart.items():
-            price = Decimal(item_data['price'])
-            quantity = item_data['quantity']
-            total_amount += price * quantity
-        
+        # Process checkout form submission - all writes happen in one transaction (see cafe.checkout)
         notes = request.POST.get('notes', '')
         
-        # Create the order record
-        order = Order.objects.create(
-            customer=request.user,
-            total_amount=total_amount,
-            notes=notes
-        )
+        try:
+            result = place_order(request.user, cart.as_checkout_data(), notes=notes)
+        except CheckoutError as error:
+            messages.error(request, " ".join([str(error)] + error.problems))
+            return redirect('cafe:cart')
         
-        # Create order items from cart contents
-        for item_id, item_data in cart.items():
-            menu_item = get_object_or_404(MenuItem, id=item_id)
-            price = Decimal(item_data['price'])
-            quantity = item_data['quantity']
-            
-            OrderItem.objects.create(
-                order=order,
-                menu_item=menu_item,
-                quantity=quantity,
-                price=price
-            )
+        order = result.order
+        if result.repriced:
+            messages.warning(request, f"Prices were updated for: {', '.join(result.repriced)}")
         
         # Clear the cart after successful order
-        request.session['cart'] = {}
-        request.session.modified = True
-        
-        # Demo payment creation - in production would integrate with payment gateway
-        Payment.objects.create(
-            order=order,
-            amount=total_amount,
-            payment_method='ONLINE',
-            transaction_id=f"DEMO-{order.order_number}",
-            status='COMPLETED'
-        )
+        cart.clear()
         
         messages.success(request, f"Your order has been placed successfully! Order number: {order.order_number}")
-        return redirect('cafe:order_detail', order_number=order.order_number)
+        return save_cart(request, redirect('cafe:order_detail', order_number=order.order_number))
     
     # Prepare cart items for checkout display
-    cart_items = []
-    total = Decimal('0.00')
-    
-    for item_id, item_data in cart.items():
-        price = Decimal(item_data['price'])
-        quantity = item_data['quantity']
-        subtotal = price * quantity
-        total += subtotal
-        
-        cart_items.append({
-            'id': item_id,
-            'name': item_data['name'],
-            'price': price,
-            'quantity': quantity,
-            'subtotal': subtotal
-        })
-    
-    context = {
-        'cart_items': cart_items,
-        'total': total
-    }
+    context = _cart_context(request, cart)
     
-    return render(request, 'cafe/checkout.html', context)
+    return save_cart(request, render(request, 'cafe/checkout.html', context))
 
 @login_required
 def order_list(request):
@@ -549,9 +538,15 @@ def order_list(request):
 @login_required
 def order_detail(request, order_number):
     # Order details view - implements detailed order information requirement
-    order = get_object_or_404(Order, order_number=order_number, customer=request.user)
+    # Payment is joined in the same query as the order instead of a separate lookup
+    order = get_object_or_404(
+        Order.objects.select_related('payment'), order_number=order_number, customer=request.user
+    )
     order_items = order.items.all().select_related('menu_item')
-    payment = Payment.objects.filter(order=order).first()
+    try:
+        payment = order.payment
+    except Payment.DoesNotExist:
+        payment = None
     
     context = {
         'order': order,
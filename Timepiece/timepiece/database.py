@@ -0,0 +1,67 @@
+import os
+
+# Database profiles for settings.DATABASES - pick one with TIMEPIECE_DB_PROFILE
+BASIC = 'basic'  # Plain SQLite defaults: rollback journal, a new connection per request
+TUNED = 'tuned'  # WAL journaling, busy timeout, memory-mapped reads and persistent connections
+
+# Run on every new SQLite connection (Django executes each statement of init_command)
+TUNED_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',  # Readers no longer block the writer and vice versa
+    'PRAGMA synchronous=NORMAL',  # Safe with WAL - only the last commits can be lost on power failure, never corruption
+    'PRAGMA mmap_size=268435456',  # Read up to 256 MB of the file through the page cache instead of read() calls
+    'PRAGMA cache_size=-20000',  # ~20 MB page cache per connection (negative values are KiB)
+    'PRAGMA temp_store=MEMORY',  # Sorts and temporary indexes stay off disk
+]
+
+DEFAULT_TUNED_OPTIONS = {
+    # Seconds a connection waits for the write lock before "database is locked" - this is
+    # SQLite's busy_timeout, set through the driver's timeout argument
+    'timeout': 20,
+    # Take the write lock when the transaction starts. With the default DEFERRED mode a checkout
+    # reads first and then tries to upgrade its lock; two of those deadlock and SQLite fails one
+    # immediately without waiting for the busy timeout
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': ';'.join(TUNED_PRAGMAS),
+}
+
+
+def database_settings(base_dir, profile=None, environ=os.environ):
+    # DATABASES['default'] for the selected profile. Environment variables:
+    #   TIMEPIECE_DB_PROFILE       basic | tuned (default tuned)
+    #   TIMEPIECE_DB_PATH          database file (default <BASE_DIR>/db.sqlite3)
+    #   TIMEPIECE_DB_CONN_MAX_AGE  seconds to keep a connection open between requests (tuned only, default 600)
+    profile = profile or environ.get('TIMEPIECE_DB_PROFILE', TUNED)
+    database = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': environ.get('TIMEPIECE_DB_PATH') or base_dir / 'db.sqlite3',
+    }
+    if profile == BASIC:
+        return database
+    if profile != TUNED:
+        raise ValueError(f"Unknown TIMEPIECE_DB_PROFILE {profile!r} - expected {BASIC!r} or {TUNED!r}")
+
+    database.update({
+        'OPTIONS': dict(DEFAULT_TUNED_OPTIONS),
+        # Persistent connections skip the connect and pragma setup on every request; health checks
+        # replace a connection that went bad before it is reused
+        'CONN_MAX_AGE': int(environ.get('TIMEPIECE_DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    })
+    return database
+
+
+def replica_databases(primary, environ=os.environ):
+    # Read replica aliases ('replica1', 'replica2', ...) for cafe.routers.ReplicaRouter, one per
+    # comma-separated SQLite file in TIMEPIECE_DB_REPLICAS. Replica connections are read-only
+    # (query_only), so a write routed to one fails loudly instead of diverging from the primary.
+    # Pointing TIMEPIECE_DB_REPLICAS at the primary's own file gives a local stand-in replica;
+    # under tests every replica mirrors the test database
+    replicas = {}
+    paths = [path.strip() for path in environ.get('TIMEPIECE_DB_REPLICAS', '').split(',') if path.strip()]
+    for number, path in enumerate(paths, start=1):
+        options = {
+            key: value for key, value in primary.get('OPTIONS', {}).items() if key != 'transaction_mode'
+        }
+        options['init_command'] = ';'.join(filter(None, [options.get('init_command'), 'PRAGMA query_only=ON']))
+        replicas[f"replica{number}"] = dict(primary, NAME=path, OPTIONS=options, TEST={'MIRROR': 'default'})
+    return replicas
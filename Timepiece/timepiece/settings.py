@@ -1,4 +1,5 @@
 from pathlib import Path
+from .database import database_settings, replica_databases
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,25 +40,32 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'cafe.middleware.ReplicaPinningMiddleware',  # Read-after-write for the replica router - see REPLICA_ROUTING
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'cafe.middleware.RateLimitMiddleware',  # Login/checkout token buckets - see RATE_LIMITS
 ]
 
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'cafe.api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'cafe.api.throttling.WriteThrottle',
+    ],
+    # Reverse proxies in front of the app that append to X-Forwarded-For - 0 keys clients on REMOTE_ADDR
+    'NUM_PROXIES': 0,
 }
 
 ROOT_URLCONF = 'timepiece.urls'
@@ -88,11 +96,82 @@ WSGI_APPLICATION = 'timepiece.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Profile (WAL pragmas, busy timeout, persistent connections) is chosen with TIMEPIECE_DB_PROFILE
+# and read replicas are listed in TIMEPIECE_DB_REPLICAS - see timepiece.database
 DATABASES = {
+    'default': database_settings(BASE_DIR),
+}
+DATABASES.update(replica_databases(DATABASES['default']))
+
+# Reads of the cafe app go to the replicas, pinned to the primary after a write - see cafe.routers
+DATABASE_ROUTERS = ['cafe.routers.ReplicaRouter']
+REPLICA_ROUTING = {
+    'REPLICAS': [alias for alias in DATABASES if alias != 'default'],
+    'PIN_SECONDS': 5,
+}
+
+
+# Cache configuration
+# The menu version key lives in the default cache - use a shared backend (e.g. Redis/Memcached)
+# when running several worker processes so all of them see menu invalidations
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'timepiece-default',
+    },
+    # Seen by every worker process on the host - holds the menu and autocomplete versions and the
+    # 2FA device answers, which must change for all workers when an admin edits them. Point this at
+    # Redis/Memcached when the app runs on more than one host
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+}
+
+# Public menu page cache - see cafe.cache
+MENU_CACHE = {
+    'MAX_ENTRIES': 512,
+    'MAX_BYTES': 8 * 1024 * 1024,
+    'VERSION_CACHE': 'shared',
+}
+
+# Request inspection for cafe.middleware.SecurityMiddleware - see cafe.inspection
+# 'SIGNATURES' ({category: [regex, ...]}) and 'OTP_EXEMPT_PREFIXES' may also be overridden here
+SECURITY_INSPECTION = {
+    'CACHE_ENTRIES': 1024,
+    'MAX_CACHED_LENGTH': 1024,
+}
+
+# Token-bucket rate limits - see cafe.ratelimit for the defaults and per-path scopes
+# Set 'SHARED_BACKEND' to 'cafe.ratelimit.SQLiteBucketStore' to share buckets between worker processes
+RATE_LIMITS = {
+    'RATES': {
+        'login': '10/min',
+        'token_auth': '10/min',
+        'checkout': '20/hour',
+        'api_write': '120/min',
+    },
+    'SHARED_BACKEND': None,
+}
+
+# API token -> user cache used by CachedTokenAuthentication - see cafe.api.authentication
+TOKEN_AUTH_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+    'LAST_USED_FLUSH_INTERVAL': 60,
+}
+
+# Per-user 2FA device-presence cache used by SecurityMiddleware - see cafe.devices
+OTP_DEVICE_CACHE = {
+    'TIMEOUT': 60,
+    'CACHE': 'shared',
+}
+
+# Shopping cart storage - see cafe.cart. Alternatives to the session store:
+# 'cafe.cart.SignedCookieCartStore' (no server writes) and 'cafe.cart.CacheCartStore' (OPTIONS: cache_alias)
+CART_STORE = {
+    'BACKEND': 'cafe.cart.SessionCartStore',
+    'OPTIONS': {},
 }
 
 
@@ -156,13 +235,24 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        # JSON lines with event_type/user/ip fields - see cafe.logqueue.JSONFormatter
+        'structured': {
+            '()': 'cafe.logqueue.JSONFormatter',
+        },
     },
     'handlers': {
+        # File handlers only enqueue on the request thread - a background listener writes batches
+        # to size/time rotating files, and drops records rather than blocking when the queue is full
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'cafe.logqueue.AsyncFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs/timepiece.log'),
             'formatter': 'verbose',
+            'max_bytes': 10 * 1024 * 1024,
+            'when': 'midnight',
+            'backup_count': 14,
+            'queue_size': 10000,
+            'drop_policy': 'newest',
         },
         'console': {
             'level': 'DEBUG',
@@ -171,9 +261,14 @@ LOGGING = {
         },
         'security_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'cafe.logqueue.AsyncFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs/security.log'),
-            'formatter': 'verbose',
+            'formatter': 'structured',
+            'max_bytes': 10 * 1024 * 1024,
+            'when': 'midnight',
+            'backup_count': 90,
+            'queue_size': 10000,
+            'drop_policy': 'oldest',  # Keep the most recent security events during a flood
         },
     },
     'loggers': {
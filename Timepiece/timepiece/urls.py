@@ -18,7 +18,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework.authtoken.views import obtain_auth_token
+from rest_framework.authtoken.views import ObtainAuthToken
+from cafe.api.throttling import TokenAuthThrottle
 from cafe.views import register
 # from two_factor.urls import urlpatterns as tf_urls
 
@@ -29,7 +30,7 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),  # Standard Django auth URLs
     path('register/', register, name='register'),  # Custom registration view
     path('api/', include('cafe.api.urls')),  # REST API URLs
-    path('api-token-auth/', obtain_auth_token, name='api_token_auth'),  # Token generation endpoint
+    path('api-token-auth/', ObtainAuthToken.as_view(throttle_classes=[TokenAuthThrottle]), name='api_token_auth'),  # Token generation endpoint
     path('api-auth/', include('rest_framework.urls')),  # Browsable API login
 ]
 